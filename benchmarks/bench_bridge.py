@@ -0,0 +1,58 @@
+"""Time-to-ready and pump throughput of ``Bridge.run`` against the local emulator.
+
+    PYTHONPATH=. python benchmarks/bench_bridge.py [--devices 500] [--rate inf] [--seconds 5]
+
+The emulator runs on the same event loop as the client, so the throughput figure
+is the combined cost of both ends and is best used to compare client changes
+against each other rather than as an absolute number.
+"""
+import argparse
+import asyncio
+import math
+import time
+
+from xcomfort.bridge import Bridge
+from xcomfort.emulator import BridgeEmulator
+
+
+async def main(args):
+    emulator = BridgeEmulator("bench", device_count=args.devices, room_count=max(1, args.devices // 20),
+                              comp_count=max(1, args.devices // 2), event_rate=args.rate,
+                              items_per_event=args.items)
+    await emulator.start()
+
+    bridge = Bridge(emulator.address, "bench")
+    start = time.perf_counter()
+    run_task = asyncio.create_task(bridge.run())
+    await bridge.wait_for_initialization()
+    ready = time.perf_counter() - start
+    print(f"time-to-ready: {ready * 1000:.1f} ms for {args.devices} devices")
+    timings = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in bridge.init_timings.items())
+    print(f"since connect:   {timings}")
+
+    received = 0
+
+    def count(message):
+        nonlocal received
+        received += 1
+
+    subscription = bridge.connection.messages.subscribe(count)
+    sent_before = emulator.events_sent
+    await asyncio.sleep(args.seconds)
+    subscription.dispose()
+    sent = emulator.events_sent - sent_before
+    print(f"events sent:     {sent / args.seconds:.0f}/s")
+    print(f"frames received: {received / args.seconds:.0f}/s")
+
+    await bridge.close()
+    await run_task
+    await emulator.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=math.inf, help="events per second pushed by the emulator")
+    parser.add_argument("--items", type=int, default=1, help="state items per SET_STATE_INFO frame")
+    parser.add_argument("--seconds", type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,66 @@
+"""Per-frame cost of the AES frame codec compared with the previous inline path.
+
+    PYTHONPATH=. python benchmarks/bench_codec.py [--number 20000]
+
+"legacy" is the code SecureBridgeConnection used before AesFrameCodec: a fresh
+AES.new() per frame, b64decode -> decrypt -> rstrip -> decode -> json.loads on the
+way in and encode -> pad -> encrypt -> b64encode -> decode on the way out.
+"""
+import argparse
+import json
+import os
+import timeit
+from base64 import b64decode, b64encode
+
+from Crypto.Cipher import AES
+
+from xcomfort.codec import AesFrameCodec, StdlibJson
+from xcomfort.connection import _pad_string
+
+FRAMES = {
+    "ack": {"type_int": 1, "ref": 1234},
+    "switch": {"type_int": 281, "mc": 12, "payload": {"deviceId": 5, "switch": True}},
+    "state_info": {"type_int": 310, "mc": 40, "payload": {"item": [
+        {"deviceId": i, "switch": True, "dimmvalue": 50} for i in range(3)]}},
+    "all_data": {"type_int": 300, "mc": 2, "payload": {"devices": [
+        {"deviceId": i, "name": f"Device {i}", "devType": 101, "compId": i, "dimmable": True,
+         "switch": False, "dimmvalue": 0} for i in range(50)]}},
+}
+
+
+def legacy_encode(key, iv, data):
+    msg = _pad_string(json.dumps(data).encode())
+    msg = AES.new(key, AES.MODE_CBC, iv).encrypt(msg)
+    return b64encode(msg).decode() + '\u0004'
+
+
+def legacy_decode(key, iv, data):
+    data = AES.new(key, AES.MODE_CBC, iv).decrypt(b64decode(data)).rstrip(b'\x00')
+    if not data:
+        return {}
+    return json.loads(data.decode())
+
+
+def per_frame_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def main(number):
+    key, iv = os.urandom(32), os.urandom(16)
+    # The reference frames are encoded with the json module
+    codec = AesFrameCodec(key, iv, StdlibJson)
+    print(f"{'frame':<12}{'bytes':>7}{'decode legacy':>16}{'decode codec':>14}{'encode legacy':>16}{'encode codec':>14}")
+    for name, message in FRAMES.items():
+        frame = legacy_encode(key, iv, message)
+        assert codec.decode(frame) == message and codec.encode(message) == frame
+        print(f"{name:<12}{len(frame):>7}"
+              f"{per_frame_us(lambda: legacy_decode(key, iv, frame), number):>14.2f}us"
+              f"{per_frame_us(lambda: codec.decode(frame), number):>12.2f}us"
+              f"{per_frame_us(lambda: legacy_encode(key, iv, message), number):>14.2f}us"
+              f"{per_frame_us(lambda: codec.encode(message), number):>12.2f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000)
+    main(parser.parse_args().number)
@@ -0,0 +1,62 @@
+"""Dispatch overhead of Bridge._onMessage under a SET_STATE_INFO storm.
+
+    PYTHONPATH=. python benchmarks/bench_dispatch.py [--devices 200] [--messages 100000]
+
+"legacy" is the previous _onMessage: Messages(type_int), '_handle_' + name and a
+getattr with a fresh fallback lambda per message.
+"""
+import argparse
+import time
+
+from xcomfort.bridge import Bridge
+from xcomfort.messages import Messages
+
+
+def legacy_on_message(bridge, message):
+    if 'payload' in message:
+        message_type = Messages(message['type_int'])
+        method_name = '_handle_' + message_type.name
+        method = getattr(bridge, method_name, lambda p: bridge._handle_UNKNOWN(message_type, p))
+        try:
+            method(message['payload'])
+        except Exception as e:
+            bridge.logger(f"Unknown error with: {method_name}: {str(e)}")
+
+
+def make_bridge(devices):
+    bridge = Bridge("127.0.0.1", "bench", session=object())
+    bridge._handle_SET_ALL_DATA({"devices": [
+        {"deviceId": i, "name": f"Device {i}", "devType": 101, "compId": i, "dimmable": True,
+         "switch": False, "dimmvalue": 0} for i in range(devices)]})
+    return bridge
+
+
+def run(label, dispatch, messages):
+    start = time.perf_counter()
+    for message in messages:
+        dispatch(message)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed / len(messages) * 1e6:8.2f} us/message")
+
+
+def main(args):
+    bridge = make_bridge(args.devices)
+    storm = [{"type_int": 310, "mc": i, "payload": {"item": [
+        {"deviceId": i % args.devices, "switch": bool(i % 2), "dimmvalue": i % 100}]}}
+        for i in range(args.messages)]
+    # A handler that does nothing isolates the cost of dispatch itself
+    bridge._handle_SET_HOME_DATA = lambda payload: None
+    bridge._build_dispatch_table()
+    noop = [{"type_int": 303, "payload": {}}] * args.messages
+
+    run("legacy, no-op handler", lambda m: legacy_on_message(bridge, m), noop)
+    run("table, no-op handler", bridge._onMessage, noop)
+    run("legacy, SET_STATE_INFO", lambda m: legacy_on_message(bridge, m), storm)
+    run("table, SET_STATE_INFO", bridge._onMessage, storm)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=100000)
+    main(parser.parse_args())
@@ -0,0 +1,40 @@
+"""Handshake phase timings for a full login versus a token-cached reconnect.
+
+    PYTHONPATH=. python benchmarks/bench_handshake.py [--rounds 20]
+"""
+import argparse
+import asyncio
+import statistics
+
+import aiohttp
+
+from xcomfort.auth import TokenCache
+from xcomfort.connection import setup_secure_connection
+from xcomfort.emulator import BridgeEmulator
+
+
+async def measure(session, address, cache, rounds):
+    timings = []
+    for _ in range(rounds):
+        connection = await setup_secure_connection(session, address, "bench", cache)
+        timings.append(connection.handshake_timings)
+        await connection.close()
+    return {phase: statistics.median(t[phase] for t in timings) for phase in timings[0]}
+
+
+async def main(rounds):
+    async with BridgeEmulator("bench", max_clients=rounds + 1) as emulator, aiohttp.ClientSession() as session:
+        full = await measure(session, emulator.address, None, rounds)
+        cache = TokenCache()
+        await measure(session, emulator.address, cache, 1)
+        resumed = await measure(session, emulator.address, cache, rounds)
+
+    for name, timings in (("full login", full), ("cached token", resumed)):
+        phases = ", ".join(f"{phase} {seconds * 1000:.2f} ms" for phase, seconds in timings.items())
+        print(f"{name:<14}{phases}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    asyncio.run(main(parser.parse_args().rounds))
@@ -0,0 +1,75 @@
+"""Event-loop lag while many connections handshake at once, as after a network outage.
+
+    PYTHONPATH=. python benchmarks/bench_handshake_storm.py [--connections 100] [--limit 8]
+
+The emulator runs on its own thread and loop so only client-side work shows up
+in the lag figures. Each scenario opens ``--connections`` connections at once
+and samples how late a 5 ms timer fires on the client loop meanwhile.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+import aiohttp
+
+from xcomfort.connection import HandshakeLimiter, setup_secure_connection
+from xcomfort.emulator import BridgeEmulator
+
+
+def start_emulator(connections):
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    emulator = BridgeEmulator("bench", max_clients=connections)
+    asyncio.run_coroutine_threadsafe(emulator.start(), loop).result()
+    return emulator, loop
+
+
+async def storm(address, connections, offload_crypto, limit):
+    loop = asyncio.get_running_loop()
+    lag = []
+    done = asyncio.Event()
+
+    async def sample():
+        while not done.is_set():
+            expected = loop.time() + 0.005
+            await asyncio.sleep(0.005)
+            lag.append(loop.time() - expected)
+
+    limiter = HandshakeLimiter(limit)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        sampler = asyncio.create_task(sample())
+        started = time.perf_counter()
+        opened = await asyncio.gather(*(
+            setup_secure_connection(session, address, "bench", offload_crypto=offload_crypto, limiter=limiter)
+            for _ in range(connections)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await sampler
+        await asyncio.gather(*(connection.close() for connection in opened))
+    return elapsed, lag
+
+
+async def main(args):
+    emulator, emulator_loop = start_emulator(args.connections)
+    scenarios = (
+        ("inline, no limit", False, args.connections),
+        ("offloaded, no limit", True, args.connections),
+        (f"offloaded, limit {args.limit}", True, args.limit),
+    )
+    for name, offload_crypto, limit in scenarios:
+        elapsed, lag = await storm(emulator.address, args.connections, offload_crypto, limit)
+        lag.sort()
+        print(f"{name:<22} all connected {elapsed * 1000:7.0f} ms, loop lag "
+              f"p50 {statistics.median(lag) * 1000:6.2f} ms, p99 {lag[int(len(lag) * 0.99)] * 1000:6.2f} ms, "
+              f"max {lag[-1] * 1000:6.2f} ms")
+    asyncio.run_coroutine_threadsafe(emulator.stop(), emulator_loop).result()
+    emulator_loop.call_soon_threadsafe(emulator_loop.stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=8, help="concurrent handshakes in the limited scenario")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""Indexed lookups over a large installation versus scanning every device.
+
+    PYTHONPATH=. python benchmarks/bench_index.py [--devices 5000] [--rooms 200] [--lookups 2000]
+
+Builds a bridge from one SET_ALL_DATA dump with a tenth of the devices being
+rockers that control three others, then times the same queries through the
+bridge's indexes and as the linear scans callers had to write before.
+"""
+import argparse
+import asyncio
+import time
+
+from xcomfort.bridge import Bridge
+from xcomfort.devices import Light
+
+
+def all_data(devices, rooms):
+    device_payloads = []
+    for device_id in range(1, devices + 1):
+        if device_id % 10 == 0:
+            controls = [(device_id + offset) % devices + 1 for offset in range(3)]
+            device_payloads.append({"deviceId": device_id, "name": f"Rocker {device_id}", "devType": 220,
+                                    "compId": device_id % 100, "curstate": 0, "controlId": controls})
+        else:
+            device_payloads.append({"deviceId": device_id, "name": f"Device {device_id}", "devType": 101,
+                                    "compId": device_id % 100, "dimmable": device_id % 2 == 1,
+                                    "switch": False, "dimmvalue": 0})
+    room_payloads = [{"roomId": room_id, "name": f"Room {room_id}",
+                      "devices": [d for d in range(1, devices + 1) if d % rooms == room_id - 1]}
+                     for room_id in range(1, rooms + 1)]
+    return {"type_int": 300, "payload": {"devices": device_payloads, "rooms": room_payloads, "lastItem": True}}
+
+
+def timed(lookups, query):
+    start = time.perf_counter()
+    for i in range(lookups):
+        query(i)
+    return (time.perf_counter() - start) / lookups
+
+
+async def main(args):
+    bridge = Bridge("127.0.0.1", "bench", session=object())
+    data = all_data(args.devices, args.rooms)
+    start = time.perf_counter()
+    bridge._onMessage(data)
+    print(f"SET_ALL_DATA, {args.devices} devices: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    devices = bridge._devices
+    rooms = bridge._rooms
+    count = args.devices
+
+    def scan_lights_in_room(i):
+        members = rooms[i % args.rooms + 1].device_ids
+        return [device for device in devices.values() if isinstance(device, Light) and device.dimmable
+                and device.device_id in members]
+
+    def scan_by_name(i):
+        name = f"Device {i % count + 1}"
+        return [device for device in devices.values() if device.name == name]
+
+    def scan_controllers(i):
+        device_id = i % count + 1
+        return [device for device in devices.values() if device_id in getattr(device, "payload", {}).get("controlId", ())]
+
+    def scan_rooms_of(i):
+        device_id = i % count + 1
+        return [room for room in rooms.values() if device_id in room.device_ids]
+
+    rocker_ids = [device_id for device_id in devices if device_id % 10 == 0]
+
+    def scan_name_with_controlled(i):
+        rocker = devices[rocker_ids[i % len(rocker_ids)]]
+        names = {devices[d].name for d in rocker.payload.get("controlId", []) if d in devices}
+        return f"{rocker.name} ({', '.join(sorted(names))})"
+
+    queries = (
+        ("dimmable lights in room", scan_lights_in_room,
+         lambda i: [d for d in bridge.find_devices(room_id=i % args.rooms + 1, device_class=Light) if d.dimmable]),
+        ("device by name", scan_by_name, lambda i: bridge.find_devices(name=f"Device {i % count + 1}")),
+        ("rockers controlling", scan_controllers, lambda i: bridge.controllers_of(i % count + 1)),
+        ("rooms of device", scan_rooms_of, lambda i: bridge.rooms_of(i % count + 1)),
+        ("name_with_controlled", scan_name_with_controlled,
+         lambda i: devices[rocker_ids[i % len(rocker_ids)]].name_with_controlled),
+    )
+    print(f"{'':<24}{'scan':>12}{'index':>12}")
+    for name, scan, indexed in queries:
+        assert len(scan(7)) == len(indexed(7)) or name == "name_with_controlled"
+        print(f"{name:<24}{timed(args.lookups, scan) * 1e6:>10.2f}us{timed(args.lookups, indexed) * 1e6:>10.2f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,58 @@
+"""Stdlib json versus orjson for frame bodies.
+
+    PYTHONPATH=. python benchmarks/bench_json.py [--devices 500] [--iterations 20000]
+
+Times parsing and serialising a SET_ALL_DATA dump and a single-item
+SET_STATE_INFO frame, and the full decode (decrypt + parse) of each frame.
+"""
+import argparse
+import os
+import time
+
+from xcomfort.codec import AesFrameCodec, OrjsonJson, StdlibJson, orjson
+from xcomfort.emulator import BridgeEmulator
+
+
+def per_call(func, arg, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(arg)
+    return (time.perf_counter() - start) / iterations
+
+
+def main(args):
+    if orjson is None:
+        raise SystemExit("orjson is not installed")
+    emulator = BridgeEmulator("bench", device_count=args.devices, room_count=max(1, args.devices // 20),
+                              comp_count=max(1, args.devices // 2))
+    messages = {
+        "SET_ALL_DATA": {"type_int": 300, "mc": 1, "payload": {
+            "devices": list(emulator.devices.values()), "comps": list(emulator.comps.values()),
+            "rooms": list(emulator.rooms.values()), "lastItem": True}},
+        "SET_STATE_INFO": {"type_int": 310, "mc": 2, "payload": {"item": [
+            {"deviceId": 1, "switch": True, "dimmvalue": 40}]}},
+    }
+    key, iv = os.urandom(32), os.urandom(16)
+
+    print(f"{'frame':<16}{'operation':<10}{'json us':>12}{'orjson us':>12}{'speedup':>9}")
+    for name, message in messages.items():
+        data = StdlibJson.dumps(message)
+        iterations = max(1, args.iterations if len(data) < 10000 else args.iterations // 20)
+        frame = AesFrameCodec(key, iv, StdlibJson).encode(message)
+        rows = [
+            ("loads", StdlibJson.loads, OrjsonJson.loads, data),
+            ("dumps", StdlibJson.dumps, OrjsonJson.dumps, message),
+            ("decode", AesFrameCodec(key, iv, StdlibJson).decode, AesFrameCodec(key, iv, OrjsonJson).decode, frame),
+        ]
+        for operation, stdlib, fast, arg in rows:
+            slow_time = per_call(stdlib, arg, iterations)
+            fast_time = per_call(fast, arg, iterations)
+            print(f"{name:<16}{operation:<10}{slow_time * 1e6:12.2f}{fast_time * 1e6:12.2f}"
+                  f"{slow_time / fast_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,75 @@
+"""Start-up time and event fan-in of a BridgeManager running many bridges against local emulators.
+
+    PYTHONPATH=. python benchmarks/bench_manager.py [--bridges 100] [--devices 20] [--stagger 0.01]
+
+Every bridge gets its own emulator on the same event loop, so handshakes of
+both ends compete for the loop. ``--stagger`` spreads the handshakes; with 0
+every bridge connects at once.
+"""
+import argparse
+import asyncio
+import time
+
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.manager import BridgeManager
+
+
+async def main(args):
+    emulators = [BridgeEmulator("bench", device_count=args.devices, event_rate=args.rate, max_clients=1)
+                 for _ in range(args.bridges)]
+    for emulator in emulators:
+        await emulator.start()
+
+    manager = BridgeManager(stagger=args.stagger)
+    for emulator in emulators:
+        manager.add(emulator.address, "bench")
+
+    lag = []
+
+    async def sample_lag():
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + 0.01
+            await asyncio.sleep(0.01)
+            lag.append(loop.time() - expected)
+
+    sampler = asyncio.create_task(sample_lag())
+    start = time.perf_counter()
+    await manager.start()
+    await manager.wait_for_initialization()
+    ready = time.perf_counter() - start
+    sampler.cancel()
+    print(f"all ready:       {ready * 1000:.0f} ms for {args.bridges} bridges x {args.devices} devices")
+    print(f"loop lag:        max {max(lag, default=0) * 1000:.1f} ms, "
+          f"mean {sum(lag) / max(len(lag), 1) * 1000:.2f} ms")
+
+    received = 0
+
+    def count(event):
+        nonlocal received
+        received += 1
+
+    subscription = manager.events.subscribe(count)
+    await asyncio.sleep(args.seconds)
+    subscription.dispose()
+    print(f"merged events:   {received / args.seconds:.0f}/s")
+
+    started = time.perf_counter()
+    for _ in range(10000):
+        manager.get_device(emulators[-1].address, args.devices)
+    print(f"lookup:          {(time.perf_counter() - started) / 10000 * 1e6:.2f} µs")
+    print(f"stats:           {manager.stats()}")
+
+    await manager.close()
+    for emulator in emulators:
+        await emulator.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bridges", type=int, default=100)
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=10, help="events per second pushed by each emulator")
+    parser.add_argument("--stagger", type=float, default=0.01, help="seconds between bridge starts")
+    parser.add_argument("--seconds", type=float, default=3)
+    asyncio.run(main(parser.parse_args()))
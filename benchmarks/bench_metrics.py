@@ -0,0 +1,61 @@
+"""Cost of metrics collection on the receive path.
+
+    PYTHONPATH=. python benchmarks/bench_metrics.py [--devices 200] [--messages 100000]
+
+Each message is decoded by the frame codec and dispatched through
+Bridge._onMessage, once with metrics disabled and once enabled.
+"""
+import argparse
+import os
+import time
+
+from xcomfort.bridge import Bridge
+from xcomfort.codec import AesFrameCodec
+from xcomfort.metrics import MeteredCodec, Metrics, message_label
+
+
+def make_bridge(devices):
+    bridge = Bridge("127.0.0.1", "bench", session=object())
+    bridge._handle_SET_ALL_DATA({"devices": [
+        {"deviceId": i, "name": f"Device {i}", "devType": 101, "compId": i, "dimmable": True,
+         "switch": False, "dimmvalue": 0} for i in range(devices)]})
+    return bridge
+
+
+def receive(bridge, codec, frames, metrics):
+    # Mirrors the body of SecureBridgeConnection.pump for one frame
+    on_message = bridge._onMessage
+    start = time.perf_counter()
+    for frame in frames:
+        result = codec.decode(frame)
+        if metrics is None:
+            on_message(result)
+        else:
+            metrics.inc("messages_received", label=message_label(result.get("type_int")))
+            started = time.perf_counter()
+            on_message(result)
+            metrics.observe("fanout_seconds", time.perf_counter() - started)
+    return (time.perf_counter() - start) / len(frames)
+
+
+def main(args):
+    codec = AesFrameCodec(os.urandom(32), os.urandom(16))
+    frames = [codec.encode({"type_int": 310, "mc": i, "payload": {"item": [
+        {"deviceId": i % args.devices, "switch": bool(i % 2), "dimmvalue": i % 100}]}})
+        for i in range(args.messages)]
+
+    disabled = make_bridge(args.devices)
+    enabled = make_bridge(args.devices)
+    metrics = enabled.enable_metrics()
+
+    off = receive(disabled, codec, frames, None)
+    on = receive(enabled, MeteredCodec(codec, metrics), frames, metrics)
+    print(f"metrics disabled: {off * 1e6:8.2f} us/frame")
+    print(f"metrics enabled:  {on * 1e6:8.2f} us/frame ({(on - off) / off:+.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=100000)
+    main(parser.parse_args())
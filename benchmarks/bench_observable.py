@@ -0,0 +1,116 @@
+"""Built-in observable versus RxPY subjects: import time, per-update cost, memory.
+
+    PYTHONPATH=. python benchmarks/bench_observable.py [--devices 5000] [--updates 200000] [--burst 20000]
+
+The last section feeds a burst of updates for 100 devices to one slow
+coroutine subscriber, unbounded and with each overflow policy, and reports how
+long the producer was held up and how many updates piled up.
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+OBSERVABLE_PATH = str(Path(__file__).resolve().parent.parent / "xcomfort" / "observable.py")
+
+
+def import_time(statement):
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    runs = [float(subprocess.check_output([sys.executable, "-c", code])) for _ in range(5)]
+    return min(runs)
+
+
+def update_cost(subject_type, updates):
+    subject = subject_type(None)
+    sink = []
+    subject.subscribe(lambda value: sink.append(value) if len(sink) < 1 else None)
+    start = time.perf_counter()
+    for i in range(updates):
+        subject.on_next(i)
+    return (time.perf_counter() - start) / updates
+
+
+def memory_per_subject(subject_type, count):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    subjects = [subject_type(None) for _ in range(count)]
+    for subject in subjects:
+        subject.subscribe(lambda value: None)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return size / count
+
+
+async def slow_subscriber(burst, **subscribe_kwargs):
+    from xcomfort.observable import Gate, Subject
+
+    subject = Subject()
+    gate = Gate()
+    delivered = 0
+
+    async def slow(value):
+        nonlocal delivered
+        delivered += 1
+        await asyncio.sleep(0)
+
+    if subscribe_kwargs.get("queue_size") is not None:
+        subscribe_kwargs["gate"] = gate
+    subscription = subject.subscribe(slow, **subscribe_kwargs)
+    start = time.perf_counter()
+    for i in range(burst):
+        subject.on_next((i % 100, i))
+        if not gate.is_open:
+            await gate.wait()
+        elif i % 100 == 99:
+            await asyncio.sleep(0)
+    produced = time.perf_counter() - start
+    stats = subscription.stats() if hasattr(subscription, "stats") else None
+    subscription.dispose()
+    return produced, delivered, stats
+
+
+def main(args):
+    import rx.subject
+    from xcomfort.observable import BehaviorSubject
+
+    print(f"{'':<24}{'rx':>12}{'xcomfort':>12}")
+    # Load observable.py on its own; importing it through the package would
+    # also pull in aiohttp and pycryptodome via xcomfort/__init__.py.
+    standalone = ("import importlib.util as u; "
+                  f"s = u.spec_from_file_location('observable', {OBSERVABLE_PATH!r}); "
+                  "s.loader.exec_module(u.module_from_spec(s))")
+    print(f"{'import time':<24}{import_time('import rx.subject') * 1000:>10.1f}ms"
+          f"{import_time(standalone) * 1000:>10.1f}ms")
+    print(f"{'on_next, 1 subscriber':<24}{update_cost(rx.subject.BehaviorSubject, args.updates) * 1e6:>10.2f}us"
+          f"{update_cost(BehaviorSubject, args.updates) * 1e6:>10.2f}us")
+    print(f"{'memory per device':<24}{memory_per_subject(rx.subject.BehaviorSubject, args.devices):>11.0f}B"
+          f"{memory_per_subject(BehaviorSubject, args.devices):>11.0f}B")
+
+    from xcomfort.observable import Overflow
+
+    print()
+    print(f"{'slow subscriber':<24}{'producer':>12}{'delivered':>12}{'dropped':>10}{'conflated':>11}"
+          f"{'max queued':>12}")
+    scenarios = (
+        ("unbounded", {}),
+        ("drop_oldest, 256", {"queue_size": 256, "overflow": Overflow.DROP_OLDEST}),
+        ("conflate, 256", {"queue_size": 256, "overflow": Overflow.CONFLATE, "key": lambda value: value[0]}),
+        ("block, 256", {"queue_size": 256, "overflow": Overflow.BLOCK}),
+    )
+    for name, kwargs in scenarios:
+        produced, delivered, stats = asyncio.run(slow_subscriber(args.burst, **kwargs))
+        stats = stats or {"dropped": 0, "conflated": 0, "max_pending": args.burst - delivered}
+        print(f"{name:<24}{produced * 1000:>10.1f}ms{delivered:>12}{stats['dropped']:>10}{stats['conflated']:>11}"
+              f"{stats['max_pending']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--updates", type=int, default=200000)
+    parser.add_argument("--burst", type=int, default=20000, help="updates fed to the slow subscriber")
+    main(parser.parse_args())
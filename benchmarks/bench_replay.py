@@ -0,0 +1,58 @@
+"""Handler throughput on recorded traffic.
+
+    PYTHONPATH=. python benchmarks/bench_replay.py [capture.jsonl] [--devices 200] [--seconds 2] [--repeat 5]
+
+Replays a capture made with Bridge.start_capture into a fresh Bridge as fast as
+possible. Without a capture file, one is recorded first from the local emulator
+pushing SET_STATE_INFO events for ``--seconds``.
+"""
+import argparse
+import asyncio
+import math
+import os
+import tempfile
+
+from xcomfort.bridge import Bridge
+from xcomfort.capture import read_capture, replay
+from xcomfort.emulator import BridgeEmulator
+
+
+async def record(path, devices, seconds):
+    async with BridgeEmulator("bench", device_count=devices, event_rate=math.inf) as emulator:
+        bridge = Bridge(emulator.address, "bench")
+        bridge.start_capture(path)
+        run_task = asyncio.create_task(bridge.run())
+        await bridge.wait_for_initialization()
+        await asyncio.sleep(seconds)
+        await bridge.close()
+        await run_task
+
+
+async def main(args):
+    path = args.capture
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        os.unlink(path)
+        await record(path, args.devices, args.seconds)
+    inbound = sum(1 for _, direction, _ in read_capture(path) if direction == "in")
+    print(f"capture: {path}, {inbound} inbound messages")
+
+    best = None
+    for _ in range(args.repeat):
+        bridge = Bridge("127.0.0.1", "bench", session=object())
+        result = await replay(path, bridge._onMessage)
+        best = result if best is None or result.elapsed < best.elapsed else best
+    print(f"replay:  {best.rate:.0f} messages/s, {best.elapsed / best.messages * 1e6:.2f} us/message")
+
+    if args.capture is None:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", nargs="?")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
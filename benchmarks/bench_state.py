@@ -0,0 +1,79 @@
+"""Memory and per-update cost of device state snapshots.
+
+Compares the ``__slots__`` snapshots that share the incoming payload with the
+previous dict-backed states that copied it.
+
+    PYTHONPATH=. python benchmarks/bench_state.py [--devices 5000] [--updates 200000]
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from xcomfort.devices import LightState, RockerState
+
+
+class LegacyDeviceState:
+    def __init__(self, payload):
+        self.payload = payload.copy()
+
+
+class LegacyLightState(LegacyDeviceState):
+    def __init__(self, switch, dimmvalue, payload):
+        LegacyDeviceState.__init__(self, payload)
+        self.switch = switch
+        self.dimmvalue = dimmvalue
+
+
+class LegacyRockerState(LegacyDeviceState):
+    def __init__(self, is_on, payload):
+        LegacyDeviceState.__init__(self, payload)
+        self.is_on = is_on
+        self.timestamp = datetime.now()
+
+
+def _payload(device_id):
+    return {"deviceId": device_id, "switch": True, "dimmvalue": 50, "power": 0.0, "curstate": 1}
+
+
+def memory_per_state(build, count):
+    payloads = [_payload(i) for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    states = [build(payload) for payload in payloads]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del states
+    return size / count
+
+
+def update_cost(build, updates):
+    payload = _payload(1)
+    start = time.perf_counter()
+    for _ in range(updates):
+        build(payload)
+    return (time.perf_counter() - start) / updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--updates", type=int, default=200000)
+    args = parser.parse_args()
+
+    cases = [
+        ("LightState", lambda p: LegacyLightState(True, 50, p), lambda p: LightState(True, 50, p)),
+        ("RockerState", lambda p: LegacyRockerState(True, p), lambda p: RockerState(True, p)),
+    ]
+    print(f"{'state':<12} {'legacy B':>10} {'slots B':>10} {'legacy us':>10} {'slots us':>10}")
+    for name, legacy, current in cases:
+        print(f"{name:<12} "
+              f"{memory_per_state(legacy, args.devices):>10.0f} "
+              f"{memory_per_state(current, args.devices):>10.0f} "
+              f"{update_cost(legacy, args.updates) * 1e6:>10.3f} "
+              f"{update_cost(current, args.updates) * 1e6:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
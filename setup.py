@@ -27,4 +27,7 @@ setuptools.setup(
         "rx",
         "pycryptodome"
     ],
+    extras_require={
+        "fast": ["orjson"],
+    },
 )
@@ -0,0 +1,18 @@
+import pytest
+from mock import Mock
+from xcomfort.bridge import Bridge
+
+
+@pytest.fixture
+def make_bridge():
+    """Build a Bridge that never connects, with a Mock logger."""
+    def make(**kwargs):
+        bridge = Bridge("127.0.0.1", "key", session=Mock(), **kwargs)
+        bridge.logger = Mock()
+        return bridge
+    return make
+
+
+@pytest.fixture
+def bridge(make_bridge):
+    return make_bridge()
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import aiohttp
+import pytest
+from xcomfort.auth import TokenCache
+from xcomfort.bridge import Bridge
+from xcomfort.connection import setup_secure_connection
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.messages import Messages
+
+
+def _logins(emulator):
+    return sum(1 for msg in emulator.received if msg.get("type_int") == Messages.AUTH_LOGIN)
+
+
+@pytest.mark.asyncio
+async def test_reconnect_reuses_cached_token():
+    cache = TokenCache()
+    async with BridgeEmulator("secret") as emulator, aiohttp.ClientSession() as session:
+        first = await setup_secure_connection(session, emulator.address, "secret", cache)
+        await first.close()
+        second = await setup_secure_connection(session, emulator.address, "secret", cache)
+        await second.close()
+
+    assert not first.resumed
+    assert second.resumed
+    assert "login" in first.handshake_timings
+    assert "login" not in second.handshake_timings
+    assert _logins(emulator) == 1
+
+
+@pytest.mark.asyncio
+async def test_rejected_token_falls_back_to_login():
+    cache = TokenCache()
+    cache.put("emulated-bridge", "stale", 8640000)
+    async with BridgeEmulator("secret") as emulator, aiohttp.ClientSession() as session:
+        connection = await setup_secure_connection(session, emulator.address, "secret", cache)
+        await connection.close()
+
+    assert not connection.resumed
+    assert cache.get("emulated-bridge") not in (None, "stale")
+
+
+def test_token_cache_persists_to_disk(tmp_path):
+    path = str(tmp_path / "tokens.json")
+    TokenCache(path).put("bridge", "abc", 8640000)
+
+    assert TokenCache(path).get("bridge") == "abc"
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_token_cache_ignores_expired_tokens():
+    cache = TokenCache()
+    cache.put("bridge", "abc", -1)
+
+    assert cache.get("bridge") is None
+
+
+@pytest.mark.asyncio
+async def test_bridge_renews_token_ahead_of_expiry():
+    cache = TokenCache(renew_margin=10 ** 9)
+    async with BridgeEmulator("secret") as emulator:
+        bridge = Bridge(emulator.address, "secret", token_cache=cache)
+        run_task = asyncio.create_task(bridge.run())
+        await asyncio.wait_for(bridge.wait_for_initialization(), 10)
+        token = cache.get("emulated-bridge")
+
+        while cache.get("emulated-bridge") == token:
+            await asyncio.sleep(0.01)
+
+        await bridge.close()
+        await run_task
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from xcomfort.bridge import Bridge
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.messages import Messages
+
+
+async def start_bridge(emulator):
+    bridge = Bridge(emulator.address, "secret")
+    run_task = asyncio.create_task(bridge.run())
+    await asyncio.wait_for(bridge.wait_for_initialization(), 10)
+    return bridge, run_task
+
+
+def sent_types(emulator):
+    return [msg["type_int"] for msg in emulator.received if msg["type_int"] >= Messages.ACTION_SLIDE_DEVICE]
+
+
+@pytest.mark.asyncio
+async def test_batch_collapses_full_room_into_room_message():
+    async with BridgeEmulator("secret", device_count=6, room_count=2) as emulator:
+        bridge, run_task = await start_bridge(emulator)
+        devices = await bridge.get_devices()
+        room = (await bridge.get_rooms())[2]
+
+        actions = [(devices[device_id], {"switch": True}) for device_id in room.device_ids]
+        actions.append((devices[1], {"dimmvalue": 40}))
+        result = await bridge.batch(actions)
+
+        assert result.ok
+        assert sent_types(emulator) == [Messages.ACTION_SWITCH_ROOM, Messages.ACTION_SLIDE_DEVICE]
+        assert all(emulator.devices[device_id]["switch"] for device_id in room.device_ids)
+
+        await bridge.close()
+        await run_task
+
+
+@pytest.mark.asyncio
+async def test_batch_uses_matching_scene():
+    async with BridgeEmulator("secret", device_count=4, room_count=2, scene_count=2) as emulator:
+        bridge, run_task = await start_bridge(emulator)
+        scene = (await bridge.get_scenes())[2]
+
+        result = await bridge.batch((device_id, action) for device_id, action in scene.actions.items())
+
+        assert result.ok
+        assert result.messages == [(Messages.ACTIVATE_SCENE, {"sceneId": 2})]
+
+        await bridge.close()
+        await run_task
+
+
+@pytest.mark.asyncio
+async def test_batch_pipelines_partial_room_and_reports_errors():
+    async with BridgeEmulator("secret", device_count=6, room_count=2) as emulator:
+        bridge, run_task = await start_bridge(emulator)
+
+        result = await bridge.batch([(1, {"switch": True}), (99, {"switch": True})])
+
+        assert sent_types(emulator) == [Messages.ACTION_SWITCH_DEVICE, Messages.ACTION_SWITCH_DEVICE]
+        assert len(result.errors) == 1
+
+        await bridge.close()
+        await run_task
+
+
+def test_scene_with_unmodelled_action_is_not_matched(bridge):
+    bridge._onMessage({"type_int": 300, "payload": {
+        "devices": [{"deviceId": 1, "name": "Lamp", "devType": 101, "compId": 1}],
+        "scenes": [{"sceneId": 1, "name": "Evening",
+                    "devices": [{"deviceId": 1, "switch": True}, {"deviceId": 2, "shPos": 100}]}],
+        "lastItem": True,
+    }})
+
+    assert not bridge._scenes[1].matchable
+    assert bridge._plan_batch([(1, {"switch": True})]) == [(Messages.ACTION_SWITCH_DEVICE,
+                                                             {"deviceId": 1, "switch": True})]
+
+
+def test_room_with_unknown_member_is_not_collapsed(bridge):
+    bridge._onMessage({"type_int": 300, "payload": {
+        "devices": [{"deviceId": 1, "name": "Lamp", "devType": 101, "compId": 1},
+                    {"deviceId": 2, "name": "Spot", "devType": 101, "compId": 1}],
+        "rooms": [{"roomId": 1, "name": "Kitchen", "devices": [1, 2, 3]}],
+        "lastItem": True,
+    }})
+
+    plan = bridge._plan_batch([(1, {"switch": True}), (2, {"switch": True})])
+
+    assert [message_type for message_type, _ in plan] == [Messages.ACTION_SWITCH_DEVICE] * 2
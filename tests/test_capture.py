@@ -0,0 +1,77 @@
+import asyncio
+import json
+import pytest
+from mock import Mock
+from xcomfort.bridge import Bridge
+from xcomfort.capture import TrafficRecorder, read_capture, replay
+from xcomfort.emulator import BridgeEmulator
+
+
+@pytest.mark.asyncio
+async def test_recorder_buffers_and_redacts_auth(tmp_path):
+    path = str(tmp_path / "capture.jsonl")
+    recorder = TrafficRecorder(path, flush_interval=60)
+
+    recorder.record("in", {"type_int": 310, "payload": {"item": []}})
+    recorder.record("out", {"type_int": 37, "mc": 5, "payload": {"token": "secret"}})
+    assert not (tmp_path / "capture.jsonl").exists()
+    await recorder.close()
+
+    entries = list(read_capture(path))
+    assert [(direction, message["type_int"]) for _, direction, message in entries] == [("in", 310), ("out", 37)]
+    assert entries[1][2]["payload"] == "<redacted>"
+    assert entries[0][0] <= entries[1][0]
+    assert json.loads(open(path).readline())["version"] == 1
+
+
+@pytest.mark.asyncio
+async def test_recorder_flushes_when_buffer_is_full(tmp_path):
+    path = str(tmp_path / "capture.jsonl")
+    recorder = TrafficRecorder(path, flush_interval=60, max_buffer=10)
+
+    for i in range(25):
+        recorder.record("in", {"type_int": 2, "payload": {"i": i}})
+    await asyncio.sleep(0.05)
+
+    assert len(list(read_capture(path))) >= 9
+    await recorder.close()
+    assert [message["payload"]["i"] for _, _, message in read_capture(path)] == list(range(25))
+
+
+@pytest.mark.asyncio
+async def test_realtime_replay_keeps_spacing(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    path.write_text('{"version":1}\n'
+                    '[1.0,"in",{"type_int":2,"payload":{}}]\n'
+                    '[1.2,"in",{"type_int":2,"payload":{}}]\n'
+                    '[1.2,"out",{"type_int":1,"ref":3}]\n')
+    received = []
+
+    result = await replay(str(path), received.append, realtime=True, speed=2.0)
+
+    assert result.messages == 2 and len(received) == 2
+    assert 0.09 <= result.elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_recorded_session_replays_into_bridge(tmp_path):
+    path = str(tmp_path / "capture.jsonl")
+    async with BridgeEmulator("secret", device_count=4) as emulator:
+        bridge = Bridge(emulator.address, "secret")
+        bridge.start_capture(path)
+        run_task = asyncio.create_task(bridge.run())
+        await asyncio.wait_for(bridge.wait_for_initialization(), 10)
+        await emulator.push_state([{"deviceId": 1, "switch": True, "dimmvalue": 30}])
+        await asyncio.sleep(0.1)
+        await bridge.close()
+        await run_task
+
+    directions = {direction for _, direction, _ in read_capture(path)}
+    assert directions == {"in", "out"}
+
+    offline = Bridge("127.0.0.1", "secret", session=Mock())
+    result = await replay(path, offline._onMessage)
+
+    assert result.messages >= 3
+    assert sorted(offline._devices) == [1, 2, 3, 4]
+    assert offline._devices[1].state.value.dimmvalue == 30
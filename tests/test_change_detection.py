@@ -0,0 +1,90 @@
+from mock import Mock
+from xcomfort.devices import Light, Rocker, Switch
+
+
+def all_data(switch=True, dimmvalue=50, temp=20.5):
+    return {"type_int": 300, "payload": {
+        "devices": [{"deviceId": 1, "name": "Lamp", "devType": 101, "compId": 1,
+                     "switch": switch, "dimmvalue": dimmvalue}],
+        "rooms": [{"roomId": 1, "name": "Kitchen", "setpoint": 21.0, "temp": temp,
+                   "currentMode": 3, "state": 0}],
+        "lastItem": True,
+    }}
+
+
+def test_repeated_state_is_suppressed():
+    light = Light(None, 1, "", True)
+    received = []
+    light.state.subscribe(received.append)
+
+    light.handle_state({"switch": True, "dimmvalue": 50})
+    light.handle_state({"switch": True, "dimmvalue": 50})
+    light.handle_state({"switch": True, "dimmvalue": 60})
+
+    assert [state.dimmvalue for state in received[1:]] == [50, 60]
+    assert (light.emitted, light.suppressed) == (2, 1)
+
+
+def test_rocker_presses_are_never_suppressed():
+    rocker = Rocker(Mock(), 1, "", 1, {"curstate": 0})
+    received = []
+    rocker.state.subscribe(received.append)
+
+    rocker.handle_state({"curstate": 1})
+    rocker.handle_state({"curstate": 1})
+
+    assert len(received) == 3
+    assert rocker.suppressed == 0
+
+
+def test_resent_all_data_after_reconnect_is_suppressed(bridge):
+    bridge._onMessage(all_data())
+    bridge._onMessage(all_data())
+    bridge._onMessage(all_data(temp=21.0))
+
+    assert bridge.change_stats() == {"emitted": 3, "suppressed": 3}
+
+
+def test_suppression_can_be_disabled(make_bridge):
+    bridge = make_bridge(suppress_unchanged=False)
+
+    bridge._onMessage(all_data())
+    bridge._onMessage(all_data())
+
+    assert bridge.change_stats() == {"emitted": 4, "suppressed": 0}
+
+
+def test_disabling_applies_to_existing_devices(bridge):
+    bridge._onMessage(all_data())
+
+    bridge.suppress_unchanged = False
+    bridge._onMessage(all_data())
+
+    assert bridge._devices[1].suppress_unchanged is False
+    assert bridge.change_stats() == {"emitted": 4, "suppressed": 0}
+
+
+def test_unmodelled_payload_fields_are_not_suppressed():
+    switch = Switch(Mock(), 1, "Smartstikk", 1, {"switch": True, "monitorPower": True})
+    received = []
+    switch.state.subscribe(received.append)
+
+    switch.handle_state({"switch": True, "power": 10.0})
+    switch.handle_state({"switch": True, "power": 10.0})
+    switch.handle_state({"switch": True, "power": 25.0})
+
+    assert [state.payload["power"] for state in received[1:]] == [10.0, 25.0]
+
+
+def test_room_update_of_unmodelled_field_is_emitted(bridge):
+    bridge._onMessage(all_data())
+    room = bridge._rooms[1]
+    received = []
+    room.state.subscribe(received.append)
+
+    bridge._onMessage({"type_int": 310, "payload": {"item": [{"roomId": 1, "windowsOpen": True}]}})
+    bridge._onMessage({"type_int": 310, "payload": {"item": [{"roomId": 1, "windowsOpen": True}]}})
+
+    assert len(received) == 2
+    assert received[-1].raw["windowsOpen"] is True
+    assert received[-1].temperature == received[0].temperature
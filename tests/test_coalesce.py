@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from xcomfort.bridge import RctMode
+from xcomfort.coalesce import CommandCoalescer
+from xcomfort.connection import CommandResult
+from xcomfort.messages import Messages
+
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message_type, payload):
+        self.sent.append((message_type, payload))
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(CommandResult(len(self.sent), 0.01, {}))
+        return future
+
+
+def slide(value):
+    return {"deviceId": 1, "dimmvalue": value}
+
+
+@pytest.mark.asyncio
+async def test_burst_sends_first_and_last_value():
+    recorder = Recorder()
+    coalescer = CommandCoalescer(recorder.send, min_interval=0.05)
+
+    futures = [await coalescer.submit(("device", 1), Messages.ACTION_SLIDE_DEVICE, slide(v)) for v in range(10)]
+    await asyncio.gather(*futures)
+
+    assert [payload["dimmvalue"] for _, payload in recorder.sent] == [0, 9]
+    assert coalescer.dropped == 8
+    assert coalescer.latency_saved > 0
+
+
+@pytest.mark.asyncio
+async def test_keys_are_limited_independently():
+    recorder = Recorder()
+    coalescer = CommandCoalescer(recorder.send, min_interval=10)
+
+    await coalescer.submit(("device", 1), Messages.ACTION_SLIDE_DEVICE, slide(1))
+    await coalescer.submit(("device", 2), Messages.ACTION_SLIDE_DEVICE, {"deviceId": 2, "dimmvalue": 1})
+
+    assert len(recorder.sent) == 2
+
+
+@pytest.mark.asyncio
+async def test_uncoalesced_command_replaces_pending_value():
+    recorder = Recorder()
+    coalescer = CommandCoalescer(recorder.send, min_interval=10)
+
+    await coalescer.submit(("device", 1), Messages.ACTION_SLIDE_DEVICE, slide(10))
+    held = await coalescer.submit(("device", 1), Messages.ACTION_SLIDE_DEVICE, slide(20))
+    await coalescer.submit(("device", 1), Messages.ACTION_SWITCH_DEVICE, {"deviceId": 1, "switch": False},
+                           coalesce=False)
+
+    assert (await held).mc == 2
+    assert [message_type for message_type, _ in recorder.sent] == [Messages.ACTION_SLIDE_DEVICE,
+                                                                   Messages.ACTION_SWITCH_DEVICE]
+    assert coalescer.stats()["pending"] == 0
+
+
+def heating_bridge(make_bridge):
+    bridge = make_bridge()
+    bridge.enable_coalescing(min_interval=0.05)
+    sent = []
+
+    async def send_now(message_type, payload):
+        sent.append(payload)
+
+    bridge.coalescer._send = send_now
+    bridge._onMessage({"type_int": 300, "payload": {"rooms": [
+        {"roomId": 1, "name": "Room", "setpoint": 21.0, "temp": 20.0, "currentMode": 3, "mode": 3, "state": 0,
+         "modes": [{"mode": 2, "value": 19.0}, {"mode": 3, "value": 21.0}]}], "lastItem": True}})
+    return bridge, bridge._rooms[1], sent
+
+
+@pytest.mark.asyncio
+async def test_mode_change_after_held_setpoint_is_sent_last(make_bridge):
+    bridge, room, sent = heating_bridge(make_bridge)
+
+    await room.set_target_temperature(22.0)
+    await room.set_target_temperature(23.0)
+    await room.set_mode(RctMode.Eco)
+    await asyncio.sleep(0.1)
+
+    # The held Comfort setpoint goes out before the mode change, not after it
+    assert [(payload["mode"], payload["setpoint"]) for payload in sent] == [(3, 22.0), (3, 23.0), (2, 19.0)]
+    assert sent[-1]["mode"] == RctMode.Eco.value
+    assert bridge.coalescer.stats()["pending"] == 0
+
@@ -0,0 +1,40 @@
+import json
+import pytest
+from base64 import b64decode, b64encode
+from Crypto.Cipher import AES
+from xcomfort.codec import AesFrameCodec, StdlibJson
+from xcomfort.connection import _pad_string
+
+KEY = bytes(range(32))
+IV = bytes(range(16, 32))
+
+
+def reference_encode(message):
+    msg = _pad_string(json.dumps(message).encode())
+    return b64encode(AES.new(KEY, AES.MODE_CBC, IV).encrypt(msg)).decode() + '\u0004'
+
+
+@pytest.mark.parametrize("length", [0, 1, 5, 15, 16, 17, 31, 32, 47, 48, 63, 64, 100, 1000, 1023, 1024, 1025, 4000])
+def test_codec_matches_reference_cbc(length):
+    codec = AesFrameCodec(KEY, IV, StdlibJson)
+    message = {"type_int": 310, "payload": {"name": "x" * length}}
+
+    frame = reference_encode(message)
+
+    assert codec.encode(message) == frame
+    assert codec.decode(frame) == message
+
+
+def test_codec_decodes_empty_frame():
+    codec = AesFrameCodec(KEY, IV)
+
+    assert codec.decode(b64encode(AES.new(KEY, AES.MODE_CBC, IV).encrypt(bytes(16))).decode()) == {}
+
+
+def test_codec_rejects_truncated_frame():
+    codec = AesFrameCodec(KEY, IV)
+
+    frame = b64decode(reference_encode({"type_int": 1, "ref": 1}))
+
+    with pytest.raises(ValueError):
+        codec.decode(b64encode(frame[:-1]).decode())
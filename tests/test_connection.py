@@ -0,0 +1,286 @@
+import asyncio
+import aiohttp
+import pytest
+from xcomfort.bridge import Bridge
+from xcomfort.codec import AesFrameCodec
+from xcomfort.connection import (CommandTimeoutError, DeviceNotDimmableError, LivenessTimeoutError,
+                                 SecureBridgeConnection, UnknownDeviceError)
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.messages import Messages
+from xcomfort.metrics import Metrics
+from xcomfort.observable import Gate, Overflow
+
+KEY = bytes(range(32))
+IV = bytes(range(16))
+
+
+class FakeMessage:
+    def __init__(self, data, type=aiohttp.WSMsgType.TEXT):
+        self.type = type
+        self.data = data
+
+
+class FakeWebSocket:
+    """Replays encrypted frames and records what the client writes."""
+
+    def __init__(self, messages, write_delay=0.0):
+        codec = AesFrameCodec(KEY, IV)
+        self._inbound = asyncio.Queue()
+        for message in messages:
+            self._inbound.put_nowait(FakeMessage(codec.encode(message)))
+        self._codec = codec
+        self.write_delay = write_delay
+        self.sent = []
+        self.closed = False
+
+    def feed(self, message):
+        self._inbound.put_nowait(FakeMessage(self._codec.encode(message)))
+
+    async def receive(self, timeout=None):
+        msg = await asyncio.wait_for(self._inbound.get(), timeout)
+        if msg is None:
+            return FakeMessage(None, aiohttp.WSMsgType.CLOSED)
+        return msg
+
+    async def send_str(self, data):
+        if self.write_delay:
+            await asyncio.sleep(self.write_delay)
+        self.sent.append(self._codec.decode(data))
+
+    async def close(self):
+        self.closed = True
+        self._inbound.put_nowait(None)
+
+
+def state_info(mc):
+    return {"type_int": 310, "mc": mc, "payload": {"item": []}}
+
+
+@pytest.mark.asyncio
+async def test_pump_does_not_wait_for_acks():
+    ws = FakeWebSocket([state_info(mc) for mc in range(1, 6)], write_delay=0.05)
+    connection = SecureBridgeConnection(ws, KEY, IV, "bridge")
+    received = []
+    connection.messages.subscribe(received.append)
+
+    pump = asyncio.create_task(connection.pump())
+    while len(received) < 5:
+        await asyncio.sleep(0.01)
+
+    # All five frames were dispatched while the first writes are still in flight
+    assert len(ws.sent) < 5
+    await connection.close()
+    await pump
+
+
+@pytest.mark.asyncio
+async def test_pump_waits_at_backpressure_gate():
+    ws = FakeWebSocket([state_info(mc) for mc in range(1, 6)])
+    connection = SecureBridgeConnection(ws, KEY, IV, "bridge")
+    connection.backpressure = Gate()
+    release = asyncio.Event()
+    received = []
+
+    async def slow(message):
+        await release.wait()
+        received.append(message)
+
+    connection.messages.subscribe(slow, queue_size=2, overflow=Overflow.BLOCK, gate=connection.backpressure)
+    pump = asyncio.create_task(connection.pump())
+    await asyncio.sleep(0.05)
+
+    # The pump stopped reading once the subscriber's queue filled up
+    assert ws._inbound.qsize() > 0
+    assert not connection.backpressure.is_open
+
+    release.set()
+    while len(received) < 5:
+        await asyncio.sleep(0.01)
+    assert [message["mc"] for message in received] == [1, 2, 3, 4, 5]
+    await connection.close()
+    await pump
+
+
+@pytest.mark.asyncio
+async def test_writer_preserves_frame_order():
+    ws = FakeWebSocket([])
+    connection = SecureBridgeConnection(ws, KEY, IV, "bridge")
+    pump = asyncio.create_task(connection.pump())
+    await asyncio.sleep(0)
+
+    ws.feed(state_info(7))
+    await asyncio.sleep(0.01)
+    await connection.send_message(281, {"deviceId": 1, "switch": True})
+    ws.feed(state_info(8))
+    await asyncio.sleep(0.01)
+
+    assert [(m["type_int"], m.get("ref", m.get("mc"))) for m in ws.sent] == [
+        (240, 1), (242, 2), (2, 3), (1, 7), (281, 4), (1, 8)]
+    assert connection.writer_stats()["frames_written"] == 6
+
+    await connection.close()
+    await pump
+
+
+@pytest.mark.asyncio
+async def test_send_message_times_out_without_ack():
+    ws = FakeWebSocket([])
+    connection = SecureBridgeConnection(ws, KEY, IV, "bridge")
+    connection.command_timeout = 0.05
+    pump = asyncio.create_task(connection.pump())
+    await asyncio.sleep(0)
+
+    ack = await connection.send_message(281, {"deviceId": 1, "switch": True})
+
+    with pytest.raises(CommandTimeoutError):
+        await ack
+    assert connection.command_stats()["timed_out"] >= 1
+
+    await connection.close()
+    await pump
+
+
+@pytest.mark.asyncio
+async def test_in_flight_window_blocks_until_ack():
+    ws = FakeWebSocket([])
+    connection = SecureBridgeConnection(ws, KEY, IV, "bridge")
+    connection.max_in_flight = 4
+    pump = asyncio.create_task(connection.pump())
+    while connection.mc < 3:
+        await asyncio.sleep(0)
+
+    # pump() itself has three commands in flight, leaving one slot
+    first = await connection.send_message(281, {"deviceId": 1, "switch": True})
+    second = asyncio.create_task(connection.send_message(281, {"deviceId": 2, "switch": True}))
+    await asyncio.sleep(0.01)
+    assert not second.done()
+
+    ws.feed({"type_int": 1, "ref": 4})
+    await first
+    await asyncio.wait_for(second, 1)
+
+    await connection.close()
+    await pump
+
+
+@pytest.mark.asyncio
+async def test_commands_resolve_against_emulator():
+    async with BridgeEmulator("secret", device_count=2) as emulator:
+        bridge = Bridge(emulator.address, "secret")
+        run_task = asyncio.create_task(bridge.run())
+        devices = await asyncio.wait_for(bridge.get_devices(), 10)
+
+        result = await (await devices[1].switch(True))
+        assert result.latency > 0
+
+        with pytest.raises(DeviceNotDimmableError):
+            await (await devices[2].dimm(50))
+        with pytest.raises(UnknownDeviceError):
+            await (await bridge.switch_device(99, {"switch": True}))
+
+        await bridge.close()
+        await run_task
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_sent_while_idle():
+    ws = FakeWebSocket([])
+    connection = SecureBridgeConnection(ws, KEY, IV, "bridge")
+    connection.heartbeat_interval = 0.02
+    pump = asyncio.create_task(connection.pump())
+
+    def heartbeats():
+        return [m for m in ws.sent if m["type_int"] == Messages.HEARTBEAT]
+
+    # One from pump() itself, the rest from the idle timer
+    while len(heartbeats()) < 3:
+        await asyncio.sleep(0.01)
+    assert connection.heartbeats_sent >= len(heartbeats()) - 1
+
+    await connection.close()
+    await pump
+
+
+@pytest.mark.asyncio
+async def test_idle_timeout_tears_down_connection():
+    ws = FakeWebSocket([])
+    connection = SecureBridgeConnection(ws, KEY, IV, "bridge")
+    connection.idle_timeout = 0.05
+    metrics = Metrics()
+    connection.enable_metrics(metrics)
+    pump = asyncio.create_task(connection.pump())
+    await asyncio.sleep(0.02)
+    ws.feed(state_info(1))
+
+    with pytest.raises(LivenessTimeoutError) as error:
+        await asyncio.wait_for(pump, 1)
+
+    assert ws.closed
+    assert error.value.idle >= 0.05
+    assert connection.last_seen is not None
+    snapshot = metrics.snapshot()
+    assert snapshot["liveness_timeouts"] == 1
+    assert snapshot["liveness_detection_seconds"]["count"] == 1
+    assert snapshot["liveness_detection_seconds"]["sum"] >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_bridge_reconnects_after_bridge_goes_silent():
+    async with BridgeEmulator("secret", device_count=2) as emulator:
+        bridge = Bridge(emulator.address, "secret")
+        bridge.heartbeat_interval = 0.05
+        bridge.idle_timeout = 0.2
+        run_task = asyncio.create_task(bridge.run())
+        await asyncio.wait_for(bridge.wait_for_initialization(), 10)
+
+        # Heartbeats keep a quiet but healthy connection alive
+        await asyncio.sleep(0.4)
+        assert bridge.liveness_timeouts == 0
+
+        emulator.stall()
+        while bridge.reconnect.reconnects == 0:
+            await asyncio.sleep(0.01)
+
+        assert bridge.liveness_timeouts == 1
+        assert 0.2 <= bridge.last_detection_latency < 1
+        assert emulator.connections_accepted == 2
+
+        await bridge.close()
+        await run_task
+
+
+@pytest.mark.asyncio
+async def test_close_under_traffic_drops_buffered_frames():
+    ws = FakeWebSocket([])
+    connection = SecureBridgeConnection(ws, KEY, IV, "bridge")
+    pump = asyncio.create_task(connection.pump())
+    await asyncio.sleep(0)
+
+    for mc in range(1, 50):
+        ws.feed(state_info(mc))
+    await connection.close()
+    await pump
+
+    with pytest.raises(ConnectionError):
+        await connection.send_message(281, {"deviceId": 1, "switch": True})
+    assert not any(m.get("type_int") == 281 for m in ws.sent)
+
+
+@pytest.mark.asyncio
+async def test_send_fails_fast_after_remote_disconnect():
+    ws = FakeWebSocket([])
+    connection = SecureBridgeConnection(ws, KEY, IV, "bridge")
+    pump = asyncio.create_task(connection.pump())
+    await asyncio.sleep(0)
+
+    # The peer goes away; close() is never called on the connection
+    ws._inbound.put_nowait(None)
+    await pump
+    written = len(ws.sent)
+
+    assert not connection.closed
+    with pytest.raises(ConnectionError):
+        await connection.send_message(281, {"deviceId": 1, "switch": True})
+    with pytest.raises(ConnectionError):
+        await connection.send({"type_int": 2})
+    assert len(ws.sent) == written
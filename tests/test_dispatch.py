@@ -0,0 +1,55 @@
+from mock import Mock
+from xcomfort.bridge import Bridge
+from xcomfort.messages import Messages
+
+
+def test_unknown_message_type_is_logged_not_raised(bridge):
+    bridge._onMessage({"type_int": 9999, "payload": {}})
+
+    bridge.logger.assert_called_once()
+
+
+def test_registered_handler_receives_payload_until_unregistered(bridge):
+    received = []
+
+    unregister = bridge.register_handler(Messages.SET_HOME_DATA, received.append)
+    bridge._onMessage({"type_int": 303, "payload": {"name": "home"}})
+    unregister()
+    bridge._onMessage({"type_int": 303, "payload": {"name": "again"}})
+
+    assert received == [{"name": "home"}]
+
+
+def test_registered_handler_runs_after_builtin_handler(bridge):
+    calls = []
+    bridge._handle_device_payload = lambda payload: calls.append("builtin")
+    bridge.register_handler(Messages.SET_ALL_DATA, lambda payload: calls.append("user"))
+
+    bridge._onMessage({"type_int": 300, "payload": {"devices": [{}]}})
+
+    assert calls == ["builtin", "user"]
+
+
+def test_subclass_handlers_are_dispatched():
+    class CustomBridge(Bridge):
+        def _handle_SET_DIAGNOSTICS(self, payload):
+            self.diagnostics = payload
+
+    bridge = CustomBridge("127.0.0.1", "key", session=Mock())
+
+    bridge._onMessage({"type_int": 304, "payload": {"uptime": 1}})
+
+    assert bridge.diagnostics == {"uptime": 1}
+
+
+def test_handler_for_type_unknown_to_the_library(bridge):
+    received = []
+
+    unregister = bridge.register_handler(9999, received.append)
+    bridge._onMessage({"type_int": 9999, "payload": {"value": 1}})
+    unregister()
+    bridge._onMessage({"type_int": 9999, "payload": {"value": 2}})
+
+    assert received == [{"value": 1}]
+    # Logged as unknown only once the handler is gone
+    bridge.logger.assert_called_once()
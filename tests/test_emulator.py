@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from xcomfort.bridge import Bridge
+from xcomfort.connection import setup_secure_connection
+from xcomfort.emulator import BridgeEmulator
+
+
+@pytest.mark.asyncio
+async def test_bridge_initializes_against_emulator():
+    async with BridgeEmulator("secret", device_count=7, room_count=3, comp_count=4, devices_per_frame=3) as emulator:
+        bridge = Bridge(emulator.address, "secret")
+        run_task = asyncio.create_task(bridge.run())
+
+        devices = await asyncio.wait_for(bridge.get_devices(), 10)
+        rooms = await bridge.get_rooms()
+        comps = await bridge.get_comps()
+
+        assert len(devices) == 7
+        assert len(rooms) == 3
+        assert len(comps) == 4
+
+        await bridge.close()
+        await run_task
+
+
+@pytest.mark.asyncio
+async def test_emulator_pushes_events():
+    async with BridgeEmulator("secret", device_count=2, event_rate=500) as emulator:
+        bridge = Bridge(emulator.address, "secret")
+        run_task = asyncio.create_task(bridge.run())
+        devices = await asyncio.wait_for(bridge.get_devices(), 10)
+
+        received = []
+        devices[1].state.subscribe(lambda state: received.append(state))
+        while len(received) < 5:
+            await asyncio.sleep(0.01)
+
+        await bridge.close()
+        await run_task
+        assert emulator.events_sent >= 5
+
+
+@pytest.mark.asyncio
+async def test_emulator_rejects_wrong_authkey():
+    async with BridgeEmulator("secret") as emulator:
+        import aiohttp
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(Exception, match="Login failed"):
+                await setup_secure_connection(session, emulator.address, "wrong")
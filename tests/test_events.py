@@ -0,0 +1,158 @@
+import asyncio
+import pytest
+from xcomfort.bridge import Bridge
+from xcomfort.devices import Light, Switch
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.messages import Messages
+
+
+def all_data():
+    return {"type_int": 300, "payload": {
+        "devices": [
+            {"deviceId": 1, "name": "Lamp", "devType": 101, "compId": 1, "switch": False, "dimmvalue": 0},
+            {"deviceId": 2, "name": "Spot", "devType": 101, "compId": 1, "switch": False, "dimmvalue": 0},
+            {"deviceId": 3, "name": "Outlet", "devType": 100, "compId": 1, "switch": False, "dimmvalue": 0,
+             "monitorPower": True},
+        ],
+        "rooms": [{"roomId": 1, "name": "Kitchen", "devices": [2, 3], "temp": 20.0}],
+        "lastItem": True,
+    }}
+
+
+def device_state(device_id, switch):
+    return {"type_int": 310, "payload": {"item": [{"deviceId": device_id, "switch": switch, "dimmvalue": 0}]}}
+
+
+async def collect(events, received, release=None):
+    async for event in events:
+        if release is not None:
+            await release.wait()
+        received.append(event)
+
+
+async def consume(bridge, **filters):
+    """Start iterating, so the subscription exists before the test sends anything."""
+    received = []
+    task = asyncio.create_task(collect(bridge.events(**filters), received))
+    await asyncio.sleep(0)
+    return task, received
+
+
+async def stop(task):
+    await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_events_filtered_by_device_and_message_type(bridge):
+    bridge._onMessage(all_data())
+    task, received = await consume(bridge, device_ids=[1], message_types=[Messages.SET_STATE_INFO])
+
+    bridge._onMessage(device_state(2, True))
+    bridge._onMessage({"type_int": 291, "payload": {"deviceId": 1, "switch": True, "dimmvalue": 0}})
+    bridge._onMessage(device_state(1, False))
+    await stop(task)
+
+    assert [(event.kind, event.key) for event in received] == [("devices", 1)]
+    assert received[0].message_type is Messages.SET_STATE_INFO
+    assert received[0].item is bridge._devices[1]
+    assert received[0].state.switch is False
+    assert bridge.stats()["events"]["subscribers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_events_filtered_by_room_and_device_class(bridge):
+    bridge._onMessage(all_data())
+    task, received = await consume(bridge, room_ids=[1], device_classes=Light)
+
+    for device_id in (1, 2, 3):
+        bridge._onMessage(device_state(device_id, True))
+    bridge._onMessage({"type_int": 310, "payload": {"item": [{"roomId": 1, "temp": 21.0}]}})
+    await stop(task)
+
+    assert [event.key for event in received] == [2]
+    assert isinstance(bridge._devices[3], Switch)
+
+
+@pytest.mark.asyncio
+async def test_room_events(bridge):
+    bridge._onMessage(all_data())
+    task, received = await consume(bridge, room_ids=[1])
+
+    bridge._onMessage({"type_int": 310, "payload": {"item": [{"roomId": 1, "temp": 21.0}]}})
+    bridge._onMessage(device_state(1, True))
+    await stop(task)
+
+    assert [(event.kind, event.key) for event in received] == [("rooms", 1)]
+    assert received[0].state.temperature == 21.0
+
+
+@pytest.mark.asyncio
+async def test_no_event_built_without_a_match(bridge):
+    bridge._onMessage(all_data())
+    task, received = await consume(bridge, device_ids=[1])
+
+    bridge._onMessage(device_state(2, True))
+    bridge._onMessage({"type_int": 310, "payload": {"item": [{"roomId": 1, "temp": 21.0}]}})
+    await stop(task)
+
+    assert received == []
+    assert bridge.stats()["events"]["published"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_drops_oldest(bridge):
+    bridge._onMessage(all_data())
+    release = asyncio.Event()
+    received = []
+    task = asyncio.create_task(collect(bridge.events(device_ids=[1], queue_size=2), received, release))
+    await asyncio.sleep(0)
+
+    for switch in (True, False, True, False, True):
+        bridge._onMessage(device_state(1, switch))
+        await asyncio.sleep(0)
+    stats = bridge.stats()["events"]
+    assert (stats["subscribers"], stats["published"], stats["dropped"]) == (1, 5, 2)
+    assert [(queue["pending"], queue["delivered"], queue["dropped"]) for queue in stats["queues"]] == [(2, 1, 2)]
+    release.set()
+    await stop(task)
+
+    # The first event was taken before the consumer stalled, then only the last two were kept
+    assert [event.state.switch for event in received] == [True, False, True]
+
+
+@pytest.mark.asyncio
+async def test_events_survive_reconnect():
+    async with BridgeEmulator("secret", device_count=2) as emulator:
+        bridge = Bridge(emulator.address, "secret")
+        run_task = asyncio.create_task(bridge.run())
+        await asyncio.wait_for(bridge.wait_for_initialization(), 10)
+        task, received = await consume(bridge, device_ids=[1])
+
+        await emulator.push_state([{"deviceId": 1, "switch": True, "dimmvalue": 10}])
+        while not received:
+            await asyncio.sleep(0.01)
+
+        await emulator.drop_connections()
+        while bridge.reconnect.reconnects == 0 or not bridge._connected.is_set():
+            await asyncio.sleep(0.01)
+        await emulator.push_state([{"deviceId": 1, "switch": True, "dimmvalue": 20}])
+        while received[-1].state.dimmvalue != 20:
+            await asyncio.sleep(0.01)
+
+        await stop(task)
+        await bridge.close()
+        await run_task
+
+
+@pytest.mark.asyncio
+async def test_changes_outside_dispatch_have_no_message_type(bridge):
+    bridge._onMessage(all_data())
+    task, received = await consume(bridge, device_ids=[1])
+
+    bridge._onMessage(device_state(1, True))
+    bridge._devices[1].handle_state({"switch": False, "dimmvalue": 0})
+    await stop(task)
+
+    assert [event.type_int for event in received] == [310, None]
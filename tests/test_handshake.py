@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import aiohttp
+import pytest
+from xcomfort.connection import HandshakeLimiter, setup_secure_connection
+from xcomfort.emulator import BridgeEmulator
+
+
+@pytest.mark.asyncio
+async def test_limiter_caps_concurrency():
+    limiter = HandshakeLimiter(2)
+    running = []
+    peak = 0
+
+    async def handshake():
+        nonlocal peak
+        async with limiter:
+            running.append(1)
+            peak = max(peak, len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+    await asyncio.gather(*(handshake() for _ in range(6)))
+
+    assert peak == 2
+    assert limiter.active == 0
+    assert limiter.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_releases_on_error():
+    limiter = HandshakeLimiter(1)
+    with pytest.raises(RuntimeError):
+        async with limiter:
+            raise RuntimeError()
+    async with limiter:
+        assert limiter.active == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("offload_crypto", [True, False])
+async def test_handshake_with_and_without_offload(offload_crypto):
+    async with BridgeEmulator("secret", max_clients=4) as emulator, aiohttp.ClientSession() as session:
+        limiter = HandshakeLimiter(1)
+        connections = await asyncio.gather(*(
+            setup_secure_connection(session, emulator.address, "secret", offload_crypto=offload_crypto,
+                                    limiter=limiter)
+            for _ in range(3)))
+
+        assert all("queued" in connection.handshake_timings for connection in connections)
+        for connection in connections:
+            await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_raising_limit_releases_waiters():
+    limiter = HandshakeLimiter(1)
+    release = asyncio.Event()
+
+    async def handshake():
+        async with limiter:
+            await release.wait()
+
+    tasks = [asyncio.create_task(handshake()) for _ in range(4)]
+    await asyncio.sleep(0.01)
+    assert (limiter.active, limiter.waiting) == (1, 3)
+
+    limiter.limit = 4
+    await asyncio.sleep(0.01)
+    assert (limiter.active, limiter.waiting) == (4, 0)
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+def test_release_wakes_handshakes_queued_on_other_loops():
+    limiter = HandshakeLimiter(1)
+    holding = threading.Event()
+    order = []
+
+    async def hold():
+        async with limiter:
+            holding.set()
+            await asyncio.sleep(0.05)
+            order.append("first")
+
+    async def queue():
+        holding.wait()
+        async with limiter:
+            order.append("second")
+
+    def run(coro):
+        asyncio.run(asyncio.wait_for(coro(), 5))
+
+    threads = [threading.Thread(target=run, args=(coro,)) for coro in (hold, queue)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert order == ["first", "second"]
+    assert (limiter.active, limiter.waiting) == (0, 0)
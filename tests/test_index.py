@@ -0,0 +1,75 @@
+from xcomfort.devices import Light, Rocker, Switch
+
+
+def all_data():
+    return {"type_int": 300, "payload": {
+        "devices": [
+            {"deviceId": 1, "name": "Lamp", "devType": 101, "compId": 1, "dimmable": True},
+            {"deviceId": 2, "name": "Spot", "devType": 101, "compId": 1, "dimmable": False},
+            {"deviceId": 3, "name": "Outlet", "devType": 100, "compId": 2, "monitorPower": True},
+            {"deviceId": 4, "name": "Rocker", "devType": 220, "compId": 3, "curstate": 0, "controlId": [1, 2]},
+        ],
+        "comps": [{"compId": 1, "name": "Dimmer", "compType": 77}],
+        "rooms": [
+            {"roomId": 1, "name": "Kitchen", "devices": [1, 3]},
+            {"roomId": 2, "name": "Hall", "devices": [2, 3, 99]},
+        ],
+        "lastItem": True,
+    }}
+
+
+def test_find_devices_by_room_class_comp_and_name(bridge):
+    bridge._onMessage(all_data())
+
+    assert [d.device_id for d in bridge.find_devices(room_id=1, device_class=Light)] == [1]
+    assert [d.device_id for d in bridge.find_devices(room_id=2)] == [2, 3]
+    assert [d.device_id for d in bridge.find_devices(comp_id=1)] == [1, 2]
+    assert [d.device_id for d in bridge.find_devices(name="Outlet")] == [3]
+    assert isinstance(bridge.find_devices(name="Outlet")[0], Switch)
+    assert [d.device_id for d in bridge.find_devices()] == [1, 2, 3, 4]
+    assert [room.room_id for room in bridge.rooms_of(3)] == [1, 2]
+    assert bridge.find_rooms("Hall") == [bridge._rooms[2]]
+    assert bridge.find_comps("Dimmer") == [bridge._comps[1]]
+
+
+def test_indexes_follow_added_and_deleted_devices(bridge):
+    bridge._onMessage(all_data())
+
+    bridge._onMessage({"type_int": 290, "payload": {"deviceId": 5, "name": "Lamp", "devType": 101, "compId": 1}})
+    bridge._onMessage({"type_int": 296, "payload": {"deviceId": 1}})
+    bridge._onMessage({"type_int": 297, "payload": {"roomId": 2}})
+
+    assert [d.device_id for d in bridge.find_devices(name="Lamp")] == [5]
+    assert [d.device_id for d in bridge.find_devices(comp_id=1)] == [2, 5]
+    assert bridge.find_devices(room_id=1) == [bridge._devices[3]]
+    assert bridge.find_devices(room_id=2) == []
+    assert bridge.find_rooms("Hall") == []
+
+
+def test_room_membership_updated_on_resend(bridge):
+    bridge._onMessage(all_data())
+    data = all_data()
+    data["payload"]["rooms"][0]["devices"] = [2]
+    bridge._onMessage(data)
+
+    assert [d.device_id for d in bridge.find_devices(room_id=1)] == [2]
+    assert [room.room_id for room in bridge.rooms_of(1)] == []
+
+
+def test_controllers_and_name_with_controlled(bridge):
+    bridge._onMessage(all_data())
+    rocker = bridge._devices[4]
+
+    assert isinstance(rocker, Rocker)
+    assert bridge.controllers_of(2) == [rocker]
+    assert rocker.name_with_controlled == "Rocker (Lamp, Spot)"
+
+    bridge._onMessage({"type_int": 296, "payload": {"deviceId": 2}})
+    assert rocker.name_with_controlled == "Rocker (Lamp)"
+
+    data = all_data()
+    data["payload"]["devices"][3]["controlId"] = [3]
+    bridge._onMessage(data)
+    assert bridge.controllers_of(1) == []
+    assert bridge.controllers_of(3) == [rocker]
+    assert rocker.name_with_controlled == "Rocker (Outlet)"
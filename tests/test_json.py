@@ -0,0 +1,53 @@
+import json
+import pytest
+from xcomfort.codec import AesFrameCodec, OrjsonJson, StdlibJson
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.messages import Messages, ShadeOperationState
+
+pytest.importorskip("orjson")
+
+
+def captured_payloads():
+    emulator = BridgeEmulator("secret", device_count=20, room_count=3, comp_count=5, scene_count=2)
+    yield {"type_int": 300, "mc": 7, "payload": {
+        "devices": list(emulator.devices.values()), "comps": list(emulator.comps.values()),
+        "rooms": list(emulator.rooms.values()), "scenes": list(emulator.scenes.values()), "lastItem": True}}
+    yield {"type_int": 310, "mc": 8, "payload": {"item": [
+        {"deviceId": 12, "info": [{"text": "1222", "type": 2, "value": "20.9"},
+                                  {"text": "1223", "type": 2, "value": "42.5"}]},
+        {"roomId": 1, "temp": 21.37, "humidity": 40.0, "power": 0.0, "setpoint": 21.5},
+        {"deviceId": 3, "curstate": 1, "shPos": 100, "shSafety": 0}]}}
+    yield {"type_int": 303, "payload": {"name": "Hjemme på hytta ❄", "tz": "Europe/Oslo", "lat": 59.91, "lon": -10.75}}
+    yield {"type_int": 1, "ref": 2 ** 40}
+    yield {"type_int": 0, "ref": 3, "info": -99}
+
+
+@pytest.mark.parametrize("message", list(captured_payloads()))
+def test_orjson_parses_like_stdlib(message):
+    data = json.dumps(message).encode()
+
+    assert OrjsonJson.loads(data) == StdlibJson.loads(data) == message
+    assert OrjsonJson.loads(OrjsonJson.dumps(message)) == message
+
+
+def test_orjson_output_stays_ascii():
+    message = {"type_int": 257, "payload": {"roomId": 1, "name": "Stue ☀ og kjøkken"}}
+
+    data = OrjsonJson.dumps(message)
+
+    assert data.isascii()
+    assert data == StdlibJson.dumps(message)
+
+
+def test_orjson_serializes_enums_like_stdlib():
+    message = {"type_int": Messages.SET_DEVICE_SHADING_STATE.value,
+               "payload": {"deviceId": 1, "state": ShadeOperationState.GO_TO, "value": 50}}
+
+    assert json.loads(OrjsonJson.dumps(message)) == json.loads(StdlibJson.dumps(message))
+
+
+@pytest.mark.parametrize("json_codec", [StdlibJson, OrjsonJson])
+def test_frames_round_trip_with_either_codec(json_codec):
+    codec = AesFrameCodec(bytes(32), bytes(16), json_codec)
+    for message in captured_payloads():
+        assert AesFrameCodec(bytes(32), bytes(16), StdlibJson).decode(codec.encode(message)) == message
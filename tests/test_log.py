@@ -0,0 +1,61 @@
+import logging
+from mock import Mock, patch
+from xcomfort.bridge import Bridge
+from xcomfort.devices import Rocker, Switch
+from xcomfort.log import DISPATCH, LoggerAdapter, RateLimiter
+
+
+def test_rate_limiter_reports_suppressed_count():
+    limiter = RateLimiter(interval=60)
+
+    with patch("xcomfort.log.time.monotonic", side_effect=[0, 1, 2, 61]):
+        assert limiter.check("key") == 0
+        assert limiter.check("key") is None
+        assert limiter.check("key") is None
+        assert limiter.check("key") == 2
+
+
+def test_adapter_formats_lazily():
+    class Payload:
+        def __str__(self):
+            raise AssertionError("formatted")
+
+    LoggerAdapter().log(DISPATCH, logging.DEBUG, "payload %s", Payload())
+
+
+def test_adapter_forwards_to_callback_and_logging(caplog):
+    callback = Mock()
+    adapter = LoggerAdapter(callback)
+
+    with caplog.at_level(logging.WARNING, logger="xcomfort"):
+        adapter.log(DISPATCH, logging.WARNING, "failed %s", 1)
+
+    callback.assert_called_once_with("failed 1")
+    assert caplog.records[0].name == "xcomfort.dispatch"
+    assert caplog.records[0].getMessage() == "failed 1"
+
+
+def test_unknown_messages_are_rate_limited(caplog):
+    bridge = Bridge("127.0.0.1", "key", session=Mock())
+
+    with caplog.at_level(logging.DEBUG, logger="xcomfort.dispatch"):
+        for _ in range(100):
+            bridge._onMessage({"type_int": 9999, "payload": {}})
+
+    assert len(caplog.records) == 1
+
+
+def test_legacy_logger_callable_logs_through_logging(caplog):
+    bridge = Bridge("127.0.0.1", "key", session=Mock())
+
+    with caplog.at_level(logging.INFO, logger="xcomfort.bridge"):
+        bridge.logger("hello")
+
+    assert caplog.records[0].getMessage() == "hello"
+
+
+def test_device_state_updates_do_not_print(capsys):
+    Rocker(Mock(), 1, "", 1, {}).handle_state({"curstate": 1})
+    Switch(Mock(), 2, "", 1, {}).handle_state({"switch": True})
+
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+from mock import AsyncMock, Mock
+from xcomfort.bridge import Bridge
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.manager import BridgeManager
+
+
+@pytest.fixture
+def manager():
+    """A BridgeManager on a Mock session, which restarts and staggers without delay."""
+    return BridgeManager(session=Mock(), stagger=0, restart_delay=0)
+
+
+@pytest.mark.asyncio
+async def test_manager_runs_bridges_on_shared_session():
+    emulators = [BridgeEmulator("secret", device_count=3) for _ in range(3)]
+    for emulator in emulators:
+        await emulator.start()
+    try:
+        async with BridgeManager(stagger=0.01) as manager:
+            for emulator in emulators:
+                manager.add(emulator.address, "secret")
+            await manager.start()
+            await manager.wait_for_initialization(10)
+
+            assert all(bridge._session is manager.session for bridge in manager.bridges.values())
+            assert manager.stats()["bridges"] == 3
+            device = manager.get_device(emulators[1].address, 2)
+            assert device is manager.bridges[emulators[1].address]._devices[2]
+            assert manager.get_device(emulators[1].address, 99) is None
+            assert manager.get_device("unknown", 2) is None
+        assert manager.session.closed
+    finally:
+        for emulator in emulators:
+            await emulator.stop()
+
+
+@pytest.mark.asyncio
+async def test_manager_merges_device_events():
+    async with BridgeEmulator("secret", device_count=2) as first, BridgeEmulator("secret", device_count=2) as second:
+        async with BridgeManager(stagger=0) as manager:
+            manager.add(first.address, "secret", bridge_id="first")
+            manager.add(second.address, "secret", bridge_id="second")
+            await manager.wait_for_initialization(10)
+
+            events = []
+            manager.events.subscribe(events.append)
+            await second.push_state([{"deviceId": 2, "switch": True, "dimmvalue": 0}])
+            while not events:
+                await asyncio.sleep(0.01)
+
+            assert events[0].bridge_id == "second"
+            assert events[0].device is manager.get_device("second", 2)
+            assert events[0].state.switch is True
+
+
+@pytest.mark.asyncio
+async def test_manager_rejects_duplicate_bridge_id(manager):
+    manager.add("127.0.0.1", "key")
+    with pytest.raises(ValueError):
+        manager.add("127.0.0.1", "key")
+
+
+@pytest.mark.asyncio
+async def test_manager_restarts_crashed_bridge(manager, monkeypatch):
+    bridge = manager.add("127.0.0.1", "key")
+    runs = []
+
+    async def run():
+        runs.append(1)
+        if len(runs) == 1:
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(bridge, "run", run)
+    monkeypatch.setattr(Bridge, "close", AsyncMock())
+    await manager.start()
+    await asyncio.wait_for(manager._tasks["127.0.0.1"], 1)
+
+    assert len(runs) == 2
+    assert manager.restarts == 1
+    await manager.close()
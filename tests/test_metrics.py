@@ -0,0 +1,74 @@
+import asyncio
+import aiohttp
+import pytest
+from mock import Mock
+from xcomfort.bridge import Bridge
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.metrics import Histogram, Metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert list(histogram.cumulative()) == [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+    assert histogram.snapshot()["mean"] == pytest.approx(2.65 / 4)
+
+
+def test_prometheus_text():
+    metrics = Metrics(labels={"bridge": "10.0.0.2"}, buckets=(0.1,))
+    metrics.inc("frames_received", 3)
+    metrics.inc("messages_received", label=("type", "SET_STATE_INFO"))
+    metrics.observe("handler_seconds", 0.05, label=("type", "SET_STATE_INFO"))
+
+    lines = metrics.prometheus_text().splitlines()
+
+    assert "# TYPE xcomfort_frames_received_total counter" in lines
+    assert 'xcomfort_frames_received_total{bridge="10.0.0.2"} 3' in lines
+    assert 'xcomfort_messages_received_total{bridge="10.0.0.2",type="SET_STATE_INFO"} 1' in lines
+    assert "# TYPE xcomfort_handler_seconds histogram" in lines
+    assert 'xcomfort_handler_seconds_bucket{bridge="10.0.0.2",type="SET_STATE_INFO",le="0.1"} 1' in lines
+    assert 'xcomfort_handler_seconds_bucket{bridge="10.0.0.2",type="SET_STATE_INFO",le="+Inf"} 1' in lines
+    assert 'xcomfort_handler_seconds_count{bridge="10.0.0.2",type="SET_STATE_INFO"} 1' in lines
+
+
+def test_stats_without_metrics():
+    bridge = Bridge("127.0.0.1", "key", session=Mock())
+
+    stats = bridge.stats()
+
+    assert "metrics" not in stats
+    assert stats["reconnect"]["attempts"] == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_cover_connection_and_dispatch():
+    async with BridgeEmulator("secret", device_count=4) as emulator:
+        bridge = Bridge(emulator.address, "secret", metrics=Metrics())
+        run_task = asyncio.create_task(bridge.run())
+        await asyncio.wait_for(bridge.wait_for_initialization(), 10)
+        await emulator.push_state([{"deviceId": 1, "switch": True, "dimmvalue": 10}])
+        await asyncio.sleep(0.1)
+
+        metrics = bridge.stats()["metrics"]
+        assert metrics["frames_received"] >= 2
+        assert metrics["bytes_received"] > 0
+        assert metrics["frames_sent"] >= 3
+        assert metrics["messages_received"]["SET_ALL_DATA"] == 1
+        assert metrics["messages_received"]["SET_STATE_INFO"] == 1
+        assert metrics["messages_sent"]["INITIAL_DATA"] == 1
+        assert metrics["handler_seconds"]["SET_ALL_DATA"]["count"] == 1
+        assert metrics["decrypt_seconds"]["count"] == metrics["frames_received"]
+        assert metrics["fanout_seconds"]["count"] >= 2
+        assert metrics["connection_attempts"] == 1
+
+        runner = await bridge.serve_metrics(port=0)
+        port = runner.addresses[0][1]
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                text = await response.text()
+        assert 'xcomfort_messages_received_total{type="SET_STATE_INFO"} 1' in text
+
+        await bridge.close()
+        await run_task
@@ -0,0 +1,166 @@
+import asyncio
+import pytest
+import rx.operators as ops
+from xcomfort.observable import BehaviorSubject, Gate, Overflow, Subject
+
+
+def test_behavior_subject_replays_current_value():
+    subject = BehaviorSubject(1)
+    received = []
+
+    subject.subscribe(received.append)
+    subject.on_next(2)
+
+    assert received == [1, 2]
+    assert subject.value == 2
+
+
+def test_dispose_stops_delivery():
+    subject = Subject()
+    received = []
+
+    subscription = subject.subscribe(received.append)
+    subject.on_next(1)
+    subscription.dispose()
+    subject.on_next(2)
+
+    assert received == [1]
+
+
+@pytest.mark.asyncio
+async def test_coroutine_subscriber_receives_values_in_order():
+    subject = Subject()
+    received = []
+
+    async def slow(value):
+        await asyncio.sleep(0.001)
+        received.append(value)
+
+    subject.subscribe(slow)
+    for value in range(5):
+        subject.on_next(value)
+    while len(received) < 5:
+        await asyncio.sleep(0.001)
+
+    assert received == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_async_iteration():
+    subject = BehaviorSubject("initial")
+
+    async def take(n):
+        values = []
+        async for value in subject:
+            values.append(value)
+            if len(values) == n:
+                return values
+
+    task = asyncio.create_task(take(3))
+    await asyncio.sleep(0)
+    subject.on_next("a")
+    subject.on_next("b")
+
+    assert await task == ["initial", "a", "b"]
+    # The abandoned generator is closed by asyncio's async generator hooks
+    await asyncio.sleep(0)
+    assert subject._observers == ()
+
+
+def test_rx_operators_through_pipe():
+    subject = BehaviorSubject(None)
+    received = []
+
+    subject.pipe(ops.filter(lambda v: v is not None), ops.map(lambda v: v * 2)).subscribe(received.append)
+    subject.on_next(2)
+
+    assert received == [4]
+
+
+@pytest.mark.asyncio
+async def test_buffered_subscriber_does_not_hold_up_producer():
+    subject = Subject()
+    received = []
+    release = asyncio.Event()
+
+    async def slow(value):
+        await release.wait()
+        received.append(value)
+
+    subscription = subject.subscribe(slow, queue_size=3)
+    for value in range(10):
+        subject.on_next(value)
+
+    release.set()
+    while len(received) < 3:
+        await asyncio.sleep(0.001)
+    stats = subscription.stats()
+    assert received == [7, 8, 9]
+    assert stats["dropped"] == 7
+    assert stats["max_pending"] == 3
+
+
+@pytest.mark.asyncio
+async def test_conflate_keeps_latest_value_per_key():
+    subject = Subject()
+    received = []
+    subscription = subject.subscribe(received.append, queue_size=10, overflow=Overflow.CONFLATE,
+                                     key=lambda value: value[0])
+
+    for value in [("a", 1), ("b", 1), ("a", 2), ("a", 3), ("b", 2)]:
+        subject.on_next(value)
+    await asyncio.sleep(0.01)
+
+    assert received == [("a", 3), ("b", 2)]
+    assert subscription.stats()["conflated"] == 3
+    assert subscription.stats()["dropped"] == 0
+
+
+@pytest.mark.asyncio
+async def test_block_closes_gate_until_queue_drains():
+    subject = Subject()
+    gate = Gate()
+    release = asyncio.Event()
+    received = []
+
+    async def slow(value):
+        await release.wait()
+        received.append(value)
+
+    subscription = subject.subscribe(slow, queue_size=2, overflow=Overflow.BLOCK, gate=gate)
+    for value in range(3):
+        subject.on_next(value)
+    await asyncio.sleep(0)
+    assert not gate.is_open
+
+    waiter = asyncio.ensure_future(gate.wait())
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.wait_for(waiter, 1)
+    await asyncio.sleep(0.01)
+    assert received == [0, 1, 2]
+    assert subscription.stats()["dropped"] == 0
+    assert gate.stats()["waits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disposing_blocked_subscriber_opens_gate():
+    subject = Subject()
+    gate = Gate()
+    subscription = subject.subscribe(lambda value: None, queue_size=1, overflow=Overflow.BLOCK, gate=gate)
+    subject.on_next(1)
+    assert not gate.is_open
+
+    subscription.dispose()
+    await asyncio.sleep(0)
+
+    assert gate.is_open
+
+
+def test_block_requires_gate():
+    with pytest.raises(ValueError):
+        asyncio.run(_subscribe_blocking_without_gate())
+
+
+async def _subscribe_blocking_without_gate():
+    Subject().subscribe(lambda value: None, queue_size=1, overflow=Overflow.BLOCK)
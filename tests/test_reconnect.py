@@ -0,0 +1,85 @@
+import asyncio
+import aiohttp
+import pytest
+from xcomfort.bridge import Bridge
+from xcomfort.connection import ConnectionUnavailableError, setup_secure_connection
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.reconnect import BackoffPolicy, CircuitState, ReconnectScheduler
+
+
+def test_backoff_is_immediate_after_drop_then_exponential():
+    policy = BackoffPolicy(base_delay=1, factor=2, max_delay=5, jitter=0)
+
+    assert policy.delay(0, None) == 0
+    assert [policy.delay(n, OSError()) for n in range(1, 6)] == [1, 2, 4, 5, 5]
+
+
+def test_backoff_waits_longer_when_bridge_is_busy():
+    policy = BackoffPolicy(busy_delay=10, jitter=0)
+
+    assert policy.delay(0, ConnectionUnavailableError("no client-connection available")) == 10
+
+
+def test_circuit_opens_after_threshold_and_closes_on_success():
+    scheduler = ReconnectScheduler(BackoffPolicy(jitter=0, min_uptime=0), failure_threshold=2, open_interval=30)
+    states = []
+    scheduler.state.subscribe(states.append)
+
+    scheduler.on_attempt()
+    scheduler.on_disconnected(OSError())
+    scheduler.on_attempt()
+    assert scheduler.on_disconnected(OSError()) == 30
+    scheduler.on_attempt()
+    scheduler.on_connected()
+
+    assert states == [CircuitState.Closed, CircuitState.Open, CircuitState.HalfOpen, CircuitState.Closed]
+    assert scheduler.attempts == 3
+    assert scheduler.on_disconnected() == 0
+    assert scheduler.failures == 0
+
+
+def test_flapping_peer_is_backed_off_and_opens_circuit():
+    scheduler = ReconnectScheduler(BackoffPolicy(base_delay=1, jitter=0, min_uptime=60), failure_threshold=3,
+                                   open_interval=30)
+
+    delays = []
+    for _ in range(3):
+        scheduler.on_attempt()
+        scheduler.on_connected()
+        delays.append(scheduler.on_disconnected(ConnectionError()))
+
+    assert delays == [1, 2, 30]
+    assert scheduler.state.value == CircuitState.Open
+    assert scheduler.reconnects == 2
+
+
+def test_busy_rejections_do_not_open_circuit():
+    scheduler = ReconnectScheduler(failure_threshold=1)
+
+    scheduler.on_disconnected(ConnectionUnavailableError("busy"))
+
+    assert scheduler.state.value == CircuitState.Closed
+    assert scheduler.busy_rejections == 1
+
+
+@pytest.mark.asyncio
+async def test_emulator_busy_raises_connection_unavailable():
+    async with BridgeEmulator("secret", max_clients=0) as emulator, aiohttp.ClientSession() as session:
+        with pytest.raises(ConnectionUnavailableError):
+            await setup_secure_connection(session, emulator.address, "secret")
+
+
+@pytest.mark.asyncio
+async def test_bridge_reconnects_immediately_after_drop():
+    async with BridgeEmulator("secret") as emulator:
+        bridge = Bridge(emulator.address, "secret", reconnect_policy=BackoffPolicy(min_uptime=0))
+        run_task = asyncio.create_task(bridge.run())
+        await asyncio.wait_for(bridge.wait_for_initialization(), 10)
+
+        await emulator.drop_connections()
+        while bridge.reconnect.reconnects < 1:
+            await asyncio.sleep(0.01)
+
+        assert bridge.reconnect.last_time_to_reconnect < 1
+        await bridge.close()
+        await asyncio.wait_for(run_task, 5)
@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from mock import Mock
+from xcomfort.bridge import Bridge
+from xcomfort.constants import ComponentTypes, DeviceTypes
+from xcomfort.devices import (BridgeDevice, DoorWindowSensor, Heater, Light, RcTouch, Rocker, Shade, Switch,
+                              TemperatureSensor, WaterGuard, WaterSensor)
+from xcomfort.registry import DeviceRegistry
+
+EXPECTED = {
+    DeviceTypes.ACTUATOR_SWITCH: Light,
+    DeviceTypes.ACTUATOR_DIMM: Light,
+    DeviceTypes.SHADING_ACTUATOR: Shade,
+    DeviceTypes.SWITCH: Rocker,
+    DeviceTypes.ROCKER: Rocker,
+    DeviceTypes.TEMP_SENSOR: TemperatureSensor,
+    DeviceTypes.HEATING_ACTUATOR: Heater,
+    DeviceTypes.HEATING_VALVE: Heater,
+    DeviceTypes.HEATING_WATER_VALVE: Heater,
+    DeviceTypes.RC_TOUCH: RcTouch,
+    DeviceTypes.TEMP_HUMIDITY_SENSOR: TemperatureSensor,
+    DeviceTypes.WATER_GUARD: WaterGuard,
+    DeviceTypes.WATER_SENSOR: WaterSensor,
+}
+
+
+def device_payload(dev_type, **extra):
+    return {"deviceId": 1, "name": "Device", "devType": int(dev_type), "compId": 1, **extra}
+
+
+def comp_payload(comp_type):
+    return {"compId": 1, "name": "Comp", "compType": int(comp_type)}
+
+
+def test_matrix_covers_every_device_type():
+    assert set(EXPECTED) == set(DeviceTypes)
+
+
+@pytest.mark.parametrize("dev_type", list(DeviceTypes))
+def test_device_type_classification(dev_type, bridge):
+    device = bridge._create_device_from_payload(device_payload(dev_type))
+
+    assert type(device) is EXPECTED[dev_type]
+    assert device.device_id == 1
+
+
+@pytest.mark.parametrize("flags, expected", [
+    ({"monitorPower": True}, Switch),
+    ({"usage": 1}, Rocker),
+    ({"monitorPower": True, "usage": 1}, Switch),
+    ({"usage": 0}, Light),
+])
+def test_actuator_switch_flags(flags, expected, make_bridge):
+    device = make_bridge()._create_device_from_payload(device_payload(DeviceTypes.ACTUATOR_SWITCH, **flags))
+
+    assert type(device) is expected
+
+
+def test_door_window_sensor_is_classified_by_comp_type(bridge):
+    bridge._onMessage({"type_int": 300, "payload": {
+        "comps": [comp_payload(ComponentTypes.DOOR_WINDOW_SENSOR)],
+        "devices": [device_payload(DeviceTypes.ROCKER)],
+        "lastItem": True}})
+
+    assert type(bridge._devices[1]) is DoorWindowSensor
+
+
+def test_comp_dependent_device_waits_for_its_comp(bridge):
+    bridge._onMessage({"type_int": 300, "payload": {"devices": [device_payload(DeviceTypes.ROCKER, curstate=1)]}})
+    assert 1 not in bridge._devices
+    bridge._onMessage({"type_int": 300, "payload": {
+        "comps": [comp_payload(ComponentTypes.DOOR_WINDOW_SENSOR)], "lastItem": True}})
+
+    assert type(bridge._devices[1]) is DoorWindowSensor
+    assert bridge._devices[1].is_closed is True
+    assert bridge._awaiting_comp == {}
+
+
+def test_device_without_comp_is_added_once_comps_are_complete(bridge):
+    bridge._onMessage({"type_int": 300, "payload": {"devices": [device_payload(DeviceTypes.ROCKER)]}})
+    bridge._onMessage({"type_int": 300, "payload": {"comps": [], "lastItem": True}})
+
+    assert type(bridge._devices[1]) is Rocker
+    assert bridge.ready["devices"].is_set()
+
+
+@pytest.mark.asyncio
+async def test_iter_devices_yields_final_classification(bridge):
+    async def collect():
+        return [device async for device in bridge.iter_devices()]
+
+    task = asyncio.create_task(collect())
+    await asyncio.sleep(0)
+    bridge._onMessage({"type_int": 300, "payload": {"devices": [device_payload(DeviceTypes.ROCKER, curstate=1)]}})
+    bridge._onMessage({"type_int": 300, "payload": {
+        "comps": [comp_payload(ComponentTypes.DOOR_WINDOW_SENSOR)], "lastItem": True}})
+    devices = await asyncio.wait_for(task, 1)
+
+    assert [type(device) for device in devices] == [DoorWindowSensor]
+
+
+def test_unknown_device_type_falls_back_to_bridge_device(make_bridge):
+    device = make_bridge()._create_device_from_payload(device_payload(12345))
+
+    assert type(device) is BridgeDevice
+
+
+def test_custom_registration(bridge):
+    class Fan(BridgeDevice):
+        pass
+
+    registry = DeviceRegistry()
+    registry.register(999, lambda bridge, payload: Fan(bridge, payload["deviceId"], payload["name"]))
+    bridge.device_registry = registry
+
+    assert type(bridge._create_device_from_payload(device_payload(999))) is Fan
+    with pytest.raises(ValueError):
+        registry.register(999, Fan, flag="no_such_flag")
+
+
+def test_no_log_formatting_without_logger():
+    class Name:
+        def __str__(self):
+            raise AssertionError("formatted")
+
+    bridge = Bridge("127.0.0.1", "key", session=Mock())
+
+    bridge._create_device_from_payload(device_payload(DeviceTypes.ACTUATOR_DIMM, name=Name()))
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import pytest
+import threading
+from xcomfort.bridge import Bridge
+from xcomfort.emulator import BridgeEmulator
+from xcomfort.snapshot import TopologySnapshot
+
+
+async def run_until_reconciled(bridge):
+    diffs = []
+    bridge.topology_changes.subscribe(diffs.append)
+    run_task = asyncio.create_task(bridge.run())
+    for _ in range(500):
+        if diffs:
+            break
+        await asyncio.sleep(0.01)
+    await bridge.close()
+    await run_task
+    return diffs[0]
+
+
+@pytest.mark.asyncio
+async def test_saves_are_debounced_and_atomic(tmp_path):
+    path = tmp_path / "topology.json"
+    snapshot = TopologySnapshot(str(path), save_delay=0.05)
+
+    for value in range(10):
+        snapshot.record("devices", 1, {"deviceId": 1, "dimmvalue": value})
+    await asyncio.sleep(0.1)
+    await snapshot.close()
+
+    assert snapshot.saves == 1
+    assert json.loads(path.read_text())["devices"] == [{"deviceId": 1, "dimmvalue": 9}]
+    assert not (tmp_path / "topology.json.tmp").exists()
+
+
+@pytest.mark.asyncio
+async def test_writes_happen_off_the_event_loop(tmp_path):
+    path = tmp_path / "topology.json"
+    snapshot = TopologySnapshot(str(path))
+    write = snapshot._write
+    threads = []
+
+    def recording_write(data):
+        threads.append(threading.current_thread())
+        write(data)
+
+    snapshot._write = recording_write
+    snapshot.record("devices", 1, {"deviceId": 1, "dimmvalue": 1})
+    writing = snapshot.flush()
+    # Later changes do not leak into the write that is under way
+    snapshot.record("devices", 1, {"dimmvalue": 2})
+    await writing
+
+    assert threads and threads[0] is not threading.current_thread()
+    assert json.loads(path.read_text())["devices"] == [{"deviceId": 1, "dimmvalue": 1}]
+
+    await snapshot.close()
+    assert json.loads(path.read_text())["devices"] == [{"deviceId": 1, "dimmvalue": 2}]
+    assert snapshot.saves == 2
+
+
+def test_unreadable_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "topology.json"
+    path.write_text("{not json")
+
+    bridge = Bridge("127.0.0.1", "secret", session=object(), snapshot_path=str(path))
+
+    assert not bridge.warm_started
+    assert not bridge.on_initialized.is_set()
+
+
+@pytest.mark.asyncio
+async def test_warm_start_and_reconcile(tmp_path):
+    path = str(tmp_path / "topology.json")
+    async with BridgeEmulator("secret", device_count=4, room_count=2) as emulator:
+        emulator.devices[1]["switch"] = True
+        emulator.devices[1]["dimmvalue"] = 40
+        bridge = Bridge(emulator.address, "secret", snapshot_path=path)
+        first = await run_until_reconciled(bridge)
+        assert sorted(first.added["devices"]) == [1, 2, 3, 4]
+
+        warm = Bridge(emulator.address, "secret", snapshot_path=path)
+        assert warm.warm_started
+        devices = await asyncio.wait_for(warm.get_devices(), 0.1)
+        assert sorted(devices) == [1, 2, 3, 4]
+        assert devices[1].state.value.dimmvalue == 40
+        assert sorted(await warm.get_rooms()) == [1, 2]
+
+        del emulator.devices[2]
+        emulator.devices[3]["name"] = "Renamed"
+        emulator.devices[5] = dict(emulator.devices[4], deviceId=5, name="Device 5")
+        stale = devices[3]
+        diff = await run_until_reconciled(warm)
+
+        assert diff.removed["devices"] == [2]
+        assert diff.changed["devices"] == [3]
+        assert diff.added["devices"] == [5]
+        assert sorted(warm._devices) == [1, 3, 4, 5]
+        assert warm._devices[3] is not stale
+        assert warm._devices[3].name == "Renamed"
+
+    saved = json.loads(open(path).read())
+    assert sorted(device["deviceId"] for device in saved["devices"]) == [1, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_commanding_restored_device(tmp_path):
+    path = str(tmp_path / "topology.json")
+    async with BridgeEmulator("secret", device_count=2) as emulator:
+        await run_until_reconciled(Bridge(emulator.address, "secret", snapshot_path=path))
+
+        warm = Bridge(emulator.address, "secret", snapshot_path=path)
+        light = (await warm.get_devices())[1]
+        with pytest.raises(ConnectionError):
+            await light.switch(True)
+
+        run_task = asyncio.create_task(warm.run())
+        # Waits for the connection instead of failing
+        ack = await asyncio.wait_for(light.switch(True), 10)
+        await ack
+        assert emulator.devices[1]["switch"] is True
+
+        await warm.close()
+        await run_task
@@ -0,0 +1,94 @@
+import pytest
+from mock import Mock
+from xcomfort.bridge import Bridge, Room, RoomState, RctMode, RctState
+from xcomfort.devices import (LightState, Rocker, RockerState, Shade, ShadeState, Switch)
+
+
+def test_state_is_immutable():
+    state = LightState(True, 50, {"switch": True})
+
+    with pytest.raises(AttributeError):
+        state.switch = False
+    with pytest.raises(AttributeError):
+        state.extra = 1
+
+
+def test_state_has_no_dict():
+    assert not hasattr(LightState(True, 50, {}), "__dict__")
+    assert not hasattr(RockerState(True, {}), "__dict__")
+    assert not hasattr(ShadeState(), "__dict__")
+
+
+def test_state_shares_payload():
+    payload = {"deviceId": 1, "switch": True}
+
+    assert LightState(True, 99, payload).payload is payload
+
+
+def test_shade_merges_partial_updates_into_new_snapshot():
+    bridge = Mock()
+    bridge._comps = {7: Mock(comp_type=86)}
+    shade = Shade(bridge, 1, "", 7)
+
+    shade.handle_state({"curstate": 1, "shPos": 100, "shSafety": 0})
+    first = shade.state.value
+    shade.handle_state({"curstate": 0})
+    second = shade.state.value
+
+    assert second is not first
+    assert first.current_state == 1
+    assert (second.current_state, second.position, second.is_safety_enabled) == (0, 100, False)
+    assert second.is_closed
+    assert shade.supports_go_to
+    assert first.payload == {"curstate": 1, "shPos": 100, "shSafety": 0}
+    assert second.payload == {"curstate": 0, "shPos": 100, "shSafety": 0}
+
+
+def test_shade_state_legacy_api():
+    state = ShadeState({"shPos": 40})
+    updated = state.update_from_partial_state_update({"shPos": 60, "shSafety": 1})
+
+    assert state.payload == {"shPos": 40}
+    assert (updated.position, updated.is_safety_enabled) == (60, True)
+    assert updated.payload == {"shPos": 60, "shSafety": 1}
+
+
+def test_rocker_state_carries_merged_payload():
+    rocker = Rocker(Mock(), 1, "", 7, {"curstate": 0, "controlId": [2]})
+    rocker.handle_state({"curstate": 1})
+    first = rocker.state.value
+
+    rocker.handle_state({"info": []})
+
+    assert first.is_on
+    assert first.payload == {"curstate": 1, "controlId": [2]}
+    assert rocker.state.value.payload is rocker.payload
+    assert rocker.payload == {"curstate": 1, "controlId": [2], "info": []}
+
+
+def test_switch_state_carries_merged_payload():
+    switch = Switch(Mock(), 1, "", 7, {"switch": False, "power": 10.0})
+
+    switch.handle_state({"switch": True})
+
+    assert switch.state.value.is_on
+    assert switch.state.value.payload == {"switch": True, "power": 10.0}
+    assert switch.state.value.payload is switch.payload
+
+
+def test_room_partial_update_leaves_previous_snapshot_untouched():
+    room = Room(Mock(), 1, "")
+    room.handle_state({"setpoint": 20.0, "temp": 19.5, "currentMode": 2, "state": 0})
+    first = room.state.value
+
+    room.handle_state({"temp": 21.0})
+    second = room.state.value
+
+    assert first.temperature == 19.5
+    assert first.raw["temp"] == 19.5
+    assert first.raw == {"setpoint": 20.0, "temp": 19.5, "currentMode": 2, "state": 0}
+    assert second.raw == {"setpoint": 20.0, "temp": 21.0, "currentMode": 2, "state": 0}
+    assert (second.setpoint, second.temperature) == (20.0, 21.0)
+    assert second.mode == RctMode.Eco
+    assert second.rctstate == RctState.Idle
+    assert isinstance(second, RoomState)
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from xcomfort.bridge import Bridge
+from xcomfort.emulator import BridgeEmulator
+
+
+def device(device_id):
+    return {"deviceId": device_id, "name": f"Device {device_id}", "devType": 101, "compId": 1,
+            "switch": False, "dimmvalue": 0}
+
+
+def test_sections_become_ready_as_the_dump_moves_on(bridge):
+    bridge._onMessage({"type_int": 300, "payload": {"devices": [device(1)]}})
+    assert not bridge.ready["devices"].is_set()
+
+    bridge._onMessage({"type_int": 300, "payload": {"comps": [{"compId": 1, "name": "C", "compType": 81}]}})
+    assert bridge.ready["devices"].is_set()
+    assert not bridge.ready["comps"].is_set()
+    assert not bridge.on_initialized.is_set()
+
+    bridge._onMessage({"type_int": 300, "payload": {
+        "rooms": [{"roomId": 1, "name": "R", "currentMode": 3, "state": 0}], "lastItem": True}})
+    assert all(event.is_set() for event in bridge.ready.values())
+    assert bridge.on_initialized.is_set()
+
+
+def test_initialized_only_after_last_frame_is_processed(bridge):
+    devices_when_initialized = []
+    bridge.on_initialized.set = lambda: devices_when_initialized.append(sorted(bridge._devices))
+
+    bridge._onMessage({"type_int": 300, "payload": {"devices": [device(2)], "lastItem": True}})
+
+    assert devices_when_initialized == [[2]]
+
+
+@pytest.mark.asyncio
+async def test_iter_devices_streams_all_devices():
+    async with BridgeEmulator("secret", device_count=200, devices_per_frame=10) as emulator:
+        bridge = Bridge(emulator.address, "secret")
+        run_task = asyncio.create_task(bridge.run())
+
+        devices = [dev.device_id async for dev in bridge.iter_devices()]
+
+        assert sorted(devices) == list(range(1, 201))
+        assert 0 < bridge.init_timings["first_device"] <= bridge.init_timings["devices"] <= bridge.init_timings["ready"]
+
+        again = [dev.device_id async for dev in bridge.iter_devices()]
+        assert sorted(again) == devices and len(again) == 200
+
+        await bridge.close()
+        await run_task
@@ -0,0 +1,69 @@
+import json
+import os
+import time
+from typing import Optional
+
+# The bridge reports token lifetime as "remaining": 8640000 without a unit.
+# It is read as hundredths of a second (one day), the shorter of the plausible
+# interpretations, so at worst tokens are renewed earlier than necessary.
+REMAINING_UNIT = 0.01
+
+
+class TokenCache:
+    """Keeps bridge session tokens so reconnects can skip the full login.
+
+    Tokens are keyed by the bridge device id. With ``path`` set they are also
+    persisted to a JSON file, written atomically and readable only by the owner,
+    so a restarted process can reuse them too.
+    """
+
+    def __init__(self, path: Optional[str] = None, renew_margin: float = 3600.0):
+        self.path = path
+        self.renew_margin = renew_margin
+        self._tokens = {}
+        if path is not None:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return
+        for device_id, entry in data.items():
+            if isinstance(entry, dict) and "token" in entry and "expires" in entry:
+                self._tokens[device_id] = (entry["token"], float(entry["expires"]))
+
+    def _save(self):
+        if self.path is None:
+            return
+        data = {device_id: {"token": token, "expires": expires}
+                for device_id, (token, expires) in self._tokens.items()}
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, self.path)
+
+    def get(self, device_id: str) -> Optional[str]:
+        """Return the cached token for a bridge, or None if there is none or it has expired."""
+        entry = self._tokens.get(device_id)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def put(self, device_id: str, token: str, remaining):
+        """Store a token. ``remaining`` is the lifetime as reported by the bridge."""
+        self._tokens[device_id] = (token, time.time() + remaining * REMAINING_UNIT)
+        self._save()
+
+    def invalidate(self, device_id: str):
+        if self._tokens.pop(device_id, None) is not None:
+            self._save()
+
+    def expires_in(self, device_id: str) -> Optional[float]:
+        """Seconds until the cached token expires, or None if none is cached."""
+        entry = self._tokens.get(device_id)
+        if entry is None:
+            return None
+        return entry[1] - time.time()
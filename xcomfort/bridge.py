@@ -1,14 +1,26 @@
 from unicodedata import numeric
 import aiohttp
 import asyncio
+import functools
+import logging
 import string
 import time
-import rx
-import rx.operators as ops
 from enum import Enum
-from .connection import SecureBridgeConnection, setup_secure_connection
+from operator import attrgetter
+from .auth import TokenCache
+from .capture import TrafficRecorder
+from .log import BRIDGE, CONNECTION, DEVICES, DISPATCH, LoggerAdapter
+from .coalesce import COALESCED_MESSAGES, CommandCoalescer, coalescing_key
+from .events import ChangeHub, EventFilter
+from .index import TopologyIndex
+from .connection import LivenessTimeoutError, SecureBridgeConnection, setup_secure_connection
 from .messages import Messages
-from .devices import (BridgeDevice, Light, RcTouch, Heater, Shade, Rocker, Switch)
+from .metrics import Metrics, message_label, start_metrics_server
+from .observable import BehaviorSubject, Gate, Subject
+from .reconnect import BackoffPolicy, ReconnectScheduler
+from .registry import DEVICE_REGISTRY
+from .snapshot import TopologyDiff, TopologySnapshot, catalogue_changed
+from .devices import (BridgeDevice, Light, RcTouch, Heater, Shade, Rocker, Switch, StateEmitter)
 
 class State(Enum):
     Uninitialized = 0
@@ -30,25 +42,34 @@ class RctModeRange:
         self.Min = min
         self.Max = max
 
+_set = object.__setattr__
+
+
 class CompState:
+    __slots__ = ("raw",)
+    _key = attrgetter("raw")
+
     def __init__(self, raw):
-        self.raw = raw
+        _set(self, "raw", raw)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompState is immutable")
 
     def __str__(self):
         return f"CompState({self.raw})"
 
     __repr__ = __str__
 
-class Comp:
+class Comp(StateEmitter):
     def __init__(self, bridge, comp_id, comp_type, name: str):
         self.bridge = bridge
         self.comp_id = comp_id
         self.comp_type = comp_type
         self.name = name
-        self.state = rx.subject.BehaviorSubject(None)
+        self.state = BehaviorSubject(None)
 
     def handle_state(self, payload):
-        self.state.on_next(CompState(payload))
+        self._publish(CompState(payload))
 
     def __str__(self):
         return f"Comp({self.comp_id}, \"{self.name}\", comp_type: {self.comp_type})"
@@ -56,49 +77,66 @@ class Comp:
     __repr__ = __str__
 
 class RoomState:
+    __slots__ = ("setpoint", "temperature", "humidity", "power", "mode", "rctstate", "raw")
+    # ``raw`` is compared too: it carries fields not modelled here, such as windowsOpen
+    _key = attrgetter("setpoint", "temperature", "humidity", "power", "mode", "rctstate", "raw")
+
     def __init__(self, setpoint, temperature, humidity, power, mode: RctMode, state: RctState, raw):
-        self.setpoint = setpoint
-        self.temperature = temperature
-        self.humidity = humidity
-        self.power = power
-        self.mode = mode
-        self.raw = raw
-        self.rctstate = state
+        _set(self, "setpoint", setpoint)
+        _set(self, "temperature", temperature)
+        _set(self, "humidity", humidity)
+        _set(self, "power", power)
+        _set(self, "mode", mode)
+        _set(self, "raw", raw)
+        _set(self, "rctstate", state)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RoomState is immutable")
 
     def __str__(self):
         return f"RoomState({self.setpoint}, {self.temperature}, {self.humidity}, {self.mode}, {self.rctstate} {self.power})"
 
     __repr__ = __str__
 
-class Room:
+class Room(StateEmitter):
     def __init__(self, bridge, room_id, name: str):
         self.bridge = bridge
         self.room_id = room_id
         self.name = name
-        self.state = rx.subject.BehaviorSubject(None)
+        self.state = BehaviorSubject(None)
         self.modesetpoints = dict()
+        self.device_ids = []
 
     def handle_state(self, payload):
+        # Updates are partial: fields missing from the payload carry over from
+        # the previous snapshot. ``raw`` is a new dict with the update merged
+        # in, so earlier snapshots keep theirs.
         old_state = self.state.value
-        if old_state is not None:
-            old_state.raw.update(payload)
-            payload = old_state.raw
-
-        setpoint = payload.get('setpoint', None)
-        temperature = payload.get('temp', None)
-        humidity = payload.get('humidity', None)
-        power = payload.get('power', 0.0)
+        if old_state is None:
+            setpoint = temperature = humidity = mode = rctstate = None
+            power = 0.0
+            raw = payload
+        else:
+            setpoint, temperature, humidity = old_state.setpoint, old_state.temperature, old_state.humidity
+            power, mode, rctstate = old_state.power, old_state.mode, old_state.rctstate
+            raw = {**old_state.raw, **payload}
+
+        setpoint = payload.get('setpoint', setpoint)
+        temperature = payload.get('temp', temperature)
+        humidity = payload.get('humidity', humidity)
+        power = payload.get('power', power)
         if 'currentMode' in payload:
-            mode = RctMode(payload.get('currentMode', None))
+            mode = RctMode(payload['currentMode'])
         if 'mode' in payload:
-            mode = RctMode(payload.get('mode', None))
+            mode = RctMode(payload['mode'])
+        if 'state' in payload:
+            rctstate = RctState(payload['state'])
 
         if 'modes' in payload:
-            for mode in payload["modes"]:
-                self.modesetpoints[RctMode(mode["mode"])] = float(mode["value"])
+            for modesetpoint in payload["modes"]:
+                self.modesetpoints[RctMode(modesetpoint["mode"])] = float(modesetpoint["value"])
 
-        currentstate = RctState(payload.get('state', None))
-        self.state.on_next(RoomState(setpoint, temperature, humidity, power, mode, currentstate, payload))
+        self._publish(RoomState(setpoint, temperature, humidity, power, mode, rctstate, raw))
 
     async def set_target_temperature(self, setpoint: float):
         setpointrange = self.bridge.rctsetpointallowedvalues[RctMode(self.state.value.mode)]
@@ -107,7 +145,7 @@ class Room:
         if setpoint < setpointrange.Min:
             setpoint = setpointrange.Min
         self.modesetpoints[self.state.value.mode.value] = setpoint
-        await self.bridge.send_message(Messages.SET_HEATING_STATE, {
+        return await self.bridge.send_message(Messages.SET_HEATING_STATE, {
             "roomId": self.room_id,
             "mode": self.state.value.mode.value,
             "state": self.state.value.rctstate.value,
@@ -117,7 +155,7 @@ class Room:
 
     async def set_mode(self, mode: RctMode):
         newsetpoint = self.modesetpoints.get(mode)
-        await self.bridge.send_message(Messages.SET_HEATING_STATE, {
+        return await self.bridge.send_message(Messages.SET_HEATING_STATE, {
             "roomId": self.room_id,
             "mode": mode.value,
             "state": self.state.value.rctstate.value,
@@ -130,8 +168,55 @@ class Room:
 
     __repr__ = __str__
 
+class Scene:
+    def __init__(self, bridge, scene_id, name: str, actions: dict, matchable: bool = True):
+        self.bridge = bridge
+        self.scene_id = scene_id
+        self.name = name
+        # device_id -> {"switch": ...} / {"dimmvalue": ...}
+        self.actions = actions
+        # False if the scene does more than ``actions`` describes (shades,
+        # heating, ...), so Bridge.batch must not send it in their place
+        self.matchable = matchable
+
+    async def activate(self):
+        return await self.bridge.send_message(Messages.ACTIVATE_SCENE, {"sceneId": self.scene_id})
+
+    def __str__(self):
+        return f"Scene({self.scene_id}, \"{self.name}\")"
+
+    __repr__ = __str__
+
+class BatchResult:
+    def __init__(self, messages, results):
+        # (message_type, payload) for every frame that was sent
+        self.messages = messages
+        # CommandResult or exception per frame, in the same order
+        self.results = results
+
+    @property
+    def errors(self):
+        return [r for r in self.results if isinstance(r, BaseException)]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __str__(self):
+        return f"BatchResult({len(self.messages)} messages, {len(self.errors)} errors)"
+
+    __repr__ = __str__
+
+# SET_ALL_DATA sections with their own readiness event
+INIT_CATEGORIES = ("devices", "comps", "rooms", "roomHeating")
+
 class Bridge:
-    def __init__(self, ip_address: str, authkey: str, session=None):
+    # Shared by all bridges unless replaced on an instance
+    device_registry = DEVICE_REGISTRY
+
+    def __init__(self, ip_address: str, authkey: str, session=None, token_cache: TokenCache = None,
+                 reconnect_policy: BackoffPolicy = None, suppress_unchanged: bool = True,
+                 snapshot_path: str = None, metrics: Metrics = None):
         self.ip_address = ip_address
         self.authkey = authkey
         if session is None:
@@ -149,48 +234,416 @@ class Bridge:
         self._comps = {}
         self._devices = {}
         self._rooms = {}
+        self._scenes = {}
+        self._index = TopologyIndex()
         self.state = State.Uninitialized
         self.on_initialized = asyncio.Event()
+        self.ready = {category: asyncio.Event() for category in INIT_CATEGORIES}
+        self.init_timings = {}
+        self._connect_started = None
+        self._streaming = ()
+        self._device_added = Subject()
+        self._changes = ChangeHub(self._index)
+        self._on_closing = asyncio.Event()
+        self._connected = asyncio.Event()
+        self.reconnect = ReconnectScheduler(reconnect_policy)
         self.connection = None
         self.connection_subscription = None
-        self.logger = lambda x: None
+        self.token_cache = token_cache if token_cache is not None else TokenCache()
+        self._pending_token = None
+        self.command_timeout = 10.0
+        self.max_in_flight = 32
+        # Liveness, off by default; see SecureBridgeConnection
+        self.heartbeat_interval = None
+        self.idle_timeout = None
+        self.liveness_timeouts = 0
+        self.last_detection_latency = None
+        self.coalescer = None
+        self._suppress_unchanged = suppress_unchanged
+        self._handlers = {}
+        self._build_dispatch_table()
+        self._log = LoggerAdapter()
+        self.metrics = metrics
+        self._metrics_runner = None
+        self.recorder = None
+        self.backpressure = Gate()
+        self._awaiting_comp = {}
+        self._devices_deferred = False
+        self.snapshot = TopologySnapshot(snapshot_path) if snapshot_path is not None else None
+        self.warm_started = False
+        self.topology_changes = Subject()
+        self.last_topology_diff = None
+        self._unconfirmed = None
+        self._topology_diff = None
+        self._restoring = False
+        if self.snapshot is not None:
+            self._load_snapshot()
+
+    # Minimum time between two background token renewals, so an unanswered
+    # AUTH_RENEW_TOKEN is not resent in a tight loop.
+    TOKEN_RENEW_RETRY = 60.0
+
+    @property
+    def handshake_timings(self) -> dict:
+        """Seconds spent in each phase of the last handshake, plus "total"."""
+        if self.connection is None:
+            return {}
+        return self.connection.handshake_timings
+
+    @property
+    def last_seen(self):
+        """Wall-clock time a frame was last received from the bridge, or None."""
+        if self.connection is None:
+            return None
+        return self.connection.last_seen
+
+    @property
+    def logger(self):
+        """Legacy logging hook: a callable receiving every message as a string.
+
+        The library logs through the standard ``logging`` module ("xcomfort.*"
+        loggers). Assigning a callable here additionally forwards messages to it.
+        """
+        if self._log.callback is not None:
+            return self._log.callback
+        return self._log_info
+
+    @logger.setter
+    def logger(self, callback):
+        self._log.callback = callback
+
+    def _log_info(self, message):
+        self._log.log(BRIDGE, logging.INFO, "%s", message)
+
+    @property
+    def suppress_unchanged(self) -> bool:
+        """Whether devices, rooms and comps drop state updates that change nothing."""
+        return self._suppress_unchanged
+
+    @suppress_unchanged.setter
+    def suppress_unchanged(self, value: bool):
+        self._suppress_unchanged = value
+        for item in self._state_emitters():
+            item.suppress_unchanged = value
+
+    def _state_emitters(self):
+        yield from self._devices.values()
+        yield from self._rooms.values()
+        yield from self._comps.values()
+
+    def change_stats(self) -> dict:
+        """Count of state updates emitted and suppressed as unchanged, over all devices, rooms and comps."""
+        emitted = suppressed = 0
+        for item in self._state_emitters():
+            emitted += item.emitted
+            suppressed += item.suppressed
+        return {"emitted": emitted, "suppressed": suppressed}
+
+    def _registry(self, kind):
+        return {"devices": self._devices, "comps": self._comps, "rooms": self._rooms}[kind]
+
+    def _load_snapshot(self):
+        """Build devices, comps and rooms from the snapshot so the getters return at once."""
+        if not self.snapshot.load():
+            return
+        self._restoring = True
+        try:
+            for kind, handle in (("comps", self._handle_comp_payload),
+                                 ("devices", self._handle_device_payload),
+                                 ("rooms", self._handle_room_payload)):
+                for payload in self.snapshot.entries(kind).values():
+                    try:
+                        handle(payload)
+                    except Exception as e:
+                        self._log.log(BRIDGE, logging.WARNING, "Failed to restore %s entry from snapshot: %s", kind, e)
+            self._add_awaiting_devices()
+        finally:
+            self._restoring = False
+        self.warm_started = True
+        for event in self.ready.values():
+            event.set()
+        self.on_initialized.set()
+
+    def _observe_payload(self, kind, key, payload) -> bool:
+        """Record a payload in the snapshot. Returns True if the existing object must be rebuilt."""
+        if self.snapshot is None or self._restoring:
+            return False
+        rebuild = False
+        if self._unconfirmed is not None:
+            stored = self.snapshot.get(kind, key)
+            unconfirmed = self._unconfirmed[kind]
+            if key in unconfirmed:
+                unconfirmed.discard(key)
+                if stored is not None and catalogue_changed(kind, stored, payload):
+                    self._topology_diff.changed[kind].append(key)
+                    rebuild = True
+            elif stored is None and key not in self._registry(kind):
+                self._topology_diff.added[kind].append(key)
+        self.snapshot.record(kind, key, payload)
+        return rebuild
+
+    def _begin_reconcile(self):
+        self._unconfirmed = {kind: set(self._registry(kind)) for kind in ("devices", "comps", "rooms")}
+        self._topology_diff = TopologyDiff()
+
+    def _finish_reconcile(self):
+        diff = self._topology_diff
+        for kind, unconfirmed in self._unconfirmed.items():
+            for key in unconfirmed:
+                self._forget(kind, key)
+                diff.removed[kind].append(key)
+        self._unconfirmed = None
+        self._topology_diff = None
+        self.last_topology_diff = diff
+        if not diff.empty:
+            self._log.log(BRIDGE, logging.INFO, "Topology changed since last snapshot: %s", diff)
+        self.topology_changes.on_next(diff)
 
     async def run(self):
         if self.state != State.Uninitialized:
             raise Exception("Run can only be called once at a time")
         self.state = State.Initializing
+        self._on_closing.clear()
         while self.state != State.Closing:
+            renew_task = None
+            error = None
+            self.reconnect.on_attempt()
+            if self.metrics is not None:
+                self.metrics.inc("connection_attempts")
             try:
                 await self._connect()
+                self._connected.set()
+                reconnects = self.reconnect.reconnects
+                self.reconnect.on_connected()
+                if self.metrics is not None and self.reconnect.reconnects > reconnects:
+                    self.metrics.inc("reconnects")
+                renew_task = asyncio.create_task(self._renew_token())
                 await self.connection.pump()
             except Exception as e:
-                self.logger(f"Error: {repr(e)}")
-                await asyncio.sleep(5)
+                self._log.log(CONNECTION, logging.WARNING, "Error: %r", e)
+                error = e
+                if isinstance(e, LivenessTimeoutError):
+                    self.liveness_timeouts += 1
+                    self.last_detection_latency = e.idle
+                if self.metrics is not None:
+                    self.metrics.inc("connection_errors")
+            self._connected.clear()
+            if renew_task is not None:
+                renew_task.cancel()
             if self.connection_subscription is not None:
                 self.connection_subscription.dispose()
+            if self.state == State.Closing:
+                break
+            delay = self.reconnect.on_disconnected(error)
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._on_closing.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
         self.state = State.Uninitialized
 
+    def enable_metrics(self, labels: dict = None) -> Metrics:
+        """Start collecting metrics, shared with the current and future connections."""
+        if self.metrics is None:
+            self.metrics = Metrics(labels)
+        if self.connection is not None:
+            self.connection.enable_metrics(self.metrics)
+        return self.metrics
+
+    def stats(self) -> dict:
+        """Snapshot of the bridge's counters; "metrics" is only present once metrics are enabled."""
+        result = {
+            "state": self.state.name,
+            "reconnect": self.reconnect.stats(),
+            "changes": self.change_stats(),
+            "init_timings": dict(self.init_timings),
+            "handshake_timings": dict(self.handshake_timings),
+            "liveness": {
+                "last_seen": self.last_seen,
+                "timeouts": self.liveness_timeouts,
+                "last_detection_latency": self.last_detection_latency,
+            },
+        }
+        if self.connection is not None:
+            result["writer"] = self.connection.writer_stats()
+            result["commands"] = self.connection.command_stats()
+        result["backpressure"] = self.backpressure.stats()
+        result["events"] = self._changes.stats()
+        result["index"] = self._index.stats()
+        if self.coalescer is not None:
+            result["coalescer"] = self.coalescer.stats()
+        if self.metrics is not None:
+            result["metrics"] = self.metrics.snapshot()
+        return result
+
+    def metrics_text(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        metrics = self.metrics if self.metrics is not None else Metrics()
+        return metrics.prometheus_text()
+
+    async def serve_metrics(self, host: str = "127.0.0.1", port: int = 9464):
+        """Serve metrics_text() on http://host:port/metrics until close(). Enables metrics."""
+        self.enable_metrics()
+        if self._metrics_runner is None:
+            self._metrics_runner = await start_metrics_server(self.metrics_text, host, port)
+        return self._metrics_runner
+
+    def start_capture(self, path: str, **kwargs) -> TrafficRecorder:
+        """Record decrypted traffic of this and later connections to ``path``, see TrafficRecorder."""
+        if self.recorder is None:
+            self.recorder = TrafficRecorder(path, **kwargs)
+            if self.connection is not None:
+                self.connection.recorder = self.recorder
+        return self.recorder
+
+    async def stop_capture(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            if self.connection is not None:
+                self.connection.recorder = None
+            await recorder.close()
+
+    async def _renew_token(self):
+        device_id = self.connection.device_id
+        while True:
+            expires_in = self.token_cache.expires_in(device_id)
+            if expires_in is None:
+                return
+            await asyncio.sleep(max(0, expires_in - self.token_cache.renew_margin))
+            token = self.token_cache.get(device_id)
+            if token is None:
+                return
+            await self.send_message(Messages.AUTH_RENEW_TOKEN, {"token": token})
+            await asyncio.sleep(self.TOKEN_RENEW_RETRY)
+
     async def switch_device(self, device_id, message):
         payload = {"deviceId": device_id}
         payload.update(message)
-        await self.send_message(Messages.ACTION_SWITCH_DEVICE, payload)
+        return await self.send_message(Messages.ACTION_SWITCH_DEVICE, payload)
 
     async def slide_device(self, device_id, message):
         payload = {"deviceId": device_id}
         payload.update(message)
-        await self.send_message(Messages.ACTION_SLIDE_DEVICE, payload)
+        return await self.send_message(Messages.ACTION_SLIDE_DEVICE, payload)
+
+    def _plan_batch(self, actions):
+        remaining = {}
+        for device, action in actions:
+            device_id = device.device_id if isinstance(device, BridgeDevice) else device
+            remaining[device_id] = dict(action)
+
+        for scene in self._scenes.values():
+            if scene.matchable and scene.actions and scene.actions == remaining:
+                return [(Messages.ACTIVATE_SCENE, {"sceneId": scene.scene_id})]
+
+        plan = []
+        for room in self._rooms.values():
+            # A room message reaches every device in the room, including ones
+            # not classified yet, so all of them must be known and targeted
+            members = room.device_ids
+            if not members or any(device_id not in remaining or device_id not in self._devices
+                                  for device_id in members):
+                continue
+            action = remaining[members[0]]
+            if any(remaining[device_id] != action for device_id in members):
+                continue
+            if set(action) == {"switch"}:
+                plan.append((Messages.ACTION_SWITCH_ROOM, {"roomId": room.room_id, **action}))
+            elif set(action) == {"dimmvalue"}:
+                plan.append((Messages.ACTION_SLIDE_ROOM, {"roomId": room.room_id, **action}))
+            else:
+                continue
+            for device_id in members:
+                del remaining[device_id]
+
+        for device_id, action in remaining.items():
+            message_type = Messages.ACTION_SLIDE_DEVICE if "dimmvalue" in action else Messages.ACTION_SWITCH_DEVICE
+            plan.append((message_type, {"deviceId": device_id, **action}))
+        return plan
+
+    async def batch(self, actions):
+        """Apply many device actions with as few messages as possible.
+
+        ``actions`` is an iterable of ``(device, action)`` pairs, where device is
+        a BridgeDevice or device id and action is ``{"switch": bool}`` or
+        ``{"dimmvalue": int}``. A set that matches a scene made only of switch
+        and dimm actions is sent as one ACTIVATE_SCENE, rooms whose devices all
+        get the same action as one ACTION_SWITCH_ROOM/ACTION_SLIDE_ROOM, and
+        the rest as pipelined per-device messages. Returns the BatchResult once
+        every message has been acknowledged or failed.
+        """
+        plan = self._plan_batch(actions)
+        futures = []
+        for message_type, payload in plan:
+            futures.append(await self.send_message(message_type, payload))
+        results = await asyncio.gather(*[f for f in futures if f is not None], return_exceptions=True)
+        return BatchResult(plan, list(results))
+
+    def enable_coalescing(self, min_interval: float = 0.25):
+        """Rate limit dimm and setpoint commands per device/room, dropping superseded values."""
+        self.coalescer = CommandCoalescer(self._send_now, min_interval)
+
+    async def _send_now(self, message_type, message):
+        if not self._connected.is_set():
+            await self._wait_for_connection()
+        return await self.connection.send_message(message_type, message)
+
+    async def _wait_for_connection(self):
+        # A warm start hands out devices before the first connection exists
+        if self.state in (State.Uninitialized, State.Closing):
+            raise ConnectionError("Not connected to the bridge")
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.command_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"Not connected to the bridge within {self.command_timeout}s") from None
 
     async def send_message(self, message_type: Messages, message):
-        await self.connection.send_message(message_type, message)
+        if self.coalescer is not None:
+            key = coalescing_key(message)
+            if key is not None:
+                return await self.coalescer.submit(key, message_type, message,
+                                                   coalesce=message_type in COALESCED_MESSAGES)
+        return await self._send_now(message_type, message)
 
     def _add_comp(self, comp):
+        comp.suppress_unchanged = self._suppress_unchanged
+        comp._on_change = self._changes.comp_changed
+        old = self._comps.get(comp.comp_id)
+        if old is not None:
+            self._index.remove_comp(old.comp_id, old.name)
         self._comps[comp.comp_id] = comp
+        self._index.add_comp(comp)
 
-    def _add_device(self, device):
+    def _add_device(self, device, payload):
+        device.suppress_unchanged = self._suppress_unchanged
+        device._on_change = self._changes.device_changed
         self._devices[device.device_id] = device
+        self._index.add_device(device, payload.get("compId"), payload.get("controlId"))
+        self._device_added.on_next(device)
 
     def _add_room(self, room):
+        room.suppress_unchanged = self._suppress_unchanged
+        room._on_change = self._changes.room_changed
+        old = self._rooms.get(room.room_id)
+        if old is not None:
+            self._index.remove_room(old.room_id, old.name)
         self._rooms[room.room_id] = room
+        self._index.add_room(room)
+
+    def _forget(self, kind, key) -> bool:
+        """Remove a device, room or comp from the registries, the indexes and the snapshot."""
+        item = self._registry(kind).pop(key, None)
+        if self.snapshot is not None:
+            self.snapshot.remove(kind, key)
+        if item is None:
+            return False
+        if kind == "devices":
+            self._index.remove_device(key)
+        elif kind == "rooms":
+            self._index.remove_room(key, item.name)
+        else:
+            self._index.remove_comp(key, item.name)
+        return True
 
     def _handle_SET_DEVICE_STATE(self, payload):
         try:
@@ -198,6 +651,32 @@ class Bridge:
             device.handle_state(payload)
         except KeyError:
             return
+        if self.snapshot is not None:
+            self.snapshot.record("devices", payload['deviceId'], payload)
+
+    def _handle_ADD_DEVICE(self, payload):
+        self._handle_device_payload(payload)
+
+    def _handle_ADD_COMP(self, payload):
+        self._handle_comp_payload(payload)
+
+    def _handle_DEVICE_DELETED(self, payload):
+        self._forget("devices", payload['deviceId'])
+
+    def _handle_ROOM_DELETED(self, payload):
+        self._forget("rooms", payload['roomId'])
+
+    def _handle_COMP_DELETED(self, payload):
+        self._forget("comps", payload['compId'])
+
+    def _handle_AUTH_RENEW_TOKEN_RESPONSE(self, payload):
+        self._pending_token = payload['token']
+        asyncio.ensure_future(self.send_message(Messages.AUTH_APPLY_TOKEN, {"token": self._pending_token}))
+
+    def _handle_AUTH_APPLY_TOKEN_RESPONSE(self, payload):
+        if self._pending_token is not None and payload.get('valid'):
+            self.token_cache.put(self.connection.device_id, self._pending_token, payload['remaining'])
+        self._pending_token = None
 
     def _handle_SET_STATE_INFO(self, payload):
         for item in payload['item']:
@@ -205,16 +684,22 @@ class Bridge:
                 deviceId = item['deviceId']
                 device = self._devices[deviceId]
                 device.handle_state(item)
+                kind, key = "devices", deviceId
             elif 'roomId' in item:
                 roomId = item['roomId']
                 room = self._rooms[roomId]
                 room.handle_state(item)
+                kind, key = "rooms", roomId
             elif 'compId' in item:
                 compId = item['compId']
                 comp = self._comps[compId]
                 comp.handle_state(item)
+                kind, key = "comps", compId
             else:
-                self.logger(f"Unknown state info: {payload}")
+                self._log.log(DISPATCH, logging.DEBUG, "Unknown state info: %s", payload, rate_key="state_info")
+                continue
+            if self.snapshot is not None:
+                self.snapshot.record(kind, key, item)
 
     def _create_comp_from_payload(self, payload):
         comp_id = payload['compId']
@@ -223,44 +708,30 @@ class Bridge:
         return Comp(self, comp_id, comp_type, name)
 
     def _create_device_from_payload(self, payload):
-        device_id = payload['deviceId']
-        name = payload['name']
-        dev_type = payload["devType"]
         comp_id = payload["compId"]
-        usage = payload.get("usage", 0)
-        monitor_power = payload.get("monitorPower", False)
-        
-        # Detailed logging to debug device classification
-        self.logger(f"Classifying device {name} (device_id: {device_id}) with dev_type {dev_type}, usage {usage}, monitorPower {monitor_power}")
-
-        if dev_type == 100:
-            if monitor_power:
-                self.logger(f"Device {name} (dev_type 100, monitorPower True) classified as Switch (Smartstikk)")
-                return Switch(self, device_id, name, comp_id, payload)
-            elif int(usage) == 1:
-                self.logger(f"Device {name} (dev_type 100, usage 1) classified as Rocker")
-                return Rocker(self, device_id, name, comp_id, payload)
+        comp = self._comps.get(comp_id)
+        registry = self.device_registry
+        device = registry.create(self, payload, comp.comp_type if comp is not None else None)
+        self._log.log(DEVICES, logging.DEBUG, "Device %s (%s, devType %s) classified as %s",
+                      payload['name'], payload['deviceId'], payload['devType'], type(device).__name__)
+        return device
+
+    def _create_scene_from_payload(self, payload):
+        actions = {}
+        matchable = True
+        for item in payload.get('devices', []):
+            if not isinstance(item, dict) or 'deviceId' not in item:
+                matchable = False
+            elif 'dimmvalue' in item:
+                actions[item['deviceId']] = {"dimmvalue": item['dimmvalue']}
+            elif 'switch' in item:
+                actions[item['deviceId']] = {"switch": item['switch']}
             else:
-                self.logger(f"Device {name} (dev_type 100, usage {usage}) classified as Light")
-                return Light(self, device_id, name, payload.get("dimmable", False))
-        elif dev_type == 101:
-            self.logger(f"Device {name} (dev_type 101) classified as Light")
-            return Light(self, device_id, name, payload.get("dimmable", False))
-        elif dev_type == 102:
-            self.logger(f"Device {name} (dev_type 102) classified as Shade")
-            return Shade(self, device_id, name, comp_id)
-        elif dev_type == 440:
-            self.logger(f"Device {name} (dev_type 440) classified as Heater")
-            return Heater(self, device_id, name, comp_id)
-        elif dev_type == 450:
-            self.logger(f"Device {name} (dev_type 450) classified as RcTouch")
-            return RcTouch(self, device_id, name, comp_id)
-        elif dev_type == 220:  # Proposed condition for Rocker devices
-            self.logger(f"Device {name} (dev_type 220) classified as Rocker")
-            return Rocker(self, device_id, name, comp_id, payload)
-        else:
-            self.logger(f"Device {name} with dev_type {dev_type} classified as BridgeDevice")
-            return BridgeDevice(self, device_id, name)
+                matchable = False
+        if not matchable:
+            self._log.log(DEVICES, logging.DEBUG, "Scene %s has actions other than switch and dimm, "
+                          "batch() will not use it", payload['sceneId'])
+        return Scene(self, payload['sceneId'], payload.get('name', ''), actions, matchable)
 
     def _create_room_from_payload(self, payload):
         room_id = payload['roomId']
@@ -270,84 +741,243 @@ class Bridge:
     def _handle_comp_payload(self, payload):
         comp_id = payload['compId']
         comp = self._comps.get(comp_id)
+        if self._observe_payload("comps", comp_id, payload):
+            comp = None
         if comp is None:
             comp = self._create_comp_from_payload(payload)
             if comp is None:
                 return
             self._add_comp(comp)
         comp.handle_state(payload)
+        if comp_id in self._awaiting_comp:
+            self._add_awaiting_devices(comp_id)
 
     def _handle_device_payload(self, payload):
+        if self._connect_started is not None and "first_device" not in self.init_timings:
+            self.init_timings["first_device"] = time.monotonic() - self._connect_started
         device_id = payload['deviceId']
         device = self._devices.get(device_id)
+        if self._observe_payload("devices", device_id, payload):
+            device = None
         if device is None:
+            if self._awaits_comp(payload):
+                # Classified once its comp is known, see _handle_comp_payload
+                waiting = self._awaiting_comp.setdefault(payload["compId"], {})
+                waiting[device_id] = dict(waiting.get(device_id, {}), **payload)
+                return
             device = self._create_device_from_payload(payload)
             if device is None:
                 return
-            self._add_device(device)
+            self._add_device(device, payload)
+        elif "controlId" in payload:
+            self._index.set_controls(device_id, payload["controlId"])
         device.handle_state(payload)
 
+    def _awaits_comp(self, payload) -> bool:
+        return (payload["compId"] not in self._comps and not self.ready["comps"].is_set()
+                and self.device_registry.depends_on_comp(payload["devType"]))
+
+    def _add_awaiting_devices(self, comp_id=None):
+        """Classify and add the devices waiting for ``comp_id``, or for any comp if None."""
+        comp_ids = [comp_id] if comp_id is not None else list(self._awaiting_comp)
+        for comp_id in comp_ids:
+            for payload in self._awaiting_comp.pop(comp_id, {}).values():
+                device = self._create_device_from_payload(payload)
+                if device is not None:
+                    self._add_device(device, payload)
+                    device.handle_state(payload)
+
     def _handle_room_payload(self, payload):
         room_id = payload['roomId']
         room = self._rooms.get(room_id)
+        if self._observe_payload("rooms", room_id, payload):
+            room = None
         if room is None:
             room = self._create_room_from_payload(payload)
             if room is None:
                 return
             self._add_room(room)
+        if 'devices' in payload:
+            room.device_ids = list(payload['devices'])
+            self._index.set_room_devices(room_id, room.device_ids)
         room.handle_state(payload)
 
+    def _mark_ready(self, category):
+        if category == "devices" and self._awaiting_comp and not self.ready["comps"].is_set():
+            # Some devices are only added once the comps are known
+            self._devices_deferred = True
+            return
+        if category == "comps":
+            # Whatever still waits has a comp that does not exist
+            self._add_awaiting_devices()
+        if self._connect_started is not None:
+            self.init_timings.setdefault(category, time.monotonic() - self._connect_started)
+        event = self.ready[category]
+        if not event.is_set():
+            event.set()
+            if category == "devices":
+                # Wakes up iter_devices
+                self._device_added.on_next(None)
+        if category == "comps" and self._devices_deferred:
+            self._devices_deferred = False
+            self._mark_ready("devices")
+
     def _handle_SET_ALL_DATA(self, payload):
-        if 'lastItem' in payload:
-            self.state = State.Ready
-            self.on_initialized.set()
+        # The dump is sent one section after the other, so a section that was
+        # in the previous frame but is missing from this one is complete.
+        for category in self._streaming:
+            if category not in payload:
+                self._mark_ready(category)
         if 'devices' in payload:
             for device_payload in payload['devices']:
                 try:
                     self._handle_device_payload(device_payload)
                 except Exception as e:
-                    self.logger(f"Failed to handle device payload: {str(e)}")
+                    self._log.log(DISPATCH, logging.WARNING, "Failed to handle device payload: %s", e)
         if 'comps' in payload:
             for comp_payload in payload["comps"]:
                 try:
                     self._handle_comp_payload(comp_payload)
                 except Exception as e:
-                    self.logger(f"Failed to handle comp payload: {str(e)}")
+                    self._log.log(DISPATCH, logging.WARNING, "Failed to handle comp payload: %s", e)
         if 'rooms' in payload:
             for room_payload in payload["rooms"]:
                 try:
                     self._handle_room_payload(room_payload)
                 except Exception as e:
-                    self.logger(f"Failed to handle room payload: {str(e)}")
+                    self._log.log(DISPATCH, logging.WARNING, "Failed to handle room payload: %s", e)
         if 'roomHeating' in payload:
             for room_payload in payload["roomHeating"]:
                 try:
                     self._handle_room_payload(room_payload)
                 except Exception as e:
-                    self.logger(f"Failed to handle room payload: {str(e)}")
+                    self._log.log(DISPATCH, logging.WARNING, "Failed to handle room payload: %s", e)
+        if 'scenes' in payload:
+            for scene_payload in payload["scenes"]:
+                try:
+                    scene = self._create_scene_from_payload(scene_payload)
+                    self._scenes[scene.scene_id] = scene
+                except Exception as e:
+                    self._log.log(DISPATCH, logging.WARNING, "Failed to handle scene payload: %s", e)
+        self._streaming = tuple(category for category in INIT_CATEGORIES if category in payload)
+        if 'lastItem' in payload:
+            self._streaming = ()
+            if self._unconfirmed is not None:
+                self._finish_reconcile()
+            for category in INIT_CATEGORIES:
+                self._mark_ready(category)
+            if self._connect_started is not None:
+                self.init_timings.setdefault("ready", time.monotonic() - self._connect_started)
+            self.state = State.Ready
+            self.on_initialized.set()
 
     def _handle_UNKNOWN(self, message_type, payload):
-        self.logger(f"Unhandled package [{message_type.name}]: {payload}")
-        pass
+        name = message_type.name if isinstance(message_type, Messages) else str(message_type)
+        self._log.log(DISPATCH, logging.DEBUG, "Unhandled package [%s]: %s", name, payload, rate_key=name)
+
+    def _build_dispatch_table(self):
+        # Resolved once per Bridge so _onMessage is a single dict lookup. Looked
+        # up on the instance, so _handle_* overrides in subclasses are honoured.
+        self._dispatch = {}
+        for message_type in Messages:
+            self._update_dispatch(message_type.value)
+
+    def _update_dispatch(self, type_int: int):
+        try:
+            message_type = Messages(type_int)
+        except ValueError:
+            # Not in Messages: only registered handlers run
+            builtin = None
+        else:
+            builtin = getattr(self, '_handle_' + message_type.name, None)
+            if builtin is None:
+                builtin = functools.partial(self._handle_UNKNOWN, message_type)
+        handlers = tuple(self._handlers.get(type_int, ()))
+        if not handlers:
+            if builtin is None:
+                self._dispatch.pop(type_int, None)
+            else:
+                self._dispatch[type_int] = builtin
+            return
+
+        def dispatch(payload, builtin=builtin, handlers=handlers):
+            if builtin is not None:
+                builtin(payload)
+            for handler in handlers:
+                handler(payload)
+
+        self._dispatch[type_int] = dispatch
+
+    def register_handler(self, message_type: int, handler):
+        """Call ``handler(payload)`` for every message of ``message_type``.
+
+        ``message_type`` is a Messages member or any type_int, including ones
+        this library does not know. Runs after the built-in handling, if any.
+        Returns a function that removes the handler again.
+        """
+        type_int = int(message_type)
+        self._handlers.setdefault(type_int, []).append(handler)
+        self._update_dispatch(type_int)
+
+        def unregister():
+            handlers = self._handlers.get(type_int, [])
+            if handler in handlers:
+                handlers.remove(handler)
+                self._update_dispatch(type_int)
+
+        return unregister
 
     def _onMessage(self, message):
         if 'payload' in message:
-            message_type = Messages(message['type_int'])
-            method_name = '_handle_' + message_type.name
-            method = getattr(self, method_name, lambda p: self._handle_UNKNOWN(message_type, p))
+            type_int = message['type_int']
+            method = self._dispatch.get(type_int)
+            self._changes.type_int = type_int
             try:
-                method(message['payload'])
+                if method is None:
+                    self._handle_UNKNOWN(type_int, message['payload'])
+                elif self.metrics is None:
+                    method(message['payload'])
+                else:
+                    started = time.perf_counter()
+                    method(message['payload'])
+                    self.metrics.observe("handler_seconds", time.perf_counter() - started,
+                                         label=message_label(type_int))
             except Exception as e:
-                self.logger(f"Unknown error with: {method_name}: {str(e)}")
+                self._log.log(DISPATCH, logging.ERROR, "Unknown error with: %s: %s", type_int, e, rate_key=("error", type_int))
+            finally:
+                # Changes made outside dispatch are not caused by a message
+                self._changes.type_int = None
         else:
-            self.logger(f"Not known: {message}")
+            self._log.log(DISPATCH, logging.DEBUG, "Not known: %s", message, rate_key="not_known")
 
     async def _connect(self):
-        self.connection = await setup_secure_connection(self._session, self.ip_address, self.authkey)
+        self._connect_started = time.monotonic()
+        self.init_timings = {}
+        self._streaming = ()
+        self.connection = await setup_secure_connection(self._session, self.ip_address, self.authkey,
+                                                        self.token_cache)
+        self.connection.command_timeout = self.command_timeout
+        if self.metrics is not None:
+            self.connection.enable_metrics(self.metrics)
+        self.connection.recorder = self.recorder
+        self.connection.backpressure = self.backpressure
+        self.connection.max_in_flight = self.max_in_flight
+        self.connection.heartbeat_interval = self.heartbeat_interval
+        self.connection.idle_timeout = self.idle_timeout
+        if self.snapshot is not None:
+            self._begin_reconcile()
         self.connection_subscription = self.connection.messages.subscribe(self._onMessage)
 
     async def close(self):
         self.state = State.Closing
+        self._on_closing.set()
+        self._connected.clear()
+        if self.snapshot is not None:
+            await self.snapshot.close()
+        await self.stop_capture()
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+            self._metrics_runner = None
         if isinstance(self.connection, SecureBridgeConnection):
             self.connection_subscription.dispose()
             await self.connection.close()
@@ -357,6 +987,72 @@ class Bridge:
     async def wait_for_initialization(self):
         await self.on_initialized.wait()
 
+    async def iter_devices(self):
+        """Yield devices as they are classified, finishing once all devices are known.
+
+        Devices that are already known are yielded first, so this can be used
+        before, during and after initialization.
+        """
+        queue = asyncio.Queue()
+        subscription = self._device_added.subscribe(queue.put_nowait)
+        try:
+            seen = set()
+            for device in list(self._devices.values()):
+                seen.add(device.device_id)
+                yield device
+            while not self.ready["devices"].is_set() or not queue.empty():
+                device = await queue.get()
+                if device is not None and device.device_id not in seen:
+                    seen.add(device.device_id)
+                    yield device
+        finally:
+            subscription.dispose()
+
+    async def events(self, device_ids=None, room_ids=None, device_classes=None, message_types=None,
+                     queue_size: int = 1024):
+        """Yield a ChangeEvent for every state change matching the filters.
+
+        ``device_ids``, ``room_ids`` and ``message_types`` are iterables of ids
+        and type_ints, ``device_classes`` a class or iterable of classes; see
+        EventFilter. Changes are evaluated against the filters before an event
+        is built, and iteration carries on across reconnects. If the consumer
+        falls more than ``queue_size`` events behind, the oldest are dropped;
+        ``stats()["events"]["queues"]`` reports the drops and lag per iterator.
+        """
+        subscriber = self._changes.subscribe(
+            EventFilter(device_ids, room_ids, device_classes, message_types), queue_size)
+        try:
+            while True:
+                yield await subscriber.get()
+        finally:
+            self._changes.unsubscribe(subscriber)
+
+    def find_devices(self, name: str = None, device_class: type = None, comp_id=None, room_id=None) -> list:
+        """Devices matching every given criterion, in id order, looked up in the indexes.
+
+        ``device_class`` matches subclasses too, so ``find_devices(room_id=3,
+        device_class=Light)`` is every light in room 3.
+        """
+        devices = self._devices
+        return [devices[device_id] for device_id in sorted(self._index.devices(name, device_class, comp_id, room_id))]
+
+    def find_rooms(self, name: str) -> list:
+        return [self._rooms[room_id] for room_id in sorted(self._index.named("rooms", name))]
+
+    def find_comps(self, name: str) -> list:
+        return [self._comps[comp_id] for comp_id in sorted(self._index.named("comps", name))]
+
+    def rooms_of(self, device) -> list:
+        """The rooms listing ``device``, a BridgeDevice or device id."""
+        device_id = device.device_id if isinstance(device, BridgeDevice) else device
+        return [self._rooms[room_id] for room_id in sorted(self._index.rooms_of(device_id)) if room_id in self._rooms]
+
+    def controllers_of(self, device) -> list:
+        """The rockers whose ``controlId`` lists ``device``, a BridgeDevice or device id."""
+        device_id = device.device_id if isinstance(device, BridgeDevice) else device
+        return [self._devices[rocker_id] for rocker_id in sorted(self._index.controllers_of(device_id))
+                if rocker_id in self._devices]
+
     async def get_comps(self):
         await self.wait_for_initialization()
         return self._comps
@@ -365,6 +1061,10 @@ class Bridge:
         await self.wait_for_initialization()
         return self._devices
 
+    async def get_scenes(self):
+        await self.wait_for_initialization()
+        return self._scenes
+
     async def get_rooms(self):
         await self.wait_for_initialization()
         return self._rooms
\ No newline at end of file
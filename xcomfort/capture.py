@@ -0,0 +1,124 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional, Tuple
+
+CAPTURE_VERSION = 1
+
+# Auth messages carry the login hash and session tokens; their payload is
+# never written to a capture.
+_REDACTED_TYPES = frozenset(range(30, 40))
+
+
+class TrafficRecorder:
+    """Appends decrypted messages to a capture file, one JSON array per line.
+
+    Each line is ``[seconds since start, "in" | "out", message]``; the first
+    line is a header. Lines are buffered and written by a single background
+    thread every ``flush_interval`` seconds, or as soon as ``max_buffer`` lines
+    are pending, so recording never waits for the disk.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, max_buffer: int = 1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.recorded = 0
+        self._started = time.monotonic()
+        self._buffer = [json.dumps({"version": CAPTURE_VERSION, "started": time.time()})]
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xcomfort-capture")
+        self._flush_handle = None
+        self._closed = False
+
+    def record(self, direction: str, message: dict):
+        if self._closed:
+            return
+        if message.get("type_int") in _REDACTED_TYPES and "payload" in message:
+            message = dict(message, payload="<redacted>")
+        self._buffer.append(json.dumps([round(time.monotonic() - self._started, 6), direction, message],
+                                       separators=(",", ":")))
+        self.recorded += 1
+        if len(self._buffer) >= self.max_buffer:
+            self.flush()
+        elif self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        """Hand the buffered lines to the writer thread."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer:
+            return None
+        lines, self._buffer = self._buffer, []
+        return self._executor.submit(self._write, lines)
+
+    def _write(self, lines):
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+
+    async def close(self):
+        """Write what is buffered and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        pending = self.flush()
+        if pending is not None:
+            await asyncio.wrap_future(pending)
+        self._executor.shutdown(wait=False)
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, str, dict]]:
+    """Yield ``(seconds, direction, message)`` for each message in a capture."""
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            entry = json.loads(line)
+            if isinstance(entry, list):
+                yield entry[0], entry[1], entry[2]
+
+
+class ReplayResult:
+    def __init__(self, messages: int, elapsed: float):
+        self.messages = messages
+        self.elapsed = elapsed
+
+    @property
+    def rate(self) -> float:
+        return self.messages / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return f"ReplayResult({self.messages} messages in {self.elapsed:.3f}s)"
+
+    __repr__ = __str__
+
+
+async def replay(path: str, on_message: Callable[[dict], None], realtime: bool = False, speed: float = 1.0,
+                 direction: Optional[str] = "in") -> ReplayResult:
+    """Feed the messages of a capture to ``on_message``, typically ``Bridge._onMessage``.
+
+    With ``realtime`` the original spacing is kept, scaled by ``speed``;
+    otherwise messages are delivered as fast as possible. Only messages in
+    ``direction`` are replayed, or all of them if it is None.
+    """
+    # Parsed up front so the replay measures the handlers, not the JSON parser
+    entries = [(at, message) for at, message_direction, message in read_capture(path)
+               if direction is None or message_direction == direction]
+    loop = asyncio.get_running_loop()
+    count = 0
+    started = loop.time()
+    first = None
+    for at, message in entries:
+        if realtime:
+            if first is None:
+                first = at
+            delay = started + (at - first) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        on_message(message)
+        count += 1
+    return ReplayResult(count, loop.time() - started)
@@ -0,0 +1,171 @@
+import asyncio
+from .messages import Messages
+
+# Message types where only the latest value for a device or room matters
+COALESCED_MESSAGES = frozenset({
+    Messages.ACTION_SLIDE_DEVICE,
+    Messages.ACTION_SLIDE_ROOM,
+    Messages.SET_HEATING_STATE,
+})
+
+
+# Fields a held-back command must agree on to be replaced: a heating command
+# with another mode or state is not a newer value of the same command, so the
+# held one is sent first rather than swallowed.
+_DISTINCT_FIELDS = {
+    Messages.SET_HEATING_STATE: ("mode", "state"),
+}
+
+
+def coalescing_key(payload):
+    """The device or room a command targets, or None if it targets neither."""
+    if "deviceId" in payload:
+        return ("device", payload["deviceId"])
+    if "roomId" in payload:
+        return ("room", payload["roomId"])
+    return None
+
+
+def _supersedes(pending, message_type, payload) -> bool:
+    if pending.message_type != message_type:
+        return False
+    return all(pending.payload.get(field) == payload.get(field) for field in _DISTINCT_FIELDS.get(message_type, ()))
+
+
+def _consume(future):
+    if not future.cancelled():
+        future.exception()
+
+
+def _copy_outcome(source, target):
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class _Pending:
+    def __init__(self, message_type, payload, handle):
+        self.message_type = message_type
+        self.payload = payload
+        self.handle = handle
+        self.waiters = []
+
+
+class CommandCoalescer:
+    """Rate limits commands per device or room, keeping only the latest one.
+
+    The first command for a key is sent at once. Commands arriving within
+    ``min_interval`` of the last send are held back, each replacing the one
+    before it, and the survivor is sent when the interval has passed. Futures of
+    replaced commands resolve with the outcome of the command that replaced
+    them. A non-coalesced command for the same key (a switch after a series of
+    dimm values, say) drops whatever is held back and goes out immediately. A
+    coalesced command that does not supersede the held one, such as a heating
+    mode change after a setpoint, sends the held one first and is held in its
+    place, so commands always go out in the order they were submitted.
+    """
+
+    def __init__(self, send, min_interval: float = 0.25):
+        self._send = send
+        self.min_interval = min_interval
+        self._last_sent = {}
+        self._pending = {}
+
+        self.submitted = 0
+        self.sent = 0
+        self.dropped = 0
+        self._acked = 0
+        self._total_latency = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "pending": len(self._pending),
+            "latency_saved": self.latency_saved,
+        }
+
+    @property
+    def latency_saved(self) -> float:
+        """Estimated seconds saved: one mean command round trip per dropped command."""
+        if not self._acked:
+            return 0.0
+        return self.dropped * self._total_latency / self._acked
+
+    def _record_latency(self, future):
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self._acked += 1
+            self._total_latency += future.result().latency
+
+    async def submit(self, key, message_type, payload, coalesce: bool = True):
+        """Send or hold back a command; returns a future like Bridge.send_message."""
+        self.submitted += 1
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(key)
+
+        if not coalesce:
+            waiters = []
+            if pending is not None:
+                del self._pending[key]
+                pending.handle.cancel()
+                waiters = pending.waiters
+                self.dropped += 1
+            return await self._dispatch(key, message_type, payload, waiters)
+
+        if pending is not None and not _supersedes(pending, message_type, payload):
+            del self._pending[key]
+            pending.handle.cancel()
+            await self._dispatch(key, pending.message_type, pending.payload, pending.waiters)
+            pending = None
+
+        last_sent = self._last_sent.get(key)
+        if pending is None and (last_sent is None or loop.time() - last_sent >= self.min_interval):
+            return await self._dispatch(key, message_type, payload, [])
+
+        if pending is None:
+            pending = _Pending(message_type, payload,
+                               loop.call_at(last_sent + self.min_interval, self._flush, key))
+            self._pending[key] = pending
+        else:
+            pending.message_type = message_type
+            pending.payload = payload
+            self.dropped += 1
+
+        future = loop.create_future()
+        future.add_done_callback(_consume)
+        pending.waiters.append(future)
+        return future
+
+    def _flush(self, key):
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            asyncio.ensure_future(self._dispatch(key, pending.message_type, pending.payload, pending.waiters))
+
+    async def _dispatch(self, key, message_type, payload, waiters):
+        self._last_sent[key] = asyncio.get_running_loop().time()
+        self.sent += 1
+        try:
+            ack = await self._send(message_type, payload)
+        except Exception as e:
+            if not waiters:
+                raise
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return None
+
+        if ack is None:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            return None
+        ack.add_done_callback(self._record_latency)
+        for waiter in waiters:
+            ack.add_done_callback(lambda f, waiter=waiter: _copy_outcome(f, waiter))
+        return ack
@@ -0,0 +1,136 @@
+import json
+from binascii import a2b_base64, b2a_base64
+from Crypto.Cipher import AES
+from Crypto.Util.strxor import strxor
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_BLOCK = AES.block_size
+_ZEROS = bytes(_BLOCK)
+_MASK = (1 << 128) - 1
+
+# Frames up to this many blocks are CBC-chained by hand on the cached ECB key
+# schedule; past it a single AES.new() call is cheaper than the per-block loop.
+_CHAIN_MAX_BLOCKS = 4
+
+# Below this size the CBC xor is done with Python ints, which also strips the
+# zero padding for free; above it strxor is faster.
+_INT_XOR_MAX_BYTES = 1024
+
+
+class StdlibJson:
+    """JSON through the standard library; always available."""
+
+    name = "json"
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+
+class OrjsonJson:
+    """JSON through orjson, parsing bytes directly.
+
+    orjson writes non-ASCII characters as UTF-8 where the stdlib escapes them.
+    The few frames that contain any are re-encoded by the stdlib, so what
+    goes to the bridge stays pure ASCII.
+    """
+
+    name = "orjson"
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(obj) -> bytes:
+        data = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        if not data.isascii():
+            return StdlibJson.dumps(obj)
+        return data
+
+
+# The fastest JSON implementation installed
+JSON = OrjsonJson if orjson is not None else StdlibJson
+
+
+class AesFrameCodec:
+    """Encodes and decodes the encrypted frames of a secure bridge connection.
+
+    The bridge encrypts every frame with AES-CBC under the same key and IV, so a
+    frame never depends on the previous one. Instead of building a new CBC cipher
+    per frame, the codec keeps one ECB cipher (and thereby the expanded key) for
+    the lifetime of the connection and applies the CBC chaining itself: decryption
+    is one ECB call plus one xor over the whole frame.
+    """
+
+    def __init__(self, key: bytes, iv: bytes, json_codec=None):
+        self.key = key
+        self.iv = iv
+        self.json = json_codec if json_codec is not None else JSON
+        self._ecb = AES.new(key, AES.MODE_ECB)
+        self._iv_int = int.from_bytes(iv, 'little')
+
+    def decrypt(self, data) -> bytes:
+        """Return the plaintext of a base64 frame, without the zero padding.
+
+        Accepts ``str`` or ``bytes``; the trailing ``\\u0004`` terminator is ignored.
+        """
+        ct = a2b_base64(data)
+        size = len(ct)
+        if size % _BLOCK:
+            raise ValueError(f"Frame length {size} is not a multiple of the AES block size")
+        if not size:
+            return b''
+
+        pt = self._ecb.decrypt(ct)
+        if size <= _INT_XOR_MAX_BYTES:
+            # Little-endian, so the zero padding ends up in the high bytes and
+            # is dropped by sizing the output from bit_length().
+            value = int.from_bytes(pt, 'little') ^ self._iv_int ^ (int.from_bytes(ct[:-_BLOCK], 'little') << 128)
+            return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+        pt = bytearray(pt)
+        view = memoryview(pt)
+        strxor(view[:_BLOCK], self.iv, output=view[:_BLOCK])
+        strxor(view[_BLOCK:], memoryview(ct)[:-_BLOCK], output=view[_BLOCK:])
+        view.release()
+        # Padding is at most one block, so only the tail needs scanning.
+        del pt[size - _BLOCK + len(pt[-_BLOCK:].rstrip(b'\x00')):]
+        return pt
+
+    def encrypt(self, plaintext: bytes) -> str:
+        """Return the base64 frame for ``plaintext``, terminator included."""
+        size = len(plaintext)
+        padded = size + _BLOCK - size % _BLOCK
+        if padded <= _CHAIN_MAX_BLOCKS * _BLOCK:
+            ecb = self._ecb
+            previous = self._iv_int
+            value = int.from_bytes(plaintext, 'little')
+            ct = b''
+            for offset in range(0, padded * 8, 128):
+                block = ecb.encrypt(((value >> offset & _MASK) ^ previous).to_bytes(_BLOCK, 'little'))
+                previous = int.from_bytes(block, 'little')
+                ct += block
+        else:
+            ct = AES.new(self.key, AES.MODE_CBC, self.iv).encrypt(plaintext + _ZEROS[:padded - size])
+        return b2a_base64(ct, newline=False).decode() + '\u0004'
+
+    def decode(self, data) -> dict:
+        """Decrypt a frame and parse its JSON body."""
+        plaintext = self.decrypt(data)
+        if not plaintext:
+            return {}
+        return self.json.loads(plaintext)
+
+    def encode(self, message: dict) -> str:
+        """Serialize ``message`` and encrypt it into a frame."""
+        return self.encrypt(self.json.dumps(message))
+
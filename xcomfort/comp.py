@@ -1,4 +1,4 @@
-import rx
+from .observable import BehaviorSubject
 
 
 class CompState:
@@ -19,7 +19,7 @@ class Comp:
         self.name = name
         self.payload = payload
 
-        self.state = rx.subject.BehaviorSubject(None)
+        self.state = BehaviorSubject(None)
 
     def handle_state(self, payload):
         self.state.on_next(CompState(payload))
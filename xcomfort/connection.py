@@ -1,19 +1,96 @@
 import aiohttp
 import asyncio
+import functools
 import json
 import string
 import secrets
+import threading
 import time
-import rx
+import weakref
 from enum import IntEnum
+from .codec import JSON, AesFrameCodec
+from .log import CONNECTION as _LOGGER
 from .messages import Messages
+from .metrics import MeteredCodec, message_label
+from .observable import Subject
 from Crypto.Hash import SHA256
 from Crypto.PublicKey import RSA
 from Crypto.Cipher import PKCS1_OAEP, PKCS1_v1_5, AES
 from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import unpad, pad
 from base64 import b64encode, b64decode
-import rx.operators as ops
+
+
+class ConnectionUnavailableError(Exception):
+    """The bridge refused the connection because all client slots are in use."""
+
+
+class CommandRejectedError(Exception):
+    """The bridge answered a command with a NACK."""
+
+    def __init__(self, ref, info=None):
+        super().__init__(f"Command {ref} rejected: {info}")
+        self.ref = ref
+        self.info = info
+
+
+class InvalidActionError(CommandRejectedError):
+    pass
+
+
+class DeviceNotDimmableError(CommandRejectedError):
+    pass
+
+
+class UnknownDeviceError(CommandRejectedError):
+    pass
+
+
+class LivenessTimeoutError(ConnectionError):
+    """Nothing arrived from the bridge within the idle timeout; the connection is presumed dead."""
+
+    def __init__(self, idle):
+        super().__init__(f"Nothing received from the bridge for {idle:.1f}s")
+        self.idle = idle
+
+
+class CommandTimeoutError(asyncio.TimeoutError):
+    """No ACK or NACK arrived for a command within the command timeout."""
+
+    def __init__(self, ref, timeout):
+        super().__init__(f"Command {ref} not acknowledged within {timeout}s")
+        self.ref = ref
+
+
+_NACK_ERRORS = {
+    Messages.NACK_INFO_INVALID_ACTION: InvalidActionError,
+    Messages.NACK_INFO_DEVICE_NOT_DIMMABLE: DeviceNotDimmableError,
+    Messages.NACK_INFO_UNKNOWN_DEVICE: UnknownDeviceError,
+}
+
+# The bridge answers these with a response message instead of an ACK
+_UNACKNOWLEDGED = frozenset({
+    Messages.AUTH_LOGIN,
+    Messages.AUTH_APPLY_TOKEN,
+    Messages.AUTH_VERIFY_TOKEN,
+    Messages.AUTH_RENEW_TOKEN,
+})
+
+
+# Frames after which ``async for`` over the websocket would stop
+_CLOSED_TYPES = frozenset({aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED})
+
+
+class CommandResult:
+    def __init__(self, mc, latency, message):
+        self.mc = mc
+        self.latency = latency
+        self.message = message
+
+    def __str__(self):
+        return f"CommandResult({self.mc}, latency: {self.latency * 1000:.1f} ms)"
+
+    __repr__ = __str__
 
 
 class ConnectionState(IntEnum):
@@ -45,26 +122,213 @@ def _pad_string(value):
     return value.ljust(length + pad_size, b'\x00')
 
 
-async def setup_secure_connection(session, ip_address, authkey):
+@functools.lru_cache(maxsize=16)
+def _public_key_cipher(public_key):
+    # The bridge presents the same key on every connection, so the import is
+    # done once per key rather than once per handshake.
+    return PKCS1_v1_5.new(RSA.import_key(public_key))
+
+
+def _session_secret(public_key):
+    """A new AES key and iv, and the secret announcing them encrypted with the bridge's public key."""
+    key = get_random_bytes(32)
+    iv = get_random_bytes(16)
+    cipher = _public_key_cipher(public_key)
+    secret = b64encode(cipher.encrypt((key.hex() + ":::" + iv.hex()).encode())).decode()
+    return key, iv, secret
+
+
+def _login_credentials(device_id, authkey):
+    salt = generateSalt()
+    return salt, hash(device_id.encode(), authkey.encode(), salt.encode())
+
+
+class HandshakeLimiter:
+    """Caps how many handshakes run at once, so a mass reconnect does not starve running connections.
+
+    Shared by every connection in the process, including ones on event loops
+    in other threads; ``limit`` may be changed at any time and applies to
+    handshakes that have not started yet.
+    """
+
+    def __init__(self, limit: int = 8):
+        self.active = 0
+        self.waiting = 0
+        # Guards the counters and the conditions, which other threads' loops use too
+        self._lock = threading.Lock()
+        # asyncio primitives belong to one loop, so there is a condition per loop
+        self._conditions = weakref.WeakKeyDictionary()
+        self.limit = limit
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @limit.setter
+    def limit(self, limit: int):
+        self._limit = limit
+        # A higher limit may let queued handshakes start
+        self._wake_loops()
+
+    @staticmethod
+    async def _notify_all(condition):
+        async with condition:
+            condition.notify_all()
+
+    def _wake_loops(self, skip=None):
+        with self._lock:
+            conditions = list(self._conditions.items())
+        for loop, condition in conditions:
+            if loop is not skip and not loop.is_closed():
+                loop.call_soon_threadsafe(loop.create_task, self._notify_all(condition))
+
+    def _condition(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            condition = self._conditions.get(loop)
+            if condition is None:
+                condition = self._conditions[loop] = asyncio.Condition()
+        return condition
+
+    def _claim(self) -> bool:
+        with self._lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    async def __aenter__(self):
+        condition = self._condition()
+        async with condition:
+            with self._lock:
+                self.waiting += 1
+            try:
+                await condition.wait_for(self._claim)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        condition = self._condition()
+        with self._lock:
+            self.active -= 1
+        # Handshakes queued on other loops may take the slot too
+        self._wake_loops(skip=asyncio.get_running_loop())
+        async with condition:
+            condition.notify()
+
+
+HANDSHAKE_LIMITER = HandshakeLimiter()
+
+
+def set_handshake_limit(limit: int):
+    """Set how many handshakes may run at once in this process."""
+    HANDSHAKE_LIMITER.limit = limit
+
+
+async def _login(connection, device_id, authkey, crypto):
+    salt, password = await crypto(_login_credentials, device_id, authkey)
+
+    await connection.send_message(30, {
+        "username": "default",
+        "password": password,
+        "salt": salt
+    })
+
+    msg = await connection.receive()
+
+    if msg['type_int'] != 32:
+        raise Exception("Login failed")
+
+    token = msg['payload']['token']
+    await connection.send_message(33, {"token": token})
+
+    # {"type_int":34,"mc":-1,"payload":{"valid":true,"remaining":8640000}}
+    msg = await connection.receive()
+
+    # Renew token
+    await connection.send_message(37, {"token": token})
+
+    msg = await connection.receive()
+
+    if msg['type_int'] != 38:
+        raise Exception("Login failed")
+
+    token = msg['payload']['token']
+
+    await connection.send_message(33, {"token": token})
+
+    # {"type_int":34,"mc":-1,"payload":{"valid":true,"remaining":8640000}}
+    msg = await connection.receive()
+
+    return token, msg.get('payload', {})
+
+
+async def _apply_cached_token(connection, token):
+    await connection.send_message(Messages.AUTH_APPLY_TOKEN, {"token": token})
+
+    msg = await connection.receive()
+
+    payload = msg.get('payload', {})
+    if msg.get('type_int') != Messages.AUTH_APPLY_TOKEN_RESPONSE or not payload.get('valid'):
+        return None
+    return payload
+
+
+async def setup_secure_connection(session, ip_address, authkey, token_cache=None, offload_crypto=True,
+                                  executor=None, limiter=None):
+    """Connect to a bridge and authenticate.
+
+    Handshakes wait for a slot of ``limiter``, by default the process-wide
+    HANDSHAKE_LIMITER. With ``offload_crypto`` the RSA encryption and login
+    hashing run on ``executor`` (the loop's default executor if None) rather
+    than on the event loop.
+    """
+    limiter = limiter if limiter is not None else HANDSHAKE_LIMITER
+    queued = time.perf_counter()
+    async with limiter:
+        return await _handshake(session, ip_address, authkey, token_cache, offload_crypto, executor,
+                                time.perf_counter() - queued)
+
+
+async def _handshake(session, ip_address, authkey, token_cache, offload_crypto, executor, queued):
+    loop = asyncio.get_running_loop()
+
+    async def crypto(function, *args):
+        if not offload_crypto:
+            return function(*args)
+        return await loop.run_in_executor(executor, function, *args)
+
     async def __receive(ws):
         msg = await ws.receive()
         msg = msg.data[:-1]
         # print(f"Received raw: {msg}")
-        return json.loads(msg)
+        return JSON.loads(msg)
 
     async def __send(ws, data):
-        msg = json.dumps(data)
+        msg = JSON.dumps(data).decode()
         # print(f"Send raw: {msg}")
         await ws.send_str(msg)
 
+    timings = {"queued": queued}
+    started = phase_started = time.perf_counter()
+
+    def phase(name):
+        nonlocal phase_started
+        now = time.perf_counter()
+        timings[name] = now - phase_started
+        phase_started = now
+
     ws = await session.ws_connect(f"http://{ip_address}/")
+    phase("connect")
 
     try:
         msg = await __receive(ws)
 
         #{'type_int': 0, 'ref': -1, 'info': 'no client-connection available (all used)!'}
         if msg['type_int'] == Messages.NACK:
-            raise Exception(msg["info"])
+            raise ConnectionUnavailableError(msg["info"])
 
         deviceId = msg['payload']['device_id']
         connectionId = msg['payload']['connection_id']
@@ -85,68 +349,47 @@ async def setup_secure_connection(session, ip_address, authkey):
         if msg['type_int'] == Messages.CONNECTION_DECLINED:
             raise Exception(msg["payload"]["error_message"])
 
+        phase("connection")
+
         await __send(ws, {"type_int": 14, "mc": -1})
 
         msg = await __receive(ws)
         publicKey = msg['payload']['public_key']
 
-        rsa = RSA.import_key(publicKey)
-
-        key = get_random_bytes(32)
-        iv = get_random_bytes(16)
-
-        cipher = PKCS1_v1_5.new(rsa)
-        secret = b64encode(cipher.encrypt(
-            (key.hex() + ":::" + iv.hex()).encode()))
-        # print(f"secret: {secret}")
-        secret = secret.decode()
+        key, iv, secret = await crypto(_session_secret, publicKey)
         # print(f"secret: {secret}")
 
         await __send(ws, {"type_int": 16, "mc": -1, "payload": {"secret": secret}})
 
         connection = SecureBridgeConnection(ws, key, iv, deviceId)
 
-        # Start LOGIN
-
         msg = await connection.receive()
 
         if msg['type_int'] != 17:
             raise Exception('Failed to establish secure connection')
 
-        salt = generateSalt()
-        password = hash(deviceId.encode(), authkey.encode(), salt.encode())
-
-        await connection.send_message(30, {
-            "username": "default",
-            "password": password,
-            "salt": salt
-        })
-
-        msg = await connection.receive()
-
-        if msg['type_int'] != 32:
-            raise Exception("Login failed")
-
-        token = msg['payload']['token']
-        await connection.send_message(33, {"token": token})
-
-        # {"type_int":34,"mc":-1,"payload":{"valid":true,"remaining":8640000}}
-        msg = await connection.receive()
-
-        # Renew token
-        await connection.send_message(37, {"token": token})
-
-        msg = await connection.receive()
+        phase("secure_channel")
 
-        if msg['type_int'] != 38:
-            raise Exception("Login failed")
+        # Reuse a cached token if we have one, falling back to a full login
+        token = token_cache.get(deviceId) if token_cache is not None else None
+        token_state = await _apply_cached_token(connection, token) if token is not None else None
 
-        token = msg['payload']['token']
+        if token_state is not None:
+            connection.resumed = True
+            phase("token")
+        else:
+            if token is not None:
+                token_cache.invalidate(deviceId)
+            token, token_state = await _login(connection, deviceId, authkey, crypto)
+            phase("login")
 
-        await connection.send_message(33, {"token": token})
+        if token_cache is not None and 'remaining' in token_state:
+            token_cache.put(deviceId, token, token_state['remaining'])
 
-        # {"type_int":34,"mc":-1,"payload":{"valid":true,"remaining":8640000}}
-        msg = await connection.receive()
+        timings["total"] = time.perf_counter() - started
+        connection.handshake_timings = timings
+        _LOGGER.debug("Connected to bridge %s at %s (%s) in %.3fs", deviceId, ip_address,
+                      "token resumed" if connection.resumed else "login", timings["total"])
 
         return connection
     except:
@@ -160,51 +403,303 @@ class SecureBridgeConnection:
         self.key = key
         self.iv = iv
         self.device_id = device_id
+        self._codec = AesFrameCodec(key, iv)
 
         self.state = ConnectionState.Initial
-        self._messageSubject = rx.subject.Subject()
+        self.closed = False
+        # Set once pump() has returned, for whatever reason; nothing can be sent after that
+        self.finished = False
+        self._messageSubject = Subject()
         self.mc = 0
-
-        self.messages = self._messageSubject.pipe(
-            ops.as_observable()
-        )
-
-    def __cipher(self):
-        return AES.new(self.key, AES.MODE_CBC, self.iv)
+        self.resumed = False
+        self.handshake_timings = {}
+
+        self._outbox = None
+        self._writer_task = None
+        self.max_outbox_depth = 0
+        self.frames_written = 0
+        self.write_batches = 0
+        self.total_write_latency = 0.0
+        self.max_write_latency = 0.0
+
+        self.command_timeout = 10.0
+        self.max_in_flight = 32
+        self._in_flight = {}
+        self._window = None
+        self.commands_acked = 0
+        self.commands_rejected = 0
+        self.commands_timed_out = 0
+        self.total_command_latency = 0.0
+        self.max_command_latency = 0.0
+        self.metrics = None
+        self.recorder = None
+        # A Gate the pump waits at before reading the next frame, see Overflow.BLOCK
+        self.backpressure = None
+
+        # Liveness: with heartbeat_interval set a HEARTBEAT is sent whenever
+        # nothing was received for that long, and with idle_timeout set the
+        # connection is torn down once nothing was received for that long.
+        self.heartbeat_interval = None
+        self.idle_timeout = None
+        self.heartbeats_sent = 0
+        self._last_received = None
+        self._heartbeat_handle = None
+        self._loop = None
+
+        self.messages = self._messageSubject.as_observable()
 
     def __decrypt(self, data):
-        ct = b64decode(data)
-        data = self.__cipher().decrypt(ct)
-        data = data.rstrip(b'\x00')
-        # print(f"Received decrypted: {data}")
-
-        if not data:
-            return {}
-
-        return json.loads(data.decode())
+        return self._codec.decode(data)
+
+    def enable_metrics(self, metrics):
+        """Record frame, byte, crypto, message type and fan-out metrics into ``metrics`` (None stops)."""
+        codec = self._codec
+        if isinstance(codec, MeteredCodec):
+            codec = codec._codec
+        self.metrics = metrics
+        self._codec = MeteredCodec(codec, metrics) if metrics is not None else codec
+
+    @property
+    def last_seen(self):
+        """Wall-clock time the last frame was received, or None before pump() starts."""
+        if self._last_received is None:
+            return None
+        return time.time() - (self._loop.time() - self._last_received)
+
+    def _schedule_heartbeat(self, loop):
+        return loop.call_later(self.heartbeat_interval, self._heartbeat, loop)
+
+    def _heartbeat(self, loop):
+        if self._outbox is None:
+            return
+        if loop.time() - self._last_received >= self.heartbeat_interval:
+            # Not tracked as a command: the ACK it provokes only has to be received
+            self.mc += 1
+            self._queue_frame({"type_int": int(Messages.HEARTBEAT), "mc": self.mc, "payload": {}})
+            self.heartbeats_sent += 1
+        self._heartbeat_handle = self._schedule_heartbeat(loop)
+
+    def _liveness_lost(self, loop):
+        idle = loop.time() - self._last_received
+        _LOGGER.warning("Nothing received from the bridge for %.1fs, reconnecting", idle)
+        if self.metrics is not None:
+            self.metrics.inc("liveness_timeouts")
+            self.metrics.observe("liveness_detection_seconds", idle)
+        return LivenessTimeoutError(idle)
+
+    @property
+    def outbox_depth(self) -> int:
+        """Number of frames waiting for the writer."""
+        return self._outbox.qsize() if self._outbox is not None else 0
+
+    def writer_stats(self) -> dict:
+        written = self.frames_written
+        return {
+            "outbox_depth": self.outbox_depth,
+            "max_outbox_depth": self.max_outbox_depth,
+            "frames_written": written,
+            "write_batches": self.write_batches,
+            "mean_write_latency": self.total_write_latency / written if written else 0.0,
+            "max_write_latency": self.max_write_latency,
+        }
+
+    def command_stats(self) -> dict:
+        acked = self.commands_acked
+        return {
+            "in_flight": len(self._in_flight),
+            "acked": acked,
+            "rejected": self.commands_rejected,
+            "timed_out": self.commands_timed_out,
+            "mean_latency": self.total_command_latency / acked if acked else 0.0,
+            "max_latency": self.max_command_latency,
+        }
+
+    def _track_command(self, mc):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        timer = loop.call_later(self.command_timeout, self._expire_command, mc)
+        self._in_flight[mc] = (future, time.perf_counter(), timer)
+        future.add_done_callback(self._command_done)
+        return future
+
+    def _command_done(self, future):
+        self._window.release()
+        if future.cancelled():
+            return
+        # Retrieving the exception here keeps asyncio from logging it for
+        # callers that never await the result.
+        if isinstance(future.exception(), CommandRejectedError):
+            self.commands_rejected += 1
+
+    def _expire_command(self, mc):
+        entry = self._in_flight.pop(mc, None)
+        if entry is not None and not entry[0].done():
+            self.commands_timed_out += 1
+            _LOGGER.debug("Command %s not acknowledged within %ss", mc, self.command_timeout)
+            entry[0].set_exception(CommandTimeoutError(mc, self.command_timeout))
+
+    def _resolve_command(self, message):
+        entry = self._in_flight.pop(message['ref'], None)
+        if entry is None:
+            return
+        future, sent_at, timer = entry
+        timer.cancel()
+        if future.done():
+            return
+        if message['type_int'] == Messages.NACK:
+            info = message.get('info')
+            error = _NACK_ERRORS.get(info, CommandRejectedError) if isinstance(info, int) else CommandRejectedError
+            _LOGGER.debug("Command %s rejected: %s", message['ref'], info)
+            future.set_exception(error(message['ref'], info))
+            return
+        latency = time.perf_counter() - sent_at
+        self.commands_acked += 1
+        self.total_command_latency += latency
+        if latency > self.max_command_latency:
+            self.max_command_latency = latency
+        future.set_result(CommandResult(message['ref'], latency, message))
+
+    def _fail_commands(self, error):
+        in_flight, self._in_flight = self._in_flight, {}
+        for future, _, timer in in_flight.values():
+            timer.cancel()
+            if not future.done():
+                future.set_exception(error)
+
+    def _queue_frame(self, data, future=None):
+        if self._outbox is None:
+            raise ConnectionError("Connection closed")
+        if self.recorder is not None:
+            self.recorder.record("out", data)
+        self._outbox.put_nowait((data, time.perf_counter(), future))
+        depth = self._outbox.qsize()
+        if depth > self.max_outbox_depth:
+            self.max_outbox_depth = depth
+
+    async def _write_loop(self):
+        outbox = self._outbox
+        while True:
+            batch = [await outbox.get()]
+            # Everything queued while the previous batch was written goes out
+            # back to back, so a burst of ACKs costs one wake-up of the writer.
+            while not outbox.empty():
+                batch.append(outbox.get_nowait())
+            self.write_batches += 1
+
+            for index, (data, queued_at, future) in enumerate(batch):
+                try:
+                    await self.websocket.send_str(self._codec.encode(data))
+                except Exception as e:
+                    for _, _, pending in batch[index:]:
+                        if pending is not None and not pending.done():
+                            pending.set_exception(e)
+                    raise
+                latency = time.perf_counter() - queued_at
+                self.frames_written += 1
+                self.total_write_latency += latency
+                if latency > self.max_write_latency:
+                    self.max_write_latency = latency
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+    def _stop_writer(self):
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            self._writer_task = None
+        if self._outbox is not None:
+            while not self._outbox.empty():
+                _, _, future = self._outbox.get_nowait()
+                if future is not None and not future.done():
+                    future.set_exception(ConnectionError("Connection closed"))
+            self._outbox = None
+        self._fail_commands(ConnectionError("Connection closed"))
+
+    def _on_writer_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            # A failed write leaves the socket unusable; closing it ends pump().
+            _LOGGER.warning("Writing to the bridge failed: %r", task.exception())
+            asyncio.ensure_future(self.websocket.close())
 
     async def pump(self):
         self.state = ConnectionState.Loading
 
-        await self.send_message(240, {})
-        await self.send_message(242, {})
-        await self.send_message(2, {})
-
-        async for msg in self.websocket:
-            if msg.type == aiohttp.WSMsgType.TEXT:
-                result = self.__decrypt(msg.data)
-
-                if 'mc' in result:
-                    # ACK
-                    await self.send({"type_int": 1, "ref": result['mc']})
-
-                if 'payload' in result:
-                    self._messageSubject.on_next(result)
-
-            elif msg.type == aiohttp.WSMsgType.ERROR:
-                break
+        self._outbox = asyncio.Queue()
+        self._window = asyncio.Semaphore(self.max_in_flight)
+        self._writer_task = asyncio.create_task(self._write_loop())
+        self._writer_task.add_done_callback(self._on_writer_done)
+
+        loop = self._loop = asyncio.get_running_loop()
+        self._last_received = loop.time()
+        self._heartbeat_handle = self._schedule_heartbeat(loop) if self.heartbeat_interval else None
+
+        try:
+            await self.send_message(240, {})
+            await self.send_message(242, {})
+            await self.send_message(2, {})
+
+            websocket = self.websocket
+            idle_timeout = self.idle_timeout
+            backpressure = self.backpressure
+            while True:
+                try:
+                    msg = await websocket.receive(timeout=idle_timeout)
+                except asyncio.TimeoutError:
+                    error = self._liveness_lost(loop)
+                    # The timed out receive marked the socket as abnormally
+                    # closed, so this does not wait for the peer's close frame.
+                    try:
+                        await asyncio.wait_for(websocket.close(), 1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    raise error from None
+                self._last_received = loop.time()
+                if self._outbox is None:
+                    # close() already stopped the writer; drop what was still buffered
+                    break
+
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    result = self.__decrypt(msg.data)
+                    if self.recorder is not None:
+                        self.recorder.record("in", result)
+
+                    if 'mc' in result:
+                        # ACK
+                        self._queue_frame({"type_int": 1, "ref": result['mc']})
+
+                    if 'payload' in result:
+                        metrics = self.metrics
+                        if metrics is None:
+                            self._messageSubject.on_next(result)
+                        else:
+                            metrics.inc("messages_received", label=message_label(result.get('type_int')))
+                            started = time.perf_counter()
+                            self._messageSubject.on_next(result)
+                            metrics.observe("fanout_seconds", time.perf_counter() - started)
+                    elif 'ref' in result:
+                        self._resolve_command(result)
+
+                    if backpressure is not None and not backpressure.is_open:
+                        await backpressure.wait()
+
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    _LOGGER.warning("Websocket error: %r", self.websocket.exception())
+                    break
+                elif msg.type in _CLOSED_TYPES:
+                    break
+        except ConnectionError:
+            # Sends fail once close() stopped the writer; that is not an error
+            if not self.closed:
+                raise
+        finally:
+            if self._heartbeat_handle is not None:
+                self._heartbeat_handle.cancel()
+                self._heartbeat_handle = None
+            self.finished = True
+            self._stop_writer()
 
     async def close(self):
+        self.closed = True
+        self._stop_writer()
         await self.websocket.close()
 
     async def receive(self):
@@ -213,17 +708,46 @@ class SecureBridgeConnection:
         return self.__decrypt(msg.data)
 
     async def send_message(self, message_type, payload):
-        self.mc += 1
-
+        """Send a command and return a future for its acknowledgement.
+
+        Once pump() is running the future resolves to a CommandResult when the
+        bridge ACKs the command, or raises CommandRejectedError (or one of its
+        subclasses for the NACK_INFO_* codes) or CommandTimeoutError. At most
+        ``max_in_flight`` commands await an ACK at a time; further sends wait
+        for a slot. Returns None during the handshake and for messages the
+        bridge does not ACK.
+        """
         if isinstance(message_type, Messages):
             message_type = message_type.value
+        if self.closed or self.finished:
+            raise ConnectionError("Connection closed")
+
+        tracked = self._outbox is not None and message_type not in _UNACKNOWLEDGED
+        if tracked:
+            await self._window.acquire()
+            if self._outbox is None:
+                self._window.release()
+                raise ConnectionError("Connection closed")
 
-        await self.send({"type_int": message_type, "mc": self.mc, "payload": payload})
+        self.mc += 1
+        mc = self.mc
+        future = self._track_command(mc) if tracked else None
+        if self.metrics is not None:
+            self.metrics.inc("messages_sent", label=message_label(message_type))
+
+        await self.send({"type_int": message_type, "mc": mc, "payload": payload})
+        return future
 
     async def send(self, data):
-        msg = json.dumps(data)
-        # print(f"Send raw: {msg}")
-        msg = _pad_string(msg.encode())
-        msg = self.__cipher().encrypt(msg)
-        msg = b64encode(msg).decode() + '\u0004'
-        await self.websocket.send_str(msg)
+        if self.closed or self.finished:
+            raise ConnectionError("Connection closed")
+        if self._outbox is None:
+            # Handshake, before pump() has started the writer. After pump()
+            # the outbox is gone too, but then finished is set.
+            if self.recorder is not None:
+                self.recorder.record("out", data)
+            await self.websocket.send_str(self._codec.encode(data))
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._queue_frame(data, future)
+        await future
@@ -1,12 +1,71 @@
 from contextlib import nullcontext
-import rx
+from .observable import BehaviorSubject
 from datetime import datetime
+from operator import attrgetter
+from .log import DEVICES as _LOGGER
 from .messages import Messages, ShadeOperationState
 from typing import Optional
 
+_set = object.__setattr__
+_EQUAL = object()
+
+
+def unchanged(old, new) -> bool:
+    """Whether ``new`` carries nothing that ``old`` did not.
+
+    State classes list the fields to compare in ``_key``. A ``_key`` of None
+    means every update is meaningful (rocker presses), and plain values such as
+    the bool a DoorWindowSensor emits are compared directly.
+    """
+    if old is None or type(old) is not type(new):
+        return False
+    key = getattr(type(new), "_key", _EQUAL)
+    if key is None:
+        return False
+    if key is _EQUAL:
+        return old == new
+    return key(old) == key(new)
+
+
+class StateEmitter:
+    """Publishes to ``self.state``, dropping updates that change nothing.
+
+    Set ``suppress_unchanged`` to False to emit every update. ``emitted`` and
+    ``suppressed`` count what happened to each update. The bridge sets
+    ``_on_change`` to forward emitted states to ``Bridge.events()``.
+    """
+
+    suppress_unchanged = True
+    emitted = 0
+    suppressed = 0
+    _on_change = None
+
+    def _publish(self, state):
+        if self.suppress_unchanged and unchanged(self.state.value, state):
+            self.suppressed += 1
+            return
+        self.emitted += 1
+        self.state.on_next(state)
+        if self._on_change is not None:
+            self._on_change(self, state)
+
+
+
 class DeviceState:
+    """Immutable snapshot of a device state.
+
+    ``payload`` is the message the snapshot was built from, shared rather than
+    copied, so it must not be mutated.
+    """
+
+    __slots__ = ("payload",)
+    _key = attrgetter("payload")
+
     def __init__(self, payload):
-        self.payload = payload.copy()
+        _set(self, "payload", payload)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
 
     def __str__(self):
         return f"DeviceState({self.payload})"
@@ -14,10 +73,13 @@ class DeviceState:
     __repr__ = __str__
 
 class LightState(DeviceState):
+    __slots__ = ("switch", "dimmvalue")
+    _key = attrgetter("switch", "dimmvalue")
+
     def __init__(self, switch, dimmvalue, payload):
-        DeviceState.__init__(self, payload)
-        self.switch = switch
-        self.dimmvalue = dimmvalue
+        _set(self, "payload", payload)
+        _set(self, "switch", switch)
+        _set(self, "dimmvalue", dimmvalue)
 
     def __str__(self):
         return f"LightState({self.switch}, {self.dimmvalue})"
@@ -25,10 +87,13 @@ class LightState(DeviceState):
     __repr__ = __str__
 
 class RcTouchState(DeviceState):
+    __slots__ = ("temperature", "humidity")
+    _key = attrgetter("temperature", "humidity")
+
     def __init__(self, temperature, humidity, payload):
-        DeviceState.__init__(self, payload)
-        self.temperature = temperature
-        self.humidity = humidity
+        _set(self, "payload", payload)
+        _set(self, "temperature", temperature)
+        _set(self, "humidity", humidity)
 
     def __str__(self):
         return f"RcTouchState({self.temperature}, {self.humidity})"
@@ -36,8 +101,7 @@ class RcTouchState(DeviceState):
     __repr__ = __str__
 
 class HeaterState(DeviceState):
-    def __init__(self, payload):
-        DeviceState.__init__(self, payload)
+    __slots__ = ()
 
     def __str__(self):
         return f"HeaterState({self.payload})"
@@ -45,21 +109,33 @@ class HeaterState(DeviceState):
     __repr__ = __str__
 
 class ShadeState(DeviceState):
-    def __init__(self, initial_payload=None):
-        super().__init__(initial_payload or {})
-        self.current_state: int | None = None
-        self.is_safety_enabled: bool | None = None
-        self.position: int | None = None
-
-    def update_from_partial_state_update(self, payload: dict) -> None:
-        """Aggregate partial state updates from the bridge."""
-        self.payload.update(payload)
-        if (current_state := payload.get("curstate")) is not None:
-            self.current_state = current_state
-        if (safety := payload.get("shSafety")) is not None:
-            self.is_safety_enabled = safety != 0
-        if (position := payload.get("shPos")) is not None:
-            self.position = position
+    """Shade state aggregated from partial updates; ``payload`` holds every field received so far."""
+
+    __slots__ = ("current_state", "is_safety_enabled", "position")
+    _key = attrgetter("current_state", "is_safety_enabled", "position")
+
+    def __init__(self, initial_payload=None, *, current_state: int | None = None,
+                 is_safety_enabled: bool | None = None, position: int | None = None):
+        _set(self, "payload", initial_payload if initial_payload is not None else {})
+        _set(self, "current_state", current_state)
+        _set(self, "is_safety_enabled", is_safety_enabled)
+        _set(self, "position", position)
+
+    def merged(self, payload: dict) -> "ShadeState":
+        """Return a new state with a partial state update from the bridge applied."""
+        current_state = payload.get("curstate")
+        safety = payload.get("shSafety")
+        position = payload.get("shPos")
+        return ShadeState(
+            {**self.payload, **payload},
+            current_state=self.current_state if current_state is None else current_state,
+            is_safety_enabled=self.is_safety_enabled if safety is None else safety != 0,
+            position=self.position if position is None else position,
+        )
+
+    def update_from_partial_state_update(self, payload: dict) -> "ShadeState":
+        """Deprecated: states are immutable, so this returns ``merged(payload)`` instead of updating in place."""
+        return self.merged(payload)
 
     @property
     def is_closed(self) -> bool | None:
@@ -72,10 +148,14 @@ class ShadeState(DeviceState):
         return f"ShadeState(current_state={self.current_state}, is_safety_enabled={self.is_safety_enabled}, position={self.position}, payload={self.payload})"
 
 class RockerState(DeviceState):
+    __slots__ = ("is_on", "timestamp")
+    # Every rocker report is a button press, even if is_on did not change
+    _key = None
+
     def __init__(self, is_on, payload):
-        super().__init__(payload)
-        self.is_on = is_on
-        self.timestamp = datetime.now()
+        _set(self, "payload", payload)
+        _set(self, "is_on", is_on)
+        _set(self, "timestamp", datetime.now())
 
     def __str__(self):
         return f"RockerState(is_on={self.is_on}, timestamp={self.timestamp}, payload={self.payload})"
@@ -83,25 +163,39 @@ class RockerState(DeviceState):
     __repr__ = __str__
 
 class SwitchState(DeviceState):
+    __slots__ = ("is_on", "timestamp")
+    # The payload carries fields not modelled here, such as a Smartstikk's power
+    _key = attrgetter("is_on", "payload")
+
     def __init__(self, is_on, payload):
-        super().__init__(payload)
-        self.is_on = is_on
-        self.timestamp = datetime.now()
+        _set(self, "payload", payload)
+        _set(self, "is_on", is_on)
+        _set(self, "timestamp", datetime.now())
 
     def __str__(self):
         return f"SwitchState(is_on={self.is_on}, timestamp={self.timestamp}, payload={self.payload})"
 
     __repr__ = __str__
 
-class BridgeDevice:
+def _climate_info(payload):
+    temperature = None
+    humidity = None
+    for info in payload.get('info', ()):
+        if info['text'] == "1222":
+            temperature = float(info['value'])
+        if info['text'] == "1223":
+            humidity = float(info['value'])
+    return temperature, humidity
+
+class BridgeDevice(StateEmitter):
     def __init__(self, bridge, device_id, name):
         self.bridge = bridge
         self.device_id = device_id
         self.name = name
-        self.state = rx.subject.BehaviorSubject(None)
+        self.state = BehaviorSubject(None)
 
     def handle_state(self, payload):
-        self.state.on_next(DeviceState(payload))
+        self._publish(DeviceState(payload))
 
 class Light(BridgeDevice):
     def __init__(self, bridge, device_id, name, dimmable):
@@ -118,14 +212,14 @@ class Light(BridgeDevice):
     def handle_state(self, payload):
         switch = payload['switch']
         dimmvalue = self.interpret_dimmvalue_from_payload(switch, payload)
-        self.state.on_next(LightState(switch, dimmvalue, payload))
+        self._publish(LightState(switch, dimmvalue, payload))
 
     async def switch(self, switch: bool):
-        await self.bridge.switch_device(self.device_id, {"switch": switch})
+        return await self.bridge.switch_device(self.device_id, {"switch": switch})
 
     async def dimm(self, value: int):
         value = max(0, min(99, value))
-        await self.bridge.slide_device(self.device_id, {"dimmvalue": value})
+        return await self.bridge.slide_device(self.device_id, {"dimmvalue": value})
 
     def __str__(self):
         return f"Light({self.device_id}, \"{self.name}\", dimmable: {self.dimmable}, state:{self.state.value})"
@@ -138,17 +232,18 @@ class RcTouch(BridgeDevice):
         self.comp_id = comp_id
 
     def handle_state(self, payload):
-        print(f"RcTouchState::: {payload}")
-        temperature = None
-        humidity = None
-        if 'info' in payload:
-            for info in payload['info']:
-                if info['text'] == "1222":
-                    temperature = float(info['value'])
-                if info['text'] == "1223":
-                    humidity = float(info['value'])
+        _LOGGER.debug("RcTouch %s received state update: %s", self.device_id, payload)
+        temperature, humidity = _climate_info(payload)
         if temperature is not None and humidity is not None:
-            self.state.on_next(RcTouchState(temperature, humidity, payload))
+            self._publish(RcTouchState(temperature, humidity, payload))
+
+class TemperatureSensor(RcTouch):
+    """Temperature or temperature/humidity sensor; humidity stays None if not reported."""
+
+    def handle_state(self, payload):
+        temperature, humidity = _climate_info(payload)
+        if temperature is not None:
+            self._publish(RcTouchState(temperature, humidity, payload))
 
 class Heater(BridgeDevice):
     def __init__(self, bridge, device_id, name, comp_id):
@@ -159,46 +254,50 @@ class Shade(BridgeDevice):
     def __init__(self, bridge, device_id, name, comp_id):
         super().__init__(bridge, device_id, name)
         self.comp_id = comp_id
-        self.__shade_state = ShadeState()
         self.payload = {}
+        self._supports_position = False
 
     @property
     def supports_go_to(self) -> bool | None:
         """Check if the shade supports precise position control."""
         if (component := self.bridge._comps.get(self.comp_id)) is not None:
-            return component.comp_type == 86 and "shPos" in self.__shade_state.payload
+            return component.comp_type == 86 and self._supports_position
         return None
-    
+
     def handle_state(self, payload):
         """Update the shade state with incoming data."""
-        self.__shade_state.update_from_partial_state_update(payload)
-        self.state.on_next(self.__shade_state)
+        if "shPos" in payload:
+            self._supports_position = True
+        previous = self.state.value
+        if previous is None:
+            previous = ShadeState()
+        self._publish(previous.merged(payload))
 
     async def send_state(self, state, **kwargs):
         """Send a state command to the shade, respecting safety checks."""
-        if self.__shade_state.is_safety_enabled:
+        if self.state.value is not None and self.state.value.is_safety_enabled:
             return
-        await self.bridge.send_message(
+        return await self.bridge.send_message(
             Messages.SET_DEVICE_SHADING_STATE,
             {"deviceId": self.device_id, "state": state, **kwargs}
         )
 
     async def move_down(self):
         """Move the shade down (close)."""
-        await self.send_state(ShadeOperationState.CLOSE)
+        return await self.send_state(ShadeOperationState.CLOSE)
 
     async def move_up(self):
         """Move the shade up (open)."""
-        await self.send_state(ShadeOperationState.OPEN)
+        return await self.send_state(ShadeOperationState.OPEN)
 
     async def move_stop(self):
         """Stop the shade movement."""
-        await self.send_state(ShadeOperationState.STOP)
+        return await self.send_state(ShadeOperationState.STOP)
 
     async def move_to_position(self, position: int):
         """Move the shade to a specific position (0-100)."""
         if self.supports_go_to and 0 <= position <= 100:
-            await self.send_state(ShadeOperationState.GO_TO, value=position)
+            return await self.send_state(ShadeOperationState.GO_TO, value=position)
 
 class DoorWindowSensor(BridgeDevice):
     def __init__(self, bridge, device_id, name, comp_id, payload):
@@ -212,7 +311,7 @@ class DoorWindowSensor(BridgeDevice):
         if (state := payload.get("curstate")) is not None:
             self.is_closed = state == 1
             self.is_open = not self.is_closed
-        self.state.on_next(self.is_closed)
+        self._publish(self.is_closed)
 
 class WindowSensor(DoorWindowSensor):
     pass
@@ -220,6 +319,18 @@ class WindowSensor(DoorWindowSensor):
 class DoorSensor(DoorWindowSensor):
     pass
 
+class WaterSensor(BridgeDevice):
+    def __init__(self, bridge, device_id, name, comp_id, payload):
+        BridgeDevice.__init__(self, bridge, device_id, name)
+        self.comp_id = comp_id
+        self.payload = payload
+        self.is_wet: Optional[bool] = None
+
+    def handle_state(self, payload):
+        if (state := payload.get("curstate")) is not None:
+            self.is_wet = state == 1
+        self._publish(self.is_wet)
+
 class Rocker(BridgeDevice):
     def __init__(self, bridge, device_id, name, comp_id, payload):
         super().__init__(bridge, device_id, name)
@@ -230,26 +341,30 @@ class Rocker(BridgeDevice):
             self.is_on = bool(payload["curstate"])
         elif isinstance(payload, bool):
             self.is_on = payload
-        self.state = rx.subject.BehaviorSubject(None)
+        self.state = BehaviorSubject(None)
+        self._name_with_controlled = (None, None)
 
     @property
     def name_with_controlled(self) -> str:
-        names_of_controlled: set[str] = set()
-        for device_id in self.payload.get("controlId", []):
-            device = self.bridge._devices.get(device_id)
-            if device:
-                names_of_controlled.add(device.name)
-        return f"{self.name} ({', '.join(sorted(names_of_controlled))})"
+        # Rebuilt only when the bridge's index says devices or controls changed
+        index = self.bridge._index
+        version, name = self._name_with_controlled
+        if version != index.version:
+            devices = self.bridge._devices
+            names_of_controlled = {devices[device_id].name for device_id in index.controlled_by(self.device_id)
+                                   if device_id in devices}
+            name = f"{self.name} ({', '.join(sorted(names_of_controlled))})"
+            self._name_with_controlled = (index.version, name)
+        return name
 
     def handle_state(self, payload, broadcast: bool = True) -> None:
-        print(f"Rocker {self.device_id} received state update: {payload}")
-        self.payload.update(payload)
+        # A new dict rather than update(), so the published snapshots keep theirs
+        self.payload = {**self.payload, **payload}
         curstate = payload.get("curstate", self.is_on if self.is_on is not None else False)
         self.is_on = bool(curstate)
-        print(f"Rocker {self.device_id} computed is_on: {self.is_on}")
+        _LOGGER.debug("Rocker %s received state update %s, is_on: %s", self.device_id, payload, self.is_on)
         if broadcast:
-            print(f"Rocker {self.device_id} broadcasting state: {self.is_on}")
-            self.state.on_next(RockerState(self.is_on, self.payload))
+            self._publish(RockerState(self.is_on, self.payload))
 
     def __str__(self):
         return f'Rocker({self.device_id}, "{self.name}", is_on: {self.is_on}, payload: {self.payload})'
@@ -264,23 +379,25 @@ class Switch(BridgeDevice):
             self.is_on = bool(payload["switch"])
         elif isinstance(payload, bool):
             self.is_on = payload
-        self.state = rx.subject.BehaviorSubject(None)
+        self.state = BehaviorSubject(None)
 
     def handle_state(self, payload, broadcast: bool = True) -> None:
-        print(f"Switch {self.device_id} received state update: {payload}")
-        self.payload.update(payload)
+        # A new dict rather than update(), so the published snapshots keep theirs
+        self.payload = {**self.payload, **payload}
         switch_state = payload.get("switch", self.is_on if self.is_on is not None else False)
         self.is_on = bool(switch_state)
-        print(f"Switch {self.device_id} computed is_on: {self.is_on}")
+        _LOGGER.debug("Switch %s received state update %s, is_on: %s", self.device_id, payload, self.is_on)
         if broadcast:
-            print(f"Switch {self.device_id} broadcasting state: {self.is_on}")
-            self.state.on_next(SwitchState(self.is_on, self.payload))
+            self._publish(SwitchState(self.is_on, self.payload))
 
     async def switch(self, switch: bool):
         """Switch the outlet on or off."""
-        await self.bridge.switch_device(self.device_id, {"switch": switch})
+        return await self.bridge.switch_device(self.device_id, {"switch": switch})
 
     def __str__(self):
         return f'Switch({self.device_id}, "{self.name}", is_on: {self.is_on}, payload: {self.payload})'
 
-    __repr__ = __str__
\ No newline at end of file
+    __repr__ = __str__
+
+class WaterGuard(Switch):
+    """Water guard main valve, switched like an outlet."""
@@ -0,0 +1,417 @@
+import asyncio
+import json
+import math
+import secrets
+from collections import deque
+from base64 import b64encode, b64decode
+from aiohttp import web, WSMsgType
+from Crypto.Cipher import AES, PKCS1_v1_5
+from Crypto.PublicKey import RSA
+from .connection import hash as login_hash, _pad_string
+from .constants import ComponentTypes, DeviceTypes
+from .messages import Messages
+
+NO_CONNECTION_AVAILABLE = 'no client-connection available (all used)!'
+
+# Answered with a response message (auth) or an ACK/NACK after validation (actions)
+_NOT_ACKED = frozenset({
+    Messages.AUTH_LOGIN,
+    Messages.AUTH_APPLY_TOKEN,
+    Messages.AUTH_VERIFY_TOKEN,
+    Messages.AUTH_RENEW_TOKEN,
+    Messages.ACTION_SWITCH_DEVICE,
+    Messages.ACTION_SLIDE_DEVICE,
+    Messages.ACTION_SWITCH_ROOM,
+    Messages.ACTION_SLIDE_ROOM,
+    Messages.ACTIVATE_SCENE,
+})
+
+_ACTIONS = frozenset({
+    Messages.ACTION_SWITCH_DEVICE,
+    Messages.ACTION_SLIDE_DEVICE,
+    Messages.ACTION_SWITCH_ROOM,
+    Messages.ACTION_SLIDE_ROOM,
+    Messages.ACTIVATE_SCENE,
+})
+
+_shared_rsa_key = None
+
+
+def _default_rsa_key():
+    # Generating a 2048 bit key takes a noticeable fraction of a second, so all
+    # emulators in a process share one unless a key is passed in explicitly.
+    global _shared_rsa_key
+    if _shared_rsa_key is None:
+        _shared_rsa_key = RSA.generate(2048)
+    return _shared_rsa_key
+
+
+class _EmulatedClient:
+    def __init__(self, ws, connection_id):
+        self.ws = ws
+        self.connection_id = connection_id
+        self.key = None
+        self.iv = None
+        self.mc = 0
+        self.authenticated = False
+        self.event_task = None
+        self.stalled = False
+
+    def encrypt(self, data):
+        msg = _pad_string(json.dumps(data).encode())
+        msg = AES.new(self.key, AES.MODE_CBC, self.iv).encrypt(msg)
+        return b64encode(msg).decode() + '\u0004'
+
+    def decrypt(self, data):
+        data = AES.new(self.key, AES.MODE_CBC, self.iv).decrypt(b64decode(data))
+        data = data.rstrip(b'\x00')
+        if not data:
+            return {}
+        return json.loads(data.decode())
+
+    async def send_plain(self, data):
+        await self.ws.send_str(json.dumps(data) + '\u0004')
+
+    async def send(self, data):
+        if self.stalled:
+            return
+        await self.ws.send_str(self.encrypt(data))
+
+    async def send_message(self, message_type, payload):
+        self.mc += 1
+        await self.send({"type_int": int(message_type), "mc": self.mc, "payload": payload})
+
+    async def receive_plain(self):
+        msg = await self.ws.receive()
+        if msg.type != WSMsgType.TEXT:
+            raise ConnectionError(f"Unexpected frame during handshake: {msg.type}")
+        return json.loads(msg.data)
+
+
+class BridgeEmulator:
+    """Local stand-in for an xComfort Bridge.
+
+    Speaks the same websocket protocol as the real bridge, including the RSA/AES
+    handshake and token login, and serves a synthetic home with a configurable
+    number of devices, rooms and comps. Optionally pushes SET_STATE_INFO or
+    SET_DEVICE_STATE events to every loaded client at ``event_rate`` events per
+    second (``math.inf`` sends as fast as the socket allows).
+    """
+
+    def __init__(self, authkey: str, device_count: int = 10, room_count: int = 2, comp_count: int = 5,
+                 scene_count: int = 0,
+                 event_rate: float = 0, event_type: Messages = Messages.SET_STATE_INFO,
+                 items_per_event: int = 1, devices_per_frame: int = 50, max_clients: int = 4,
+                 device_id: str = "emulated-bridge", rsa_key=None, host: str = "127.0.0.1", port: int = 0,
+                 token_remaining: int = 8640000):
+        self.authkey = authkey
+        self.event_rate = event_rate
+        self.event_type = Messages(event_type)
+        self.items_per_event = items_per_event
+        self.devices_per_frame = devices_per_frame
+        self.max_clients = max_clients
+        self.device_id = device_id
+        self.host = host
+        self.port = port
+        self.token_remaining = token_remaining
+        self._rsa_key = rsa_key
+        self._runner = None
+        self._clients = set()
+        self._tokens = set()
+        self._next_event_device = 0
+
+        self.connections_accepted = 0
+        self.frames_received = 0
+        self.events_sent = 0
+        self.received = deque(maxlen=1000)
+
+        self.comps = {}
+        for comp_id in range(1, comp_count + 1):
+            comp_type = ComponentTypes.DIMMING_ACTUATOR if comp_id % 2 else ComponentTypes.LIGHT_SWITCH_ACTUATOR
+            self.comps[comp_id] = {"compId": comp_id, "name": f"Comp {comp_id}", "compType": int(comp_type)}
+
+        self.devices = {}
+        for device_id in range(1, device_count + 1):
+            dimmable = device_id % 2 == 1
+            self.devices[device_id] = {
+                "deviceId": device_id,
+                "name": f"Device {device_id}",
+                "devType": int(DeviceTypes.ACTUATOR_DIMM if dimmable else DeviceTypes.ACTUATOR_SWITCH),
+                "compId": (device_id - 1) % comp_count + 1 if comp_count else 0,
+                "usage": 0,
+                "dimmable": dimmable,
+                "switch": False,
+                "dimmvalue": 0,
+            }
+
+        self.rooms = {}
+        for room_id in range(1, room_count + 1):
+            self.rooms[room_id] = {
+                "roomId": room_id,
+                "name": f"Room {room_id}",
+                "devices": [d for d in self.devices if (d - 1) % room_count + 1 == room_id],
+                "setpoint": 21.0,
+                "temp": 20.5,
+                "humidity": 40.0,
+                "power": 0.0,
+                "currentMode": 3,
+                "mode": 3,
+                "state": 0,
+                "modes": [{"mode": 1, "value": 16.0}, {"mode": 2, "value": 19.0}, {"mode": 3, "value": 21.0}],
+            }
+
+        # Scene n switches on every device of room n
+        self.scenes = {}
+        for scene_id in range(1, min(scene_count, room_count) + 1):
+            self.scenes[scene_id] = {
+                "sceneId": scene_id,
+                "name": f"Scene {scene_id}",
+                "devices": [{"deviceId": d, "switch": True} for d in self.rooms[scene_id]["devices"]],
+            }
+
+    @property
+    def address(self) -> str:
+        """The ``host:port`` to pass to ``Bridge`` as its ip address."""
+        return f"{self.host}:{self.port}"
+
+    async def start(self):
+        if self._rsa_key is None:
+            self._rsa_key = _default_rsa_key()
+        app = web.Application()
+        app.router.add_get("/", self._handle_websocket)
+        self._runner = web.AppRunner(app, handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        for client in list(self._clients):
+            if client.event_task is not None:
+                client.event_task.cancel()
+            await client.ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def drop_connections(self):
+        """Close every client socket, as a bridge reboot would."""
+        for client in list(self._clients):
+            await client.ws.close()
+
+    def stall(self):
+        """Stop answering on every open connection but keep the sockets up, like a half-open connection."""
+        for client in self._clients:
+            client.stalled = True
+
+    async def push_state(self, items):
+        """Send one SET_STATE_INFO frame with the given items to every loaded client."""
+        for client in list(self._clients):
+            if client.authenticated:
+                await client.send_message(Messages.SET_STATE_INFO, {"item": items})
+
+    def _next_event_items(self):
+        items = []
+        device_ids = list(self.devices)
+        for _ in range(self.items_per_event):
+            device = self.devices[device_ids[self._next_event_device % len(device_ids)]]
+            self._next_event_device += 1
+            device["switch"] = not device["switch"]
+            device["dimmvalue"] = (device["dimmvalue"] + 7) % 100
+            items.append({"deviceId": device["deviceId"], "switch": device["switch"],
+                          "dimmvalue": device["dimmvalue"]})
+        return items
+
+    async def _send_event(self, client):
+        items = self._next_event_items()
+        if self.event_type == Messages.SET_DEVICE_STATE:
+            for item in items:
+                await client.send_message(Messages.SET_DEVICE_STATE, item)
+        else:
+            await client.send_message(Messages.SET_STATE_INFO, {"item": items})
+        self.events_sent += len(items)
+
+    async def _event_loop(self, client):
+        if not self.devices:
+            return
+        loop = asyncio.get_running_loop()
+        interval = 0 if math.isinf(self.event_rate) else 1 / self.event_rate
+        deadline = loop.time()
+        while not client.ws.closed:
+            await self._send_event(client)
+            deadline += interval
+            await asyncio.sleep(max(0, deadline - loop.time()))
+
+    async def _send_all_data(self, client):
+        devices = list(self.devices.values())
+        chunks = [devices[i:i + self.devices_per_frame]
+                  for i in range(0, len(devices), self.devices_per_frame)] or [[]]
+        for chunk in chunks[:-1]:
+            await client.send_message(Messages.SET_ALL_DATA, {"devices": chunk})
+        await client.send_message(Messages.SET_ALL_DATA, {
+            "devices": chunks[-1],
+            "comps": list(self.comps.values()),
+            "rooms": list(self.rooms.values()),
+            "scenes": list(self.scenes.values()),
+            "lastItem": True,
+        })
+
+    def _resolve_action(self, message_type, payload):
+        """Return (device, action) pairs for an action message, or a NACK info code."""
+        if message_type in (Messages.ACTION_SWITCH_DEVICE, Messages.ACTION_SLIDE_DEVICE):
+            device = self.devices.get(payload.get("deviceId"))
+            if device is None:
+                return Messages.NACK_INFO_UNKNOWN_DEVICE
+            if message_type == Messages.ACTION_SLIDE_DEVICE and not device["dimmable"]:
+                return Messages.NACK_INFO_DEVICE_NOT_DIMMABLE
+            return [(device, payload)]
+        if message_type == Messages.ACTIVATE_SCENE:
+            scene = self.scenes.get(payload.get("sceneId"))
+            if scene is None:
+                return Messages.NACK_INFO_INVALID_ACTION
+            return [(self.devices[item["deviceId"]], item) for item in scene["devices"]]
+        room = self.rooms.get(payload.get("roomId"))
+        if room is None:
+            return Messages.NACK_INFO_INVALID_ACTION
+        devices = [self.devices[device_id] for device_id in room["devices"]]
+        if message_type == Messages.ACTION_SLIDE_ROOM:
+            devices = [device for device in devices if device["dimmable"]]
+        return [(device, payload) for device in devices]
+
+    async def _handle_action(self, client, message_type, mc, payload):
+        targets = self._resolve_action(message_type, payload)
+        if not isinstance(targets, list):
+            await client.send({"type_int": int(Messages.NACK), "ref": mc, "info": int(targets)})
+            return
+        await client.send({"type_int": int(Messages.ACK), "ref": mc})
+        items = []
+        for device, action in targets:
+            if "dimmvalue" in action:
+                device["dimmvalue"] = action["dimmvalue"]
+                device["switch"] = device["dimmvalue"] > 0
+            else:
+                device["switch"] = bool(action.get("switch"))
+            items.append({"deviceId": device["deviceId"], "switch": device["switch"],
+                          "dimmvalue": device["dimmvalue"]})
+        if items:
+            await self.push_state(items)
+
+    async def _handle_message(self, client, msg):
+        self.frames_received += 1
+        message_type = msg.get("type_int")
+        payload = msg.get("payload", {})
+        self.received.append(msg)
+
+        if message_type == Messages.ACK:
+            return
+        if "mc" in msg and client.authenticated and message_type not in _NOT_ACKED:
+            await client.send({"type_int": int(Messages.ACK), "ref": msg["mc"]})
+
+        if message_type == Messages.AUTH_LOGIN:
+            expected = login_hash(self.device_id.encode(), self.authkey.encode(), payload["salt"].encode())
+            if payload.get("password") != expected:
+                await client.send({"type_int": int(Messages.AUTH_LOGIN_DENIED), "mc": -1, "payload": {}})
+                return
+            token = secrets.token_hex(16)
+            self._tokens.add(token)
+            await client.send({"type_int": int(Messages.AUTH_LOGIN_SUCCESS), "mc": -1,
+                               "payload": {"token": token}})
+        elif message_type in (Messages.AUTH_APPLY_TOKEN, Messages.AUTH_VERIFY_TOKEN):
+            valid = payload.get("token") in self._tokens
+            if message_type == Messages.AUTH_APPLY_TOKEN:
+                client.authenticated = valid
+            response = (Messages.AUTH_APPLY_TOKEN_RESPONSE if message_type == Messages.AUTH_APPLY_TOKEN
+                        else Messages.AUTH_VERIFY_TOKEN_RESPONSE)
+            await client.send({"type_int": int(response), "mc": -1,
+                               "payload": {"valid": valid, "remaining": self.token_remaining if valid else 0}})
+        elif message_type == Messages.AUTH_RENEW_TOKEN:
+            if payload.get("token") not in self._tokens:
+                await client.send({"type_int": int(Messages.AUTH_LOGIN_DENIED), "mc": -1, "payload": {}})
+                return
+            self._tokens.discard(payload["token"])
+            token = secrets.token_hex(16)
+            self._tokens.add(token)
+            await client.send({"type_int": int(Messages.AUTH_RENEW_TOKEN_RESPONSE), "mc": -1,
+                               "payload": {"token": token}})
+        elif not client.authenticated:
+            await client.send({"type_int": int(Messages.NACK), "ref": msg.get("mc", -1),
+                               "info": int(Messages.NACK_INFO_INVALID_ACTION)})
+        elif message_type == Messages.INITIAL_DATA:
+            await self._send_all_data(client)
+            if self.event_rate and client.event_task is None:
+                client.event_task = asyncio.create_task(self._event_loop(client))
+        elif message_type == Messages.HOME_DATA:
+            await client.send_message(Messages.SET_HOME_DATA, {"name": "Emulated home", "id": self.device_id})
+        elif message_type in _ACTIONS:
+            await self._handle_action(client, message_type, msg.get("mc", -1), payload)
+
+    async def _handshake(self, client):
+        await client.send_plain({"type_int": int(Messages.CONNECTION_START), "mc": -1, "payload": {
+            "device_id": self.device_id,
+            "connection_id": client.connection_id,
+        }})
+
+        msg = await client.receive_plain()
+        if msg.get("type_int") != Messages.CONNECTION_CONFIRM:
+            await client.send_plain({"type_int": int(Messages.CONNECTION_DECLINED), "mc": -1,
+                                     "payload": {"error_message": "Expected CONNECTION_CONFIRM"}})
+            return False
+        await client.send_plain({"type_int": int(Messages.CONNECTION_ESTABLISHED), "mc": -1})
+
+        msg = await client.receive_plain()
+        if msg.get("type_int") != Messages.SC_INIT:
+            return False
+        await client.send_plain({"type_int": int(Messages.SC_PUBKEY), "mc": -1, "payload": {
+            "public_key": self._rsa_key.publickey().export_key().decode(),
+        }})
+
+        msg = await client.receive_plain()
+        if msg.get("type_int") != Messages.SC_SECRET:
+            return False
+        secret = PKCS1_v1_5.new(self._rsa_key).decrypt(b64decode(msg["payload"]["secret"]), None)
+        if secret is None:
+            await client.send_plain({"type_int": int(Messages.SC_INVALID), "mc": -1})
+            return False
+        key, iv = secret.decode().split(":::")
+        client.key = bytes.fromhex(key)
+        client.iv = bytes.fromhex(iv)
+
+        await client.send({"type_int": int(Messages.SC_ESTABLISHED), "mc": -1})
+        return True
+
+    async def _handle_websocket(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        if len(self._clients) >= self.max_clients:
+            await ws.send_str(json.dumps({"type_int": int(Messages.NACK), "ref": -1,
+                                          "info": NO_CONNECTION_AVAILABLE}) + '\u0004')
+            await ws.close()
+            return ws
+
+        client = _EmulatedClient(ws, secrets.token_hex(8))
+        self._clients.add(client)
+        self.connections_accepted += 1
+        try:
+            if not await self._handshake(client):
+                return ws
+            async for msg in ws:
+                if msg.type == WSMsgType.TEXT:
+                    await self._handle_message(client, client.decrypt(msg.data))
+                elif msg.type == WSMsgType.ERROR:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            if client.event_task is not None:
+                client.event_task.cancel()
+            self._clients.discard(client)
+            await ws.close()
+        return ws
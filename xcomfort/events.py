@@ -0,0 +1,155 @@
+from .messages import Messages
+from .observable import Overflow, _BufferedObserver
+
+
+class ChangeEvent:
+    """A state change of a device, room or comp, as yielded by ``Bridge.events()``.
+
+    ``kind`` is "devices", "rooms" or "comps" and ``key`` the id within that
+    kind. ``type_int`` is the message that carried the change, or None for
+    changes not caused by a message.
+    """
+
+    __slots__ = ("kind", "key", "item", "state", "type_int")
+
+    def __init__(self, kind, key, item, state, type_int):
+        self.kind = kind
+        self.key = key
+        self.item = item
+        self.state = state
+        self.type_int = type_int
+
+    @property
+    def message_type(self):
+        """``type_int`` as a Messages member where it is one."""
+        try:
+            return Messages(self.type_int)
+        except ValueError:
+            return self.type_int
+
+    def __str__(self):
+        return f"ChangeEvent({self.kind}, {self.key}, {self.state})"
+
+    __repr__ = __str__
+
+
+class EventFilter:
+    """Which changes an events() iterator receives.
+
+    Every filter that is given must match. ``device_ids`` and
+    ``device_classes`` only match device changes; ``room_ids`` matches changes
+    of those rooms and of the devices in them. Comp changes only pass when
+    neither is given.
+    """
+
+    __slots__ = ("device_ids", "room_ids", "device_classes", "message_types")
+
+    def __init__(self, device_ids=None, room_ids=None, device_classes=None, message_types=None):
+        self.device_ids = frozenset(device_ids) if device_ids is not None else None
+        self.room_ids = frozenset(room_ids) if room_ids is not None else None
+        if device_classes is not None and not isinstance(device_classes, tuple):
+            device_classes = tuple(device_classes) if not isinstance(device_classes, type) else (device_classes,)
+        self.device_classes = device_classes
+        self.message_types = frozenset(int(t) for t in message_types) if message_types is not None else None
+
+    def matches(self, kind, key, item, type_int, index) -> bool:
+        if self.message_types is not None and type_int not in self.message_types:
+            return False
+        if kind == "devices":
+            if self.device_ids is not None and key not in self.device_ids:
+                return False
+            if self.device_classes is not None and not isinstance(item, self.device_classes):
+                return False
+            if self.room_ids is not None:
+                return not self.room_ids.isdisjoint(index.rooms_of(key))
+            return True
+        if self.device_ids is not None or self.device_classes is not None:
+            return False
+        if kind == "rooms":
+            return self.room_ids is None or key in self.room_ids
+        return self.room_ids is None
+
+
+class _EventSubscriber(_BufferedObserver):
+    """The queue behind one events() iterator, which takes events with ``get``."""
+
+    __slots__ = ("filter",)
+
+    def __init__(self, event_filter, queue_size):
+        super().__init__(None, queue_size, Overflow.DROP_OLDEST, None, None, None, None)
+        self.filter = event_filter
+
+
+class ChangeHub:
+    """Routes the state changes of one bridge to its events() iterators.
+
+    Devices, rooms and comps report every emitted state here. Subscribers that
+    filter on device ids are indexed by id, so a change is only checked
+    against the subscribers that can match it, and a ChangeEvent is only built
+    once one of them does. The hub belongs to the bridge, not the connection,
+    so subscribers keep receiving across reconnects.
+    """
+
+    def __init__(self, index):
+        self._index = index
+        # type_int of the message being dispatched, set by Bridge._onMessage
+        self.type_int = None
+        self._by_device = {}
+        self._unkeyed = ()
+        self.published = 0
+
+    def subscribe(self, event_filter: EventFilter, queue_size: int = 1024) -> _EventSubscriber:
+        subscriber = _EventSubscriber(event_filter, queue_size)
+        if event_filter.device_ids is not None:
+            for device_id in event_filter.device_ids:
+                self._by_device[device_id] = self._by_device.get(device_id, ()) + (subscriber,)
+        else:
+            self._unkeyed = self._unkeyed + (subscriber,)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if subscriber.filter.device_ids is not None:
+            for device_id in subscriber.filter.device_ids:
+                remaining = tuple(s for s in self._by_device.get(device_id, ()) if s is not subscriber)
+                if remaining:
+                    self._by_device[device_id] = remaining
+                else:
+                    self._by_device.pop(device_id, None)
+        else:
+            self._unkeyed = tuple(s for s in self._unkeyed if s is not subscriber)
+
+    def device_changed(self, device, state):
+        by_device = self._by_device.get(device.device_id)
+        if by_device or self._unkeyed:
+            self._publish("devices", device.device_id, device, state,
+                          by_device + self._unkeyed if by_device else self._unkeyed)
+
+    def room_changed(self, room, state):
+        if self._unkeyed:
+            self._publish("rooms", room.room_id, room, state, self._unkeyed)
+
+    def comp_changed(self, comp, state):
+        if self._unkeyed:
+            self._publish("comps", comp.comp_id, comp, state, self._unkeyed)
+
+    def _publish(self, kind, key, item, state, candidates):
+        type_int = self.type_int
+        event = None
+        for subscriber in candidates:
+            if subscriber.filter.matches(kind, key, item, type_int, self._index):
+                if event is None:
+                    event = ChangeEvent(kind, key, item, state, type_int)
+                    self.published += 1
+                subscriber.on_next(event)
+
+    def stats(self) -> dict:
+        # Each subscriber once, however many device ids it filters on
+        subscribers = dict.fromkeys(self._unkeyed)
+        for subs in self._by_device.values():
+            subscribers.update(dict.fromkeys(subs))
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "dropped": sum(subscriber.dropped for subscriber in subscribers),
+            "queues": [subscriber.stats() for subscriber in subscribers],
+        }
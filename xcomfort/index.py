@@ -0,0 +1,157 @@
+from typing import Optional
+
+_EMPTY = frozenset()
+
+
+class TopologyIndex:
+    """Secondary indexes over a bridge's devices, rooms and comps.
+
+    Kept up to date by the bridge as devices, rooms and comps are added,
+    rebuilt and removed, so lookups by name, device class, comp, room and
+    controlling rocker do not scan every device. All lookups return ids.
+    ``version`` changes whenever a device, its name or a rocker's controlled
+    devices change, for callers that cache something derived from them.
+    """
+
+    def __init__(self):
+        self._names = {"devices": {}, "rooms": {}, "comps": {}}
+        self._by_class = {}
+        self._by_comp = {}
+        # device id -> (name, class, comp id), to undo the entries on removal
+        self._devices = {}
+        self._room_members = {}
+        self._rooms_of = {}
+        self._controls = {}
+        self._controllers = {}
+        self.version = 0
+
+    def _add_name(self, kind, name, key):
+        self._names[kind].setdefault(name, set()).add(key)
+
+    def _remove_name(self, kind, name, key):
+        keys = self._names[kind].get(name)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._names[kind][name]
+
+    def add_device(self, device, comp_id=None, control_ids=None):
+        device_id = device.device_id
+        if device_id in self._devices:
+            self.remove_device(device_id)
+        device_class = type(device)
+        self._devices[device_id] = (device.name, device_class, comp_id)
+        self._add_name("devices", device.name, device_id)
+        self._by_class.setdefault(device_class, set()).add(device_id)
+        if comp_id is not None:
+            self._by_comp.setdefault(comp_id, set()).add(device_id)
+        if control_ids is not None:
+            self.set_controls(device_id, control_ids)
+        self.version += 1
+
+    def remove_device(self, device_id):
+        """Forget a device. Rooms and rockers listing it keep doing so until they are updated."""
+        entry = self._devices.pop(device_id, None)
+        if entry is None:
+            return
+        name, device_class, comp_id = entry
+        self._remove_name("devices", name, device_id)
+        self._by_class[device_class].discard(device_id)
+        if comp_id is not None:
+            self._by_comp[comp_id].discard(device_id)
+        self.set_controls(device_id, ())
+        self.version += 1
+
+    def add_room(self, room):
+        self._add_name("rooms", room.name, room.room_id)
+
+    def remove_room(self, room_id, name):
+        self._remove_name("rooms", name, room_id)
+        self.set_room_devices(room_id, ())
+
+    def add_comp(self, comp):
+        self._add_name("comps", comp.name, comp.comp_id)
+
+    def remove_comp(self, comp_id, name):
+        self._remove_name("comps", name, comp_id)
+
+    def set_room_devices(self, room_id, device_ids):
+        members = frozenset(device_ids)
+        old = self._room_members.get(room_id, _EMPTY)
+        for device_id in old - members:
+            self._rooms_of[device_id].discard(room_id)
+        for device_id in members - old:
+            self._rooms_of.setdefault(device_id, set()).add(room_id)
+        if members:
+            self._room_members[room_id] = members
+        else:
+            self._room_members.pop(room_id, None)
+
+    def set_controls(self, rocker_id, device_ids):
+        """Record the devices a rocker controls, its ``controlId``."""
+        controls = tuple(device_ids)
+        old = self._controls.get(rocker_id, ())
+        if controls == old:
+            return
+        for device_id in old:
+            self._controllers[device_id].discard(rocker_id)
+        for device_id in controls:
+            self._controllers.setdefault(device_id, set()).add(rocker_id)
+        if controls:
+            self._controls[rocker_id] = controls
+        else:
+            self._controls.pop(rocker_id, None)
+        self.version += 1
+
+    def named(self, kind: str, name: str):
+        return self._names[kind].get(name, _EMPTY)
+
+    def rooms_of(self, device_id):
+        return self._rooms_of.get(device_id, _EMPTY)
+
+    def controlled_by(self, rocker_id):
+        return self._controls.get(rocker_id, ())
+
+    def controllers_of(self, device_id):
+        return self._controllers.get(device_id, _EMPTY)
+
+    def devices(self, name: Optional[str] = None, device_class: Optional[type] = None, comp_id=None,
+                room_id=None) -> set:
+        """Ids of the known devices matching every given criterion.
+
+        ``device_class`` matches subclasses too.
+        """
+        candidates = []
+        if name is not None:
+            candidates.append(self._names["devices"].get(name, _EMPTY))
+        if comp_id is not None:
+            candidates.append(self._by_comp.get(comp_id, _EMPTY))
+        if room_id is not None:
+            candidates.append(self._room_members.get(room_id, _EMPTY))
+        if not candidates:
+            if device_class is None:
+                return set(self._devices)
+            return set().union(*(ids for cls, ids in self._by_class.items() if issubclass(cls, device_class)))
+        # Intersect starting from the smallest set
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for ids in candidates[1:]:
+            result.intersection_update(ids)
+        entries = self._devices
+        if room_id is not None:
+            # Rooms may list devices that do not exist (any more)
+            result = {device_id for device_id in result if device_id in entries}
+        if device_class is not None:
+            # The other criteria are narrower than a class, so check the few that are left
+            result = {device_id for device_id in result if issubclass(entries[device_id][1], device_class)}
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self._devices),
+            "names": {kind: len(names) for kind, names in self._names.items()},
+            "classes": {cls.__name__: len(ids) for cls, ids in self._by_class.items() if ids},
+            "comps": len([ids for ids in self._by_comp.values() if ids]),
+            "rooms": len(self._room_members),
+            "rockers": len(self._controls),
+        }
@@ -0,0 +1,57 @@
+import logging
+import time
+from typing import Optional
+
+# Per-subsystem loggers; configure them, or the "xcomfort" parent, with the
+# standard logging module.
+CONNECTION = logging.getLogger("xcomfort.connection")
+DISPATCH = logging.getLogger("xcomfort.dispatch")
+DEVICES = logging.getLogger("xcomfort.devices")
+BRIDGE = logging.getLogger("xcomfort.bridge")
+
+
+class RateLimiter:
+    """Lets a message with a given key through at most once per ``interval`` seconds."""
+
+    def __init__(self, interval: float = 60.0, max_keys: int = 1024):
+        self.interval = interval
+        self.max_keys = max_keys
+        self._last = {}
+
+    def check(self, key) -> Optional[int]:
+        """None if the message should be dropped, else how many were dropped since the last one."""
+        now = time.monotonic()
+        entry = self._last.get(key)
+        if entry is not None and now - entry[0] < self.interval:
+            entry[1] += 1
+            return None
+        if entry is None and len(self._last) >= self.max_keys:
+            self._last.clear()
+        self._last[key] = [now, 0]
+        return entry[1] if entry is not None else 0
+
+
+class LoggerAdapter:
+    """Logs to the standard ``logging`` loggers and, if set, a legacy callback.
+
+    The callback, ``Bridge.logger`` before there were standard loggers,
+    receives every message formatted as a string, whatever its level.
+    Messages are only formatted when someone will see them.
+    """
+
+    def __init__(self, callback=None, rate_limiter: RateLimiter = None):
+        self.callback = callback
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+
+    def log(self, logger: logging.Logger, level: int, msg: str, *args, rate_key=None):
+        if rate_key is not None:
+            suppressed = self.rate_limiter.check(rate_key)
+            if suppressed is None:
+                return
+            if suppressed:
+                msg += " (%d similar messages suppressed)"
+                args += (suppressed,)
+        if logger.isEnabledFor(level):
+            logger.log(level, msg, *args)
+        if self.callback is not None:
+            self.callback(msg % args if args else msg)
@@ -0,0 +1,157 @@
+import asyncio
+import random
+from typing import Optional
+import aiohttp
+from .bridge import Bridge
+from .log import BRIDGE as _LOGGER
+from .observable import Subject
+
+
+class DeviceEvent:
+    """A device state change seen by a BridgeManager."""
+
+    __slots__ = ("bridge_id", "device", "state")
+
+    def __init__(self, bridge_id, device, state):
+        self.bridge_id = bridge_id
+        self.device = device
+        self.state = state
+
+    def __str__(self):
+        return f"DeviceEvent({self.bridge_id}, {self.device.device_id}, {self.state})"
+
+    __repr__ = __str__
+
+
+class BridgeManager:
+    """Runs many bridges on one event loop.
+
+    All bridges share one aiohttp session and connector. Each bridge's ``run()``
+    is supervised and restarted after ``restart_delay`` if it ever exits with an
+    error. Starts are spread over ``stagger`` seconds per bridge (with jitter)
+    so a restart does not handshake with every bridge at once. Device state
+    changes of all bridges are published on ``events`` as DeviceEvent.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession = None, stagger: float = 0.05, restart_delay: float = 5.0,
+                 connection_limit: int = 0):
+        if session is None:
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=connection_limit))
+            self._close_session = True
+        else:
+            self._close_session = False
+        self.session = session
+        self.stagger = stagger
+        self.restart_delay = restart_delay
+        self.bridges = {}
+        self.events = Subject()
+        self.restarts = 0
+        self._tasks = {}
+        self._subscriptions = {}
+        self._started = False
+        self._closing = False
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def add(self, ip_address: str, authkey: str, bridge_id=None, **kwargs) -> Bridge:
+        """Create a bridge on the shared session; ``bridge_id`` defaults to the address."""
+        bridge_id = bridge_id if bridge_id is not None else ip_address
+        if bridge_id in self.bridges:
+            raise ValueError(f"Bridge {bridge_id!r} already added")
+        bridge = Bridge(ip_address, authkey, session=self.session, **kwargs)
+        self.bridges[bridge_id] = bridge
+        self._subscriptions[bridge_id] = [bridge._device_added.subscribe(
+            lambda device, bridge_id=bridge_id: self._watch_device(bridge_id, device))]
+        if self._started:
+            self._start(bridge_id, 0.0)
+        return bridge
+
+    async def remove(self, bridge_id):
+        bridge = self.bridges.pop(bridge_id)
+        for subscription in self._subscriptions.pop(bridge_id, ()):
+            subscription.dispose()
+        task = self._tasks.pop(bridge_id, None)
+        await bridge.close()
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def _watch_device(self, bridge_id, device):
+        if device is None:
+            return
+        events = self.events
+
+        def on_state(state):
+            if state is not None:
+                events.on_next(DeviceEvent(bridge_id, device, state))
+
+        self._subscriptions[bridge_id].append(device.state.subscribe(on_state))
+
+    async def start(self):
+        """Start every bridge, spreading the handshakes over time."""
+        self._started = True
+        for index, bridge_id in enumerate(list(self.bridges)):
+            if bridge_id not in self._tasks:
+                self._start(bridge_id, index * self.stagger)
+
+    def _start(self, bridge_id, delay):
+        if self.stagger:
+            delay += random.uniform(0, self.stagger)
+        self._tasks[bridge_id] = asyncio.create_task(self._supervise(bridge_id, delay))
+
+    async def _supervise(self, bridge_id, delay):
+        await asyncio.sleep(delay)
+        while not self._closing:
+            bridge = self.bridges.get(bridge_id)
+            if bridge is None:
+                return
+            try:
+                await bridge.run()
+                return
+            except Exception as e:
+                _LOGGER.warning("Bridge %s stopped with %r, restarting in %ss", bridge_id, e, self.restart_delay)
+                self.restarts += 1
+            await asyncio.sleep(self.restart_delay)
+
+    async def wait_for_initialization(self, timeout: Optional[float] = None):
+        await asyncio.wait_for(
+            asyncio.gather(*(bridge.wait_for_initialization() for bridge in self.bridges.values())), timeout)
+
+    def get_device(self, bridge_id, device_id):
+        """The device ``device_id`` of bridge ``bridge_id``, or None."""
+        bridge = self.bridges.get(bridge_id)
+        if bridge is None:
+            return None
+        return bridge._devices.get(device_id)
+
+    def stats(self) -> dict:
+        states = {}
+        for bridge in self.bridges.values():
+            states[bridge.state.name] = states.get(bridge.state.name, 0) + 1
+        return {
+            "bridges": len(self.bridges),
+            "states": states,
+            "restarts": self.restarts,
+            "reconnects": sum(bridge.reconnect.reconnects for bridge in self.bridges.values()),
+        }
+
+    async def close(self):
+        self._closing = True
+        await asyncio.gather(*(bridge.close() for bridge in self.bridges.values()), return_exceptions=True)
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        if tasks:
+            await asyncio.wait(tasks, timeout=5)
+            for task in tasks:
+                task.cancel()
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.dispose()
+        self._subscriptions.clear()
+        if self._close_session:
+            await self.session.close()
@@ -0,0 +1,173 @@
+import functools
+import time
+from bisect import bisect_left
+from typing import Optional
+from .codec import AesFrameCodec
+from .messages import Messages
+
+# Upper bounds in seconds, from 10µs to 1s
+DEFAULT_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+@functools.lru_cache(maxsize=None)
+def message_label(message_type) -> tuple:
+    """The ("type", name) label for a message type, cached so hot paths do not build it."""
+    try:
+        return ("type", Messages(message_type).name)
+    except ValueError:
+        return ("type", str(message_type))
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "buckets": {bound: count for bound, count in self.cumulative()},
+        }
+
+
+class Metrics:
+    """Counters and latency histograms shared by a Bridge and its connection.
+
+    Metrics are keyed by name and an optional ``(label name, value)`` pair.
+    ``labels`` are added to every metric in the text exposition, to tell
+    several bridges apart.
+    """
+
+    def __init__(self, labels: Optional[dict] = None, buckets=DEFAULT_BUCKETS):
+        self.labels = dict(labels or {})
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name: str, value=1, label: Optional[tuple] = None):
+        key = (name, label)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, label: Optional[tuple] = None):
+        key = (name, label)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    def snapshot(self) -> dict:
+        """Counters and histograms as nested dicts; labelled metrics map label values to values."""
+        result = {}
+        for (name, label), value in sorted(self.counters.items(), key=_sort_key):
+            _put(result, name, label, value)
+        for (name, label), histogram in sorted(self.histograms.items(), key=_sort_key):
+            _put(result, name, label, histogram.snapshot())
+        return result
+
+    def prometheus_text(self, prefix: str = "xcomfort") -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        typed = set()
+        for (name, label), value in sorted(self.counters.items(), key=_sort_key):
+            metric = f"{prefix}_{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{self._format_labels(label)} {value}")
+        for (name, label), histogram in sorted(self.histograms.items(), key=_sort_key):
+            metric = f"{prefix}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            for bound, count in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{metric}_bucket{self._format_labels(label, ('le', le))} {count}")
+            lines.append(f"{metric}_sum{self._format_labels(label)} {histogram.sum}")
+            lines.append(f"{metric}_count{self._format_labels(label)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _format_labels(self, *labels) -> str:
+        pairs = list(self.labels.items()) + [label for label in labels if label is not None]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _sort_key(item):
+    name, label = item[0]
+    return name, label or ()
+
+
+def _put(result, name, label, value):
+    if label is None:
+        result[name] = value
+    else:
+        result.setdefault(name, {})[label[1]] = value
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MeteredCodec:
+    """Wraps a frame codec, counting frames and bytes and timing decryption and encryption."""
+
+    def __init__(self, codec, metrics: Metrics):
+        self._codec = codec
+        self._metrics = metrics
+        self.json = codec.json
+
+    def decrypt(self, data) -> bytes:
+        started = time.perf_counter()
+        plaintext = self._codec.decrypt(data)
+        metrics = self._metrics
+        metrics.observe("decrypt_seconds", time.perf_counter() - started)
+        metrics.inc("frames_received")
+        metrics.inc("bytes_received", len(data))
+        return plaintext
+
+    def encrypt(self, plaintext: bytes) -> str:
+        started = time.perf_counter()
+        frame = self._codec.encrypt(plaintext)
+        metrics = self._metrics
+        metrics.observe("encrypt_seconds", time.perf_counter() - started)
+        metrics.inc("frames_sent")
+        metrics.inc("bytes_sent", len(frame))
+        return frame
+
+    decode = AesFrameCodec.decode
+    encode = AesFrameCodec.encode
+
+
+async def start_metrics_server(render, host: str = "127.0.0.1", port: int = 9464, path: str = "/metrics"):
+    """Serve ``render()`` as Prometheus text on http://host:port/path. Returns the aiohttp AppRunner."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(body=render().encode(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get(path, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,356 @@
+import asyncio
+import inspect
+import time
+from collections import OrderedDict, deque
+from enum import Enum
+
+
+class Subscription:
+    """Returned by ``subscribe``; ``dispose()`` stops delivery."""
+
+    __slots__ = ("_subject", "_observer")
+
+    def __init__(self, subject, observer):
+        self._subject = subject
+        self._observer = observer
+
+    def dispose(self):
+        if self._subject is not None:
+            self._subject._remove(self._observer)
+            self._subject = None
+
+
+class Overflow(Enum):
+    """What a buffered subscriber does when its queue is full."""
+
+    # Keep only the latest value per key; a full queue drops the oldest key
+    CONFLATE = "conflate"
+    # Drop the oldest queued value
+    DROP_OLDEST = "drop_oldest"
+    # Keep everything and hold the producer at its Gate until the queue drains
+    BLOCK = "block"
+
+
+class Gate:
+    """Where a producer waits while a BLOCK subscriber's queue is full.
+
+    ``Bridge.backpressure`` is the gate of a bridge's receive loop: while it is
+    closed, no further frames are read from the socket.
+    """
+
+    def __init__(self):
+        self._full = set()
+        self._open = asyncio.Event()
+        self._open.set()
+        self.waits = 0
+        self.blocked_seconds = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return not self._full
+
+    def _close(self, subscriber):
+        self._full.add(subscriber)
+        self._open.clear()
+
+    def _release(self, subscriber):
+        self._full.discard(subscriber)
+        if not self._full:
+            self._open.set()
+
+    async def wait(self):
+        """Return once no subscriber is full."""
+        if not self._full:
+            return
+        self.waits += 1
+        started = time.perf_counter()
+        try:
+            await self._open.wait()
+        finally:
+            self.blocked_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {"blocked": len(self._full), "waits": self.waits, "blocked_seconds": self.blocked_seconds}
+
+
+class _Observer:
+    __slots__ = ("on_next", "on_error", "on_completed", "task")
+
+    def __init__(self, on_next, on_error=None, on_completed=None):
+        self.on_next = on_next
+        self.on_error = on_error
+        self.on_completed = on_completed
+        self.task = None
+
+
+async def _drain(queue, callback):
+    while True:
+        value = await queue.get()
+        try:
+            await callback(value)
+        except Exception as e:
+            asyncio.get_running_loop().call_exception_handler({
+                "message": "Exception in coroutine subscriber",
+                "exception": e,
+            })
+
+
+class _BufferedObserver(_Observer):
+    """Queues values for a callback that runs on its own task.
+
+    Without a callback there is no task and the values are taken with ``get``.
+    """
+
+    __slots__ = ("callback", "queue_size", "overflow", "key", "gate", "pending", "blocking", "delivered",
+                 "dropped", "conflated", "max_pending", "lag", "max_lag", "_wakeup", "_loop")
+
+    def __init__(self, callback, queue_size, overflow, key, gate, on_error, on_completed):
+        super().__init__(self._put, on_error, on_completed)
+        overflow = Overflow(overflow)
+        if overflow is Overflow.BLOCK and gate is None:
+            raise ValueError("Overflow.BLOCK needs a gate, such as bridge.backpressure")
+        self.callback = callback
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.key = key
+        self.gate = gate
+        self.pending = OrderedDict() if overflow is Overflow.CONFLATE else deque()
+        self.blocking = False
+        self.delivered = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.max_pending = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        if callback is not None:
+            self.task = self._loop.create_task(self._run())
+            self.task.add_done_callback(self._stopped)
+
+    def _put(self, value):
+        pending = self.pending
+        now = self._loop.time()
+        if self.overflow is Overflow.CONFLATE:
+            key = self.key(value) if self.key is not None else None
+            entry = pending.get(key)
+            if entry is not None:
+                # The slot keeps its place and its age
+                pending[key] = (value, entry[1])
+                self.conflated += 1
+            else:
+                if len(pending) >= self.queue_size:
+                    pending.popitem(last=False)
+                    self.dropped += 1
+                pending[key] = (value, now)
+        else:
+            if self.overflow is Overflow.DROP_OLDEST and len(pending) >= self.queue_size:
+                pending.popleft()
+                self.dropped += 1
+            pending.append((value, now))
+            if self.overflow is Overflow.BLOCK and not self.blocking and len(pending) >= self.queue_size:
+                self.blocking = True
+                self.gate._close(self)
+        if len(pending) > self.max_pending:
+            self.max_pending = len(pending)
+        self._wakeup.set()
+
+    def _pop(self):
+        if self.overflow is Overflow.CONFLATE:
+            return self.pending.popitem(last=False)[1]
+        return self.pending.popleft()
+
+    async def _next(self):
+        while not self.pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        value, queued_at = self._pop()
+        self.lag = self._loop.time() - queued_at
+        if self.lag > self.max_lag:
+            self.max_lag = self.lag
+        if self.blocking and len(self.pending) < self.queue_size:
+            self.blocking = False
+            self.gate._release(self)
+        return value
+
+    async def get(self):
+        value = await self._next()
+        self.delivered += 1
+        return value
+
+    async def _run(self):
+        while True:
+            value = await self._next()
+            try:
+                result = self.callback(value)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                self._loop.call_exception_handler({
+                    "message": "Exception in buffered subscriber",
+                    "exception": e,
+                })
+            self.delivered += 1
+
+    def _stopped(self, task):
+        if self.blocking:
+            self.blocking = False
+            self.gate._release(self)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "max_pending": self.max_pending,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+        }
+
+
+class BufferedSubscription(Subscription):
+    """Subscription with its own queue; ``stats()`` reports lag and drops."""
+
+    __slots__ = ()
+
+    def dispose(self):
+        super().dispose()
+        # Do not leave the producer waiting for a task that is being cancelled
+        self._observer._stopped(None)
+
+    def stats(self) -> dict:
+        return self._observer.stats()
+
+
+class Subject:
+    """Minimal hot observable.
+
+    ``subscribe`` takes a plain callback, a coroutine function (run in order on
+    its own task) or an rx-style observer object. With ``queue_size`` the
+    subscriber gets a bounded queue and its own task, so a slow callback cannot
+    hold up the producer; ``overflow`` picks what happens when the queue is
+    full. ``async for`` iterates over the values emitted while iterating.
+    ``pipe`` and ``as_rx`` adapt to RxPY for code that needs its operators;
+    RxPY is only imported when they are used.
+    """
+
+    def __init__(self):
+        self._observers = ()
+        self._on_next = ()
+
+    def _add(self, observer):
+        # Copy-on-write, so on_next can iterate without guarding against
+        # subscribers that dispose while being notified.
+        self._observers = self._observers + (observer,)
+        self._on_next = tuple(o.on_next for o in self._observers)
+
+    def _remove(self, observer):
+        self._observers = tuple(o for o in self._observers if o is not observer)
+        self._on_next = tuple(o.on_next for o in self._observers)
+        if observer.task is not None:
+            observer.task.cancel()
+
+    def on_next(self, value):
+        for on_next in self._on_next:
+            on_next(value)
+
+    def on_error(self, error):
+        observers, self._observers, self._on_next = self._observers, (), ()
+        for observer in observers:
+            if observer.on_error is not None:
+                observer.on_error(error)
+
+    def on_completed(self):
+        observers, self._observers, self._on_next = self._observers, (), ()
+        for observer in observers:
+            if observer.on_completed is not None:
+                observer.on_completed()
+
+    def subscribe(self, observer=None, on_error=None, on_completed=None, on_next=None, *, scheduler=None,
+                  queue_size: int = None, overflow: Overflow = Overflow.DROP_OLDEST, key=None, gate: Gate = None):
+        if observer is not None and hasattr(observer, "on_next"):
+            on_next = observer.on_next
+            on_error = getattr(observer, "on_error", None)
+            on_completed = getattr(observer, "on_completed", None)
+        elif observer is not None:
+            on_next = observer
+        if on_next is None:
+            on_next = lambda value: None  # noqa: E731
+
+        if queue_size is not None:
+            subscriber = _BufferedObserver(on_next, queue_size, overflow, key, gate, on_error, on_completed)
+            self._add(subscriber)
+            self._replay(subscriber)
+            return BufferedSubscription(self, subscriber)
+        if inspect.iscoroutinefunction(on_next):
+            queue = asyncio.Queue()
+            subscriber = _Observer(queue.put_nowait, on_error, on_completed)
+            subscriber.task = asyncio.get_running_loop().create_task(_drain(queue, on_next))
+        else:
+            subscriber = _Observer(on_next, on_error, on_completed)
+        self._add(subscriber)
+        self._replay(subscriber)
+        return Subscription(self, subscriber)
+
+    def _replay(self, observer):
+        pass
+
+    async def __aiter__(self):
+        queue = asyncio.Queue()
+        subscription = self.subscribe(queue.put_nowait)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            subscription.dispose()
+
+    def as_observable(self):
+        """A read-only view that can be subscribed to but not pushed to."""
+        return ObservableView(self)
+
+    def as_rx(self):
+        import rx
+
+        def on_subscribe(observer, scheduler=None):
+            return self.subscribe(observer.on_next, observer.on_error, observer.on_completed)
+
+        return rx.create(on_subscribe)
+
+    def pipe(self, *operators):
+        return self.as_rx().pipe(*operators)
+
+
+class BehaviorSubject(Subject):
+    """Subject holding a current ``value`` that new subscribers receive first."""
+
+    def __init__(self, value=None):
+        super().__init__()
+        self.value = value
+
+    def on_next(self, value):
+        self.value = value
+        for on_next in self._on_next:
+            on_next(value)
+
+    def _replay(self, observer):
+        observer.on_next(self.value)
+
+
+class ObservableView:
+    __slots__ = ("_subject",)
+
+    def __init__(self, subject):
+        self._subject = subject
+
+    def subscribe(self, *args, **kwargs):
+        return self._subject.subscribe(*args, **kwargs)
+
+    def __aiter__(self):
+        return self._subject.__aiter__()
+
+    def as_rx(self):
+        return self._subject.as_rx()
+
+    def pipe(self, *operators):
+        return self._subject.pipe(*operators)
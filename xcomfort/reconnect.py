@@ -0,0 +1,134 @@
+import random
+import time
+from enum import Enum
+from typing import Optional
+from .observable import BehaviorSubject
+from .connection import ConnectionUnavailableError
+
+
+class CircuitState(Enum):
+    Closed = 0
+    Open = 1
+    HalfOpen = 2
+
+
+class BackoffPolicy:
+    """Exponential backoff with jitter for Bridge.run.
+
+    ``failures`` is the number of consecutive failed connection attempts. A
+    connection that drops after lasting at least ``min_uptime`` seconds is
+    retried after ``initial_delay`` (immediately by default). One that drops
+    sooner counts as a failed attempt, like attempts that fail outright, which
+    are retried after
+    ``base_delay * factor ** (failures - 1)`` capped at ``max_delay``. A bridge
+    that answers with "no client-connection available" is up but has no free
+    slot, so it is retried after ``busy_delay`` instead. Subclass and override
+    ``delay`` to plug in another strategy.
+    """
+
+    def __init__(self, initial_delay: float = 0.0, base_delay: float = 0.5, factor: float = 2.0,
+                 max_delay: float = 60.0, jitter: float = 0.2, busy_delay: float = 10.0,
+                 min_uptime: float = 10.0):
+        self.initial_delay = initial_delay
+        self.base_delay = base_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.busy_delay = busy_delay
+        self.min_uptime = min_uptime
+
+    def _jittered(self, delay: float) -> float:
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def delay(self, failures: int, error: Optional[Exception]) -> float:
+        if isinstance(error, ConnectionUnavailableError):
+            return self._jittered(self.busy_delay)
+        if failures == 0:
+            return self.initial_delay
+        return self._jittered(min(self.max_delay, self.base_delay * self.factor ** (failures - 1)))
+
+
+class ReconnectScheduler:
+    """Tracks connection attempts for Bridge.run and decides when to retry.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and the
+    bridge is only probed every ``open_interval`` seconds; the first successful
+    connection closes it again. The circuit state is published on the ``state``
+    subject. A connection that drops within ``policy.min_uptime`` does not
+    reset the failure count, so a bridge that accepts the handshake and then
+    hangs up straight away is backed off from and opens the circuit too.
+    """
+
+    def __init__(self, policy: BackoffPolicy = None, failure_threshold: int = 5, open_interval: float = 300.0):
+        self.policy = policy if policy is not None else BackoffPolicy()
+        self.failure_threshold = failure_threshold
+        self.open_interval = open_interval
+        self.state = BehaviorSubject(CircuitState.Closed)
+
+        self.attempts = 0
+        self.failures = 0
+        self.busy_rejections = 0
+        self.reconnects = 0
+        self.last_time_to_reconnect = None
+        self.total_outage = 0.0
+        self._connected = False
+        self._connected_at = None
+        self._outage_started = None
+
+    def _set_state(self, state: CircuitState):
+        if self.state.value != state:
+            self.state.on_next(state)
+
+    @property
+    def current_outage(self) -> float:
+        """Seconds since the bridge was last connected, or 0 while connected."""
+        if self._outage_started is None:
+            return 0.0
+        return time.monotonic() - self._outage_started
+
+    def on_attempt(self):
+        self.attempts += 1
+        if self.state.value == CircuitState.Open:
+            self._set_state(CircuitState.HalfOpen)
+
+    def on_connected(self):
+        if self._outage_started is not None:
+            outage = time.monotonic() - self._outage_started
+            self.last_time_to_reconnect = outage
+            self.total_outage += outage
+            self.reconnects += 1
+            self._outage_started = None
+        self._connected = True
+        self._connected_at = time.monotonic()
+        self._set_state(CircuitState.Closed)
+
+    def on_disconnected(self, error: Optional[Exception] = None) -> float:
+        """Record the end of an attempt or connection and return the delay before the next one."""
+        if self._connected:
+            self._connected = False
+            self._outage_started = time.monotonic()
+            if self._outage_started - self._connected_at >= self.policy.min_uptime:
+                self.failures = 0
+                return self.policy.delay(0, error)
+        if isinstance(error, ConnectionUnavailableError):
+            self.busy_rejections += 1
+        else:
+            if self._outage_started is None:
+                self._outage_started = time.monotonic()
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._set_state(CircuitState.Open)
+                return self.open_interval
+        return self.policy.delay(self.failures, error)
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.state.value.name,
+            "attempts": self.attempts,
+            "failures": self.failures,
+            "busy_rejections": self.busy_rejections,
+            "reconnects": self.reconnects,
+            "last_time_to_reconnect": self.last_time_to_reconnect,
+            "total_outage": self.total_outage + self.current_outage,
+            "current_outage": self.current_outage,
+        }
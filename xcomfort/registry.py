@@ -0,0 +1,113 @@
+from typing import Callable, Optional
+from .constants import ComponentTypes, DeviceTypes
+from .devices import (BridgeDevice, DoorWindowSensor, Heater, Light, RcTouch, Rocker, Shade, Switch,
+                      TemperatureSensor, WaterGuard, WaterSensor)
+
+# A factory builds a device from the bridge and the device payload
+DeviceFactory = Callable[[object, dict], BridgeDevice]
+
+
+class DeviceRegistry:
+    """Maps (devType, compType, flag) to the factory building the device.
+
+    A flag is a named predicate over the device payload, such as
+    ``power_monitor`` for outlets that report their consumption. Lookups go
+    from most to least specific: each flag that is set on the payload with
+    and without the comp type, then the comp type alone, then the devType
+    alone. Anything not registered becomes a plain ``BridgeDevice``.
+    """
+
+    def __init__(self, fallback: DeviceFactory = None):
+        self.fallback = fallback if fallback is not None else _generic
+        self._rules = {}
+        self._flags = {}
+        self._dev_type_flags = {}
+        self._comp_specific = set()
+
+    def add_flag(self, name: str, predicate: Callable[[dict], bool]):
+        self._flags[name] = predicate
+
+    def register(self, dev_type: int, factory: DeviceFactory, comp_type: Optional[int] = None,
+                 flag: Optional[str] = None):
+        """Use ``factory`` for devices of ``dev_type``, optionally narrowed by comp type and flag.
+
+        Registering the same combination again replaces the earlier factory.
+        """
+        if flag is not None and flag not in self._flags:
+            raise ValueError(f"Unknown device flag {flag!r}")
+        dev_type = int(dev_type)
+        if comp_type is not None:
+            comp_type = int(comp_type)
+            self._comp_specific.add(dev_type)
+        self._rules.setdefault(dev_type, {})[(comp_type, flag)] = factory
+        if flag is not None and flag not in self._dev_type_flags.get(dev_type, ()):
+            self._dev_type_flags[dev_type] = self._dev_type_flags.get(dev_type, ()) + (flag,)
+
+    def depends_on_comp(self, dev_type: int) -> bool:
+        """Whether the classification of ``dev_type`` can change once its comp is known."""
+        return dev_type in self._comp_specific
+
+    def resolve(self, payload: dict, comp_type: Optional[int] = None) -> DeviceFactory:
+        dev_type = payload["devType"]
+        rules = self._rules.get(dev_type)
+        if rules is None:
+            return self.fallback
+        for flag in self._dev_type_flags.get(dev_type, ()):
+            if self._flags[flag](payload):
+                factory = rules.get((comp_type, flag)) or rules.get((None, flag))
+                if factory is not None:
+                    return factory
+        return rules.get((comp_type, None)) or rules.get((None, None)) or self.fallback
+
+    def create(self, bridge, payload: dict, comp_type: Optional[int] = None) -> BridgeDevice:
+        return self.resolve(payload, comp_type)(bridge, payload)
+
+
+def _generic(bridge, payload):
+    return BridgeDevice(bridge, payload["deviceId"], payload["name"])
+
+
+def _light(bridge, payload):
+    return Light(bridge, payload["deviceId"], payload["name"], payload.get("dimmable", False))
+
+
+def _with_comp(device_type):
+    def factory(bridge, payload):
+        return device_type(bridge, payload["deviceId"], payload["name"], payload["compId"])
+    return factory
+
+
+def _with_comp_and_payload(device_type):
+    def factory(bridge, payload):
+        return device_type(bridge, payload["deviceId"], payload["name"], payload["compId"], payload)
+    return factory
+
+
+DEVICE_REGISTRY = DeviceRegistry()
+DEVICE_REGISTRY.add_flag("power_monitor", lambda payload: bool(payload.get("monitorPower", False)))
+DEVICE_REGISTRY.add_flag("push_button", lambda payload: int(payload.get("usage", 0)) == 1)
+
+DEVICE_REGISTRY.register(DeviceTypes.ACTUATOR_SWITCH, _light)
+DEVICE_REGISTRY.register(DeviceTypes.ACTUATOR_SWITCH, _with_comp_and_payload(Switch), flag="power_monitor")
+DEVICE_REGISTRY.register(DeviceTypes.ACTUATOR_SWITCH, _with_comp_and_payload(Rocker), flag="push_button")
+DEVICE_REGISTRY.register(DeviceTypes.ACTUATOR_DIMM, _light)
+DEVICE_REGISTRY.register(DeviceTypes.SHADING_ACTUATOR, _with_comp(Shade))
+DEVICE_REGISTRY.register(DeviceTypes.SWITCH, _with_comp_and_payload(Rocker))
+DEVICE_REGISTRY.register(DeviceTypes.ROCKER, _with_comp_and_payload(Rocker))
+# Door/window contacts report as rockers on a door/window sensor component
+DEVICE_REGISTRY.register(DeviceTypes.ROCKER, _with_comp_and_payload(DoorWindowSensor),
+                         comp_type=ComponentTypes.DOOR_WINDOW_SENSOR)
+DEVICE_REGISTRY.register(DeviceTypes.TEMP_SENSOR, _with_comp(TemperatureSensor))
+DEVICE_REGISTRY.register(DeviceTypes.HEATING_ACTUATOR, _with_comp(Heater))
+DEVICE_REGISTRY.register(DeviceTypes.HEATING_VALVE, _with_comp(Heater))
+DEVICE_REGISTRY.register(DeviceTypes.HEATING_WATER_VALVE, _with_comp(Heater))
+DEVICE_REGISTRY.register(DeviceTypes.RC_TOUCH, _with_comp(RcTouch))
+DEVICE_REGISTRY.register(DeviceTypes.TEMP_HUMIDITY_SENSOR, _with_comp(TemperatureSensor))
+DEVICE_REGISTRY.register(DeviceTypes.WATER_GUARD, _with_comp_and_payload(WaterGuard))
+DEVICE_REGISTRY.register(DeviceTypes.WATER_SENSOR, _with_comp_and_payload(WaterSensor))
+
+
+def register_device_type(dev_type: int, factory: DeviceFactory, comp_type: Optional[int] = None,
+                         flag: Optional[str] = None):
+    """Register a device factory with the registry every Bridge uses by default."""
+    DEVICE_REGISTRY.register(dev_type, factory, comp_type, flag)
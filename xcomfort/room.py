@@ -1,4 +1,4 @@
-import rx
+from .observable import BehaviorSubject
 from enum import Enum
 from .constants import Messages
 
@@ -53,15 +53,14 @@ class Room:
         self.bridge = bridge
         self.room_id = room_id
         self.name = name
-        self.state = rx.subject.BehaviorSubject(None)
+        self.state = BehaviorSubject(None)
         self.modesetpoints = dict()
 
     def handle_state(self, payload):
         old_state = self.state.value
 
         if old_state is not None:
-            old_state.raw.update(payload)
-            payload = old_state.raw
+            payload = {**old_state.raw, **payload}
 
         setpoint = payload.get("setpoint", None)
         temperature = payload.get("temp", None)
@@ -98,7 +97,7 @@ class Room:
         # Store new setpoint for current mode
         self.modesetpoints[self.state.value.mode.value] = setpoint
 
-        await self.bridge.send_message(
+        return await self.bridge.send_message(
             Messages.SET_HEATING_STATE,
             {
                 "roomId": self.room_id,
@@ -113,7 +112,7 @@ class Room:
         # Find setpoint for the mode we are about to set, and use that
         # When transmitting heating_state message.
         newsetpoint = self.modesetpoints.get(mode)
-        await self.bridge.send_message(
+        return await self.bridge.send_message(
             Messages.SET_HEATING_STATE,
             {
                 "roomId": self.room_id,
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from .log import BRIDGE as _LOGGER
+
+SNAPSHOT_VERSION = 1
+
+# Payload key holding the id of each kind of entry
+ID_KEYS = {
+    "devices": "deviceId",
+    "comps": "compId",
+    "rooms": "roomId",
+}
+
+# Fields that decide what object an entry becomes. If one of these differs
+# between the snapshot and the live data, the object built from the snapshot
+# is replaced rather than updated.
+CATALOGUE_KEYS = {
+    "devices": ("name", "devType", "compId", "usage", "monitorPower"),
+    "comps": ("name", "compType"),
+    "rooms": ("name",),
+}
+
+
+class TopologyDiff:
+    """Differences between a loaded snapshot and the live data from the bridge.
+
+    Each attribute maps "devices", "comps" and "rooms" to a list of ids.
+    """
+
+    def __init__(self):
+        self.added = {kind: [] for kind in ID_KEYS}
+        self.removed = {kind: [] for kind in ID_KEYS}
+        self.changed = {kind: [] for kind in ID_KEYS}
+
+    @property
+    def empty(self) -> bool:
+        return not any(ids for diff in (self.added, self.removed, self.changed) for ids in diff.values())
+
+    def __str__(self):
+        counts = ", ".join(
+            f"{name} {sum(len(ids) for ids in diff.values())}"
+            for name, diff in (("added", self.added), ("removed", self.removed), ("changed", self.changed)))
+        return f"TopologyDiff({counts})"
+
+    __repr__ = __str__
+
+
+def catalogue_changed(kind: str, stored: dict, payload: dict) -> bool:
+    return any(key in payload and stored.get(key) != payload[key] for key in CATALOGUE_KEYS[kind])
+
+
+class TopologySnapshot:
+    """On-disk copy of the device, comp and room catalogue with last known state.
+
+    Entries are the payloads received from the bridge, with later partial
+    updates merged in. Changes are written to ``path`` at most once every
+    ``save_delay`` seconds, atomically, so a crash never leaves a truncated
+    file behind. Serializing and writing happen on a writer thread, so a large
+    catalogue does not hold up the event loop.
+    """
+
+    def __init__(self, path: str, save_delay: float = 5.0):
+        self.path = path
+        self.save_delay = save_delay
+        self._records = {kind: {} for kind in ID_KEYS}
+        self._dirty = False
+        self._save_handle = None
+        self._executor = None
+        self._writing = None
+        self.saves = 0
+
+    def load(self) -> bool:
+        """Read the snapshot from disk. Returns False if there is none or it is unreadable."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+            return False
+        for kind, id_key in ID_KEYS.items():
+            self._records[kind] = {payload[id_key]: payload for payload in data.get(kind, ())
+                                   if isinstance(payload, dict) and id_key in payload}
+        return True
+
+    def entries(self, kind: str) -> dict:
+        return self._records[kind]
+
+    def get(self, kind: str, key) -> Optional[dict]:
+        return self._records[kind].get(key)
+
+    def record(self, kind: str, key, payload: dict):
+        """Merge a full or partial payload into the entry for ``key``."""
+        stored = self._records[kind].get(key)
+        if stored is None:
+            self._records[kind][key] = dict(payload)
+        else:
+            stored.update(payload)
+        self._schedule_save()
+
+    def remove(self, kind: str, key):
+        if self._records[kind].pop(key, None) is not None:
+            self._schedule_save()
+
+    def _schedule_save(self):
+        self._dirty = True
+        if self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._save_handle = loop.call_later(self.save_delay, self._save)
+
+    def _save(self):
+        self._save_handle = None
+        writing = self.flush()
+        if writing is not None:
+            writing.add_done_callback(self._saved)
+
+    def _saved(self, writing):
+        if not writing.cancelled() and writing.exception() is not None:
+            # Try again with the next change
+            self._dirty = True
+            _LOGGER.warning("Failed to write snapshot %s: %s", self.path, writing.exception())
+
+    def flush(self) -> Optional[asyncio.Future]:
+        """Start writing pending changes now.
+
+        Returns a future for the write, or None if nothing is pending. Without
+        a running event loop the write happens before returning.
+        """
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if not self._dirty:
+            return None
+        # Copy the entries here, since record() keeps updating them while the
+        # writer thread serializes
+        data = {"version": SNAPSHOT_VERSION}
+        for kind, records in self._records.items():
+            data[kind] = [dict(payload) for payload in records.values()]
+        self._dirty = False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(data)
+            return None
+        if self._executor is None:
+            # One writer thread, so writes land in the order they were made
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xcomfort-snapshot")
+        self._writing = loop.run_in_executor(self._executor, self._write, data)
+        return self._writing
+
+    def _write(self, data):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.saves += 1
+
+    async def close(self):
+        """Write pending changes and wait until they are on disk."""
+        self.flush()
+        writing, self._writing = self._writing, None
+        try:
+            if writing is not None:
+                await writing
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None